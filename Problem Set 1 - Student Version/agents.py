@@ -1,6 +1,13 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Dict, Generic, List
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Generic, List, Optional, Sequence, Tuple
 from problem import HeuristicFunction, Problem, S, A, Solution
+from search_statistics import SearchStatistics
+from collections import OrderedDict
+from itertools import count
+from heapq import heappush, heappop
+from multiprocessing.connection import Connection, wait
+import multiprocessing, time
 
 # This is an abstract class for all goal based agents
 class GoalBasedAgent(ABC, Generic[S, A]):
@@ -22,17 +29,22 @@ class HumanAgent(GoalBasedAgent[S, A]):
         return self.user_input_fn(problem, state)
 
 # This agent applies an uninformed search algorithm to find the solution to goal for the given state
+# If stats is given, it is passed to the search function to collect the search statistics (see search_statistics.py)
 class UninformedSearchAgent(GoalBasedAgent[S, A]):
-    def __init__(self, search_fn: Callable[[Problem[S, A], S], Solution]) -> None:
+    def __init__(self, search_fn: Callable[[Problem[S, A], S], Solution], stats: Optional[SearchStatistics] = None) -> None:
         super().__init__()
         self.search_fn = search_fn
+        self.stats = stats
         # The policy will store the action to do for each state so as not to search again after each observation
         self.policy: Dict[S, A] = {}
     
     def act(self, problem: Problem[S, A], state: S) -> A:
         # This state is not stored in the policy, we need to search for a solution 
         if state not in self.policy:
-            solution = self.search_fn(problem, state)
+            if self.stats is None:
+                solution = self.search_fn(problem, state)
+            else:
+                solution = self.search_fn(problem, state, stats=self.stats)
             # if no solution was found, we return None
             if solution is None:
                 self.policy[state] = None
@@ -45,18 +57,24 @@ class UninformedSearchAgent(GoalBasedAgent[S, A]):
         return self.policy.get(state)
 
 # This agent applies an informed search algorithm to find the solution to goal for the given state
+# If stats is given, it is passed to the search function to collect the search statistics (see search_statistics.py)
 class InformedSearchAgent(GoalBasedAgent[S, A]):
-    def __init__(self, search_fn: Callable[[Problem[S, A], S, HeuristicFunction], Solution], heuristic: HeuristicFunction) -> None:
+    def __init__(self, search_fn: Callable[[Problem[S, A], S, HeuristicFunction], Solution], heuristic: HeuristicFunction,
+                 stats: Optional[SearchStatistics] = None) -> None:
         super().__init__()
         self.search_fn = search_fn
         self.heuristic = heuristic
+        self.stats = stats
         # The policy will store the action to do for each state so as not to search again after each observation
         self.policy: Dict[S, A] = {}
     
     def act(self, problem: Problem[S, A], state: S) -> A:
         # This state is not stored in the policy, we need to search for a solution 
         if state not in self.policy:
-            solution = self.search_fn(problem, state, self.heuristic)
+            if self.stats is None:
+                solution = self.search_fn(problem, state, self.heuristic)
+            else:
+                solution = self.search_fn(problem, state, self.heuristic, stats=self.stats)
             # if no solution was found, we return None
             if solution is None:
                 self.policy[state] = None
@@ -66,4 +84,380 @@ class InformedSearchAgent(GoalBasedAgent[S, A]):
             for action in solution:
                 self.policy[current] = action
                 current = problem.get_successor(current, action)
-        return self.policy.get(state)
\ No newline at end of file
+        return self.policy.get(state)
+
+# This agent runs one backward uniform cost search (dijkstra) from the goal and stores the next action
+# for every state that the search reaches, so later calls to "act" from any of these states are O(1)
+# (even if the agent is moved to a state that is not on its previous path).
+# It works on problems with a single goal state "problem.goal" that implement "problem.get_predecessors(state)"
+# (see the bidirectional searches in search.py). The tables of the last "max_goals" (problem, goal) pairs are kept
+# and the least recently used table is dropped when a new one is needed.
+# If max_states is given, each search stops after settling max_states states (but never before reaching the current state),
+# and it is resumed when the agent asks for a state that is not covered yet.
+class ShortestPathTreeAgent(GoalBasedAgent[S, A]):
+    def __init__(self, max_goals: int = 8, max_states: Optional[int] = None, stats: Optional[SearchStatistics] = None) -> None:
+        super().__init__()
+        self.max_goals = max_goals
+        self.max_states = max_states
+        self.stats = stats
+        # Each tree is a list [next actions, distances, frontier, settled states, order counter, changes] where next actions maps each reached state
+        # to the first action of its shortest path to the goal, and the rest is kept to resume the search
+        # (the order counter breaks the ties in the frontier so that the states are never compared).
+        # Changes is the number of edge changes the problem had reported (see Problem.report_changed_edges) when the tree was built,
+        # if more changes are reported later, the tree is outdated and is built again from scratch
+        self.trees: OrderedDict = OrderedDict()
+
+    def act(self, problem: Problem[S, A], state: S) -> A:
+        if problem.is_goal(state): return None
+        key = (problem, problem.goal)
+        tree = self.trees.get(key)
+        _, changes = problem.get_changed_edges(0)
+        if tree is None or tree[5] != changes:
+            goal = problem.goal
+            tree = self.trees[key] = [{}, {goal: 0}, [(0, 0, goal)], set(), count(1), changes]
+            if len(self.trees) > self.max_goals: self.trees.popitem(last=False)
+        else:
+            self.trees.move_to_end(key)
+        next_actions, _, _, settled, _, _ = tree
+        if state not in settled:
+            self._grow(problem, tree, state)
+        return next_actions.get(state)
+
+    # Continue the backward search until the state is settled and at least max_states states are settled (or the search is done)
+    def _grow(self, problem: Problem[S, A], tree: list, state: S) -> None:
+        next_actions, distances, frontier, settled, orders, _ = tree
+        start = time.perf_counter() if self.stats is not None else 0
+        expanded = generated = duplicates = 0
+        frontier_peak = len(frontier)
+        while frontier:
+            if self.max_states is not None and state in settled and len(settled) >= self.max_states: break
+            distance, _, node = heappop(frontier)
+            if node in settled: continue # an outdated entry
+            settled.add(node)
+            expanded += 1
+            for previous, action in problem.get_predecessors(node):
+                generated += 1
+                if previous in settled:
+                    duplicates += 1
+                    continue
+                previous_distance = distance + problem.get_cost(previous, action)
+                old = distances.get(previous)
+                if old is None or previous_distance < old:
+                    distances[previous] = previous_distance
+                    next_actions[previous] = action
+                    heappush(frontier, (previous_distance, next(orders), previous))
+                    if len(frontier) > frontier_peak: frontier_peak = len(frontier)
+                else:
+                    duplicates += 1
+        if self.stats is not None:
+            self.stats.record(expanded, generated, duplicates, frontier_peak)
+            self.stats.phases["search"] = self.stats.phases.get("search", 0) + time.perf_counter() - start
+
+# This agent plans with D* Lite: an incremental version of A* that searches backward from the goal
+# and keeps its path cost estimates (g and rhs) between the calls to "act".
+# If the problem reports changed edges (see Problem.report_changed_edges) or the agent is moved,
+# only the states whose estimates are affected by the change are expanded again instead of searching from scratch.
+# It works on problems with a single goal state "problem.goal" that implement "problem.get_predecessors(state)"
+# (see the bidirectional searches in search.py).
+# Since the search is backward, the heuristic estimates the path cost between two states: distance(problem, state, other)
+# and it must be consistent for every cost the edges can have. If it is None, no heuristic is used (zero).
+# For each state:
+#   g is the path cost to the goal computed when the state was last expanded
+#   rhs is the one step lookahead: min over the actions of (action cost + g of the successor)
+# A state is inconsistent if g != rhs and the inconsistent states are kept in the frontier
+class IncrementalSearchAgent(GoalBasedAgent[S, A]):
+    def __init__(self, distance: Optional[Callable[[Problem[S, A], S, S], float]] = None,
+                 stats: Optional[SearchStatistics] = None) -> None:
+        super().__init__()
+        self.distance = distance
+        self.stats = stats
+        self.problem: Optional[Problem[S, A]] = None
+
+    def act(self, problem: Problem[S, A], state: S) -> A:
+        if problem.is_goal(state): return None
+        if problem is not self.problem or problem.goal != self.goal:
+            self._reset(problem, state)
+        else:
+            edges, self.changes = problem.get_changed_edges(self.changes)
+            if state != self.last:
+                # The keys in the frontier were computed with the heuristic from the last state so they are raised
+                # by the distance between the last state and the current state (instead of recomputing all of them)
+                self.modifier += self._h(self.last, state)
+                self.last = state
+            # Only the source of a changed edge has a different one step lookahead
+            for source in dict.fromkeys(source for source, _ in edges):
+                self._update(source)
+        self._compute(state)
+        # Move to the successor with the lowest action cost + g
+        infinity = float('inf')
+        best, best_cost = None, infinity
+        for action in problem.get_actions(state):
+            cost = problem.get_cost(state, action) + self.g.get(problem.get_successor(state, action), infinity)
+            if cost < best_cost: best, best_cost = action, cost
+        return best
+
+    def _reset(self, problem: Problem[S, A], state: S) -> None:
+        self.problem, self.goal = problem, problem.goal
+        _, self.changes = problem.get_changed_edges()
+        self.g: Dict[S, float] = {}
+        self.rhs: Dict[S, float] = {self.goal: 0}
+        self.keys: Dict[S, Tuple[float, float]] = {} # the key of every state in the frontier (the other heap entries are outdated)
+        self.frontier: list = []
+        self.orders = count()
+        self.modifier = 0
+        self.last = state
+        self._push(self.goal, self._key(self.goal))
+
+    def _h(self, state: S, other: S) -> float:
+        return 0 if self.distance is None else self.distance(self.problem, state, other)
+
+    def _key(self, state: S) -> Tuple[float, float]:
+        infinity = float('inf')
+        value = min(self.g.get(state, infinity), self.rhs.get(state, infinity))
+        return (value + self._h(self.last, state) + self.modifier, value)
+
+    def _push(self, state: S, key: Tuple[float, float]) -> None:
+        self.keys[state] = key
+        heappush(self.frontier, (key, next(self.orders), state))
+
+    # Recompute the one step lookahead of the state and add it to the frontier if it is inconsistent
+    def _update(self, state: S) -> None:
+        problem, g = self.problem, self.g
+        infinity = float('inf')
+        if state != self.goal:
+            rhs = infinity
+            for action in problem.get_actions(state):
+                cost = problem.get_cost(state, action) + g.get(problem.get_successor(state, action), infinity)
+                if cost < rhs: rhs = cost
+            self.rhs[state] = rhs
+        self.keys.pop(state, None)
+        if g.get(state, infinity) != self.rhs.get(state, infinity):
+            self._push(state, self._key(state))
+
+    # Expand the states until the state is consistent and no state in the frontier can change its path cost
+    def _compute(self, state: S) -> None:
+        problem, g, rhs, keys, frontier = self.problem, self.g, self.rhs, self.keys, self.frontier
+        infinity = float('inf')
+        start = time.perf_counter() if self.stats is not None else 0
+        expanded = generated = 0
+        frontier_peak = len(frontier)
+        while frontier:
+            key, _, node = frontier[0]
+            if keys.get(node) != key: # an outdated entry
+                heappop(frontier)
+                continue
+            if key >= self._key(state) and rhs.get(state, infinity) == g.get(state, infinity): break
+            heappop(frontier)
+            del keys[node]
+            new_key = self._key(node)
+            if key < new_key: # the key was computed before the agent moved
+                self._push(node, new_key)
+                continue
+            expanded += 1
+            node_g, node_rhs = g.get(node, infinity), rhs.get(node, infinity)
+            if node_g > node_rhs:
+                # The path cost of the state decreased so the lookahead of each predecessor can only decrease through this state
+                g[node] = node_rhs
+                for previous, action in problem.get_predecessors(node):
+                    generated += 1
+                    cost = problem.get_cost(previous, action) + node_rhs
+                    if cost < rhs.get(previous, infinity):
+                        rhs[previous] = cost
+                        keys.pop(previous, None)
+                        if g.get(previous, infinity) != cost: self._push(previous, self._key(previous))
+            else:
+                # The path cost of the state increased so its lookahead and the lookahead of its predecessors are recomputed
+                g[node] = infinity
+                self._update(node)
+                for previous, _ in problem.get_predecessors(node):
+                    generated += 1
+                    self._update(previous)
+            if len(frontier) > frontier_peak: frontier_peak = len(frontier)
+        if self.stats is not None:
+            self.stats.record(expanded, generated, 0, frontier_peak)
+            self.stats.phases["search"] = self.stats.phases.get("search", 0) + time.perf_counter() - start
+
+# This describes one search configuration that is run by the portfolio agent
+# If heuristic is None, the search function is called as an uninformed search function
+# optimal tells the portfolio agent whether this configuration always returns an optimal-cost solution
+@dataclass(frozen=True)
+class PortfolioConfig:
+    name: str
+    search_fn: Callable[..., Solution]
+    heuristic: Optional[HeuristicFunction] = None
+    optimal: bool = False
+
+# This holds how a single configuration did during the last portfolio search
+# status is one of: "won", "solved", "no solution", "error", "cancelled"
+# For cancelled configurations, elapsed is the time from the start of the portfolio until the cancellation
+@dataclass
+class PortfolioResult:
+    name: str
+    status: str
+    elapsed: float
+    cost: Optional[float] = None
+    stats: Optional[SearchStatistics] = None
+    error: Optional[str] = None
+
+# Runs a configuration and returns (solution, elapsed, cost, stats, error)
+# where error is the representation of the exception raised by the search (if any)
+def _run_portfolio_config(problem: Problem, state, config: PortfolioConfig, collect_stats: bool) -> Tuple[Solution, float, Optional[float], Optional[SearchStatistics], Optional[str]]:
+    stats = SearchStatistics() if collect_stats else None
+    args = (problem, state) if config.heuristic is None else (problem, state, config.heuristic)
+    start = time.perf_counter()
+    solution, cost, error = None, None, None
+    try:
+        solution = config.search_fn(*args) if stats is None else config.search_fn(*args, stats=stats)
+        if solution is not None:
+            cost, current = 0, state
+            for action in solution:
+                cost += problem.get_cost(current, action)
+                current = problem.get_successor(current, action)
+    except Exception as exception:
+        solution, error = None, repr(exception)
+    return solution, time.perf_counter() - start, cost, stats, error
+
+# Runs the configuration at the given index and sends (index, solution, elapsed, cost, stats, error) over the connection
+# This is the entry point of the portfolio worker processes
+def _portfolio_worker(connection: Connection, problem: Problem, state, configs: Sequence[PortfolioConfig], index: int, collect_stats: bool) -> None:
+    solution, elapsed, cost, stats, error = _run_portfolio_config(problem, state, configs[index], collect_stats)
+    try:
+        connection.send((index, solution, elapsed, cost, stats, error))
+    except Exception as exception:
+        # The result could not be pickled, so only the error is sent
+        connection.send((index, None, elapsed, None, None, repr(exception)))
+    connection.close()
+
+# This agent runs a portfolio of search configurations in parallel (one process per configuration by default)
+# and uses the first solution that is good enough, then the remaining searches are cancelled.
+# A solution from an optimal configuration is accepted immediately.
+# A solution from a non-optimal configuration is accepted if no optimal configuration is still pending,
+# otherwise the agent waits for the optimal configurations to finish, or at most "grace" seconds if grace is not None.
+# If many solutions are available, the optimal ones win, then the cheaper ones, then the ones that finished first.
+# The worker processes are forked so the problem, the states and the heuristics do not need to be picklable,
+# but the solutions (the lists of actions) are sent back to this process so the actions must be picklable.
+# Where fork is not available (e.g. Windows), the configurations run one after another in this process instead
+# with the same rules, except that a running search can not be cancelled, so the grace period is only checked between the searches.
+# A worker process that dies without sending its result (e.g. killed when out of memory) is reported as an error.
+# After each search, "report" contains a PortfolioResult for every configuration (in the same order as "configs").
+class PortfolioAgent(GoalBasedAgent[S, A]):
+    def __init__(self, configs: Sequence[PortfolioConfig], processes: Optional[int] = None, grace: Optional[float] = None,
+                 stats: Optional[SearchStatistics] = None) -> None:
+        super().__init__()
+        self.configs = list(configs)
+        self.processes = processes or len(self.configs)
+        self.grace = grace
+        self.stats = stats
+        self.winner: Optional[PortfolioConfig] = None
+        self.report: List[PortfolioResult] = []
+        # The policy will store the action to do for each state so as not to search again after each observation
+        self.policy: Dict[S, A] = {}
+
+    def act(self, problem: Problem[S, A], state: S) -> A:
+        # This state is not stored in the policy, we need to search for a solution 
+        if state not in self.policy:
+            solution = self.search(problem, state)
+            # if no solution was found, we return None
+            if solution is None:
+                self.policy[state] = None
+                return None
+            # Otherwise, we go through the solution path and store the action to do in each state into the policy
+            current = state
+            for action in solution:
+                self.policy[current] = action
+                current = problem.get_successor(current, action)
+        return self.policy.get(state)
+
+    def search(self, problem: Problem[S, A], state: S) -> Solution:
+        configs = self.configs
+        forked = "fork" in multiprocessing.get_all_start_methods()
+        collect_stats = self.stats is not None
+        report: List[Optional[PortfolioResult]] = [None] * len(configs)
+        solutions: Dict[int, Solution] = {}
+        winner, deadline, done = None, None, False
+        queued = list(reversed(range(len(configs))))
+        # For every running process, we store its connection with (process, index, start time)
+        running: Dict[Connection, Tuple[Any, int, float]] = {}
+        start = time.perf_counter()
+        try:
+            while (queued or running) and not done:
+                if forked:
+                    finished = self._collect(problem, state, queued, running, deadline, collect_stats)
+                    if finished is None: break # the grace period is over
+                else:
+                    if deadline is not None and time.perf_counter() >= deadline: break # the grace period is over
+                    index = queued.pop()
+                    finished = [(index, *_run_portfolio_config(problem, state, configs[index], collect_stats))]
+                for index, solution, elapsed, cost, stats, error in finished:
+                    name = configs[index].name
+                    if error is not None:
+                        report[index] = PortfolioResult(name, "error", elapsed, stats=stats, error=error)
+                        continue
+                    if solution is None:
+                        report[index] = PortfolioResult(name, "no solution", elapsed, stats=stats)
+                        continue
+                    report[index] = PortfolioResult(name, "solved", elapsed, cost, stats)
+                    solutions[index] = solution
+                    if winner is None or self._better(report, index, winner):
+                        winner = index
+                # Stop if the best solution is optimal or no optimal configuration is still pending
+                if winner is not None:
+                    pending = queued + [index for _, index, _ in running.values()]
+                    if configs[winner].optimal or not any(configs[other].optimal for other in pending):
+                        done = True
+                    elif deadline is None and self.grace is not None:
+                        deadline = time.perf_counter() + self.grace
+        finally:
+            # Cancel the searches that are still running
+            for receiver, (process, *_) in running.items():
+                process.kill()
+                process.join()
+                receiver.close()
+        cancelled = time.perf_counter() - start
+        self.report = [result or PortfolioResult(config.name, "cancelled", cancelled) for config, result in zip(configs, report)]
+        self.winner = None
+        if winner is None:
+            return None
+        self.winner = configs[winner]
+        self.report[winner].status = "won"
+        if self.stats is not None and self.report[winner].stats is not None:
+            self.stats.merge(self.report[winner].stats)
+        return solutions[winner]
+
+    # Starts forked worker processes for the queued configurations while there are free workers, then waits until the deadline
+    # for some of the running processes to finish and returns their results as (index, solution, elapsed, cost, stats, error)
+    # Returns None if no process finished before the deadline
+    def _collect(self, problem: Problem[S, A], state: S, queued: List[int], running: Dict[Connection, Tuple[Any, int, float]],
+                 deadline: Optional[float], collect_stats: bool) -> Optional[List[tuple]]:
+        context = multiprocessing.get_context("fork")
+        while queued and len(running) < self.processes:
+            index = queued.pop()
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_portfolio_worker, args=(sender, problem, state, self.configs, index, collect_stats), daemon=True)
+            process.start()
+            sender.close()
+            running[receiver] = (process, index, time.perf_counter())
+        timeout = None if deadline is None else max(0, deadline - time.perf_counter())
+        ready = wait(list(running.keys()), timeout)
+        if not ready: return None
+        finished = []
+        for receiver in ready:
+            process, index, process_start = running.pop(receiver)
+            try:
+                finished.append(receiver.recv())
+            except EOFError:
+                # The process died without sending its result
+                process.join()
+                finished.append((index, None, time.perf_counter() - process_start, None, None,
+                                 f"the worker process died with exit code {process.exitcode}"))
+            receiver.close()
+            process.join()
+        return finished
+
+    # Checks if the solution at index is better than the solution at other
+    # Ties in optimality and cost are won by the solution that arrived first (which is "other")
+    def _better(self, report: List[PortfolioResult], index: int, other: int) -> bool:
+        optimal, other_optimal = self.configs[index].optimal, self.configs[other].optimal
+        if optimal != other_optimal:
+            return optimal
+        return report[index].cost < report[other].cost
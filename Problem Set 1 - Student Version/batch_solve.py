@@ -0,0 +1,256 @@
+from typing import Any, Dict, List, Optional, Tuple
+from multiprocessing.connection import Connection, wait
+from search_statistics import SearchStatistics
+import argparse, json, multiprocessing, os, sys, time
+
+try:
+    import resource # Only available on POSIX, without it the memory budget is not applied
+except ImportError:
+    resource = None
+
+# This script solves every problem file in the given files and directories using a pool of worker processes
+# Each problem file is solved in its own process so that a crash, a timeout or running out of memory
+# only affects that problem file (where fork is not available, the files are solved one after another in this process). For each problem file, one JSON line is written to the output as soon as it is done:
+#   {"file": ..., "kind": ..., "agent": ..., "status": ..., "length": ..., "cost": ..., "expanded": ..., "seconds": ...}
+# where status is one of: "solved", "no solution", "timeout", "memory", "error", "crashed"
+# For the "error" and "crashed" statuses, the record also contains an "error" message
+
+SOKOBAN_TILES = set("# $.@*+")
+PARKING_TILES = set("#.ABCDEFGHIJ0123456789")
+
+# Find the kind of problem stored in a file ("sokoban", "parking", "graph" or "csr") or None if it is not a problem file
+# Graphs are JSON files with a "graph" object and the "start" and "goal" node names (see GraphRoutingProblem.from_file)
+# or binary CSR files (see csr_graph.py), sokoban levels only contain sokoban tiles including a player
+# and parking lots only contain walls, passages, cars and slots
+# The other files (such as the graph figures, the benchmark baselines and the test case files) are skipped
+def detect_kind(path: str) -> Optional[str]:
+    if path.endswith(".json"):
+        try:
+            with open(path, 'r') as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if isinstance(content, dict) and isinstance(content.get("graph"), dict) and content.get("start") in content["graph"] \
+                and content.get("goal") in content["graph"]:
+            return "graph"
+        return None
+    if path.endswith(".csrg"):
+        return "csr"
+    if not path.endswith(".txt"):
+        return None
+    with open(path, 'r') as f:
+        lines = [line.rstrip() for line in f.read().splitlines() if line.strip()]
+    if not lines:
+        return None
+    if all(set(line) <= SOKOBAN_TILES for line in lines) and any(char in "@+" for line in lines for char in line):
+        return "sokoban"
+    lines = [line.strip() for line in lines]
+    if all(set(line) <= PARKING_TILES for line in lines) and any(char in "ABCDEFGHIJ" for line in lines for char in line):
+        return "parking"
+    return None
+
+# List the problem files in the given paths (directories are searched recursively) as (path, kind) pairs
+def collect_files(paths: List[str], kind: str) -> List[Tuple[str, str]]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        else:
+            candidates = [path]
+        for candidate in candidates:
+            file_kind = detect_kind(candidate) if kind == "auto" else kind
+            if file_kind is not None:
+                files.append((candidate, file_kind))
+    return files
+
+# Read the problem from the file
+def load_problem(path: str, kind: str, packed: bool):
+    if kind == "sokoban":
+        from sokoban import SokobanProblem, PackedSokobanProblem
+        return (PackedSokobanProblem if packed else SokobanProblem).from_file(path)
+    if kind == "parking":
+        from parking import ParkingProblem, PackedParkingProblem
+        return (PackedParkingProblem if packed else ParkingProblem).from_file(path)
+    if kind == "graph":
+        from graph import GraphRoutingProblem
+        return GraphRoutingProblem.from_file(path)
+    if kind == "csr":
+        from csr_graph import CSRGraphRoutingProblem
+        return CSRGraphRoutingProblem.from_file(path)
+    raise ValueError(f"Unknown problem kind '{kind}'")
+
+# Return the heuristic for the given problem kind
+# The heuristic name is only used for sokoban, graphs always use the graph routing heuristic
+# and parking problems always use the pattern database heuristic (unless "zero" is requested)
+def get_heuristic(kind: str, name: str, packed: bool):
+    from helpers.utils import memoized
+    zero = lambda *_: 0
+    if name == "zero":
+        return zero
+    if kind == "parking":
+        from parking_heuristic import pattern_database_heuristic
+        return pattern_database_heuristic
+    if kind == "graph":
+        from graph import graphrouting_heuristic
+        return graphrouting_heuristic
+    if kind == "csr":
+        from csr_graph import csr_graphrouting_heuristic
+        return csr_graphrouting_heuristic
+    import sokoban_heuristic
+    from sokoban import unpacked_heuristic
+    heuristic = {"weak": sokoban_heuristic.weak_heuristic, "strong": sokoban_heuristic.strong_heuristic}[name]
+    # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+    return memoized(unpacked_heuristic(heuristic) if packed else heuristic)
+
+# Return the search function for the requested agent and whether it needs a heuristic
+def get_search_function(agent: str):
+    import search
+    return {
+        "bfs": (search.BreadthFirstSearch, False),
+        "dfs": (search.DepthFirstSearch, False),
+        "ucs": (search.UniformCostSearch, False),
+        "bidir": (search.BidirectionalUniformCostSearch, False),
+        "astar": (search.AStarSearch, True),
+        "gbfs": (search.BestFirstSearch, True),
+        "idastar": (search.IterativeDeepeningAStarSearch, True),
+        "rbfs": (search.RecursiveBestFirstSearch, True),
+    }[agent]
+
+# Solve a single problem file and return its record
+def solve(path: str, kind: str, args: argparse.Namespace) -> Dict[str, Any]:
+    record = {"file": path, "kind": kind, "agent": args.agent}
+    problem = load_problem(path, kind, args.packed)
+    state = problem.get_initial_state()
+    search_fn, informed = get_search_function(args.agent)
+    stats = SearchStatistics()
+    start = time.perf_counter()
+    if informed:
+        solution = search_fn(problem, state, get_heuristic(kind, args.heuristic, args.packed), stats=stats)
+    else:
+        solution = search_fn(problem, state, stats=stats)
+    seconds = time.perf_counter() - start
+    # The search functions return None if the initial state is a goal, so we check it here
+    if solution is None and problem.is_goal(state):
+        solution = []
+    if solution is None:
+        record.update(status="no solution", length=None, cost=None, expanded=stats.expanded, seconds=seconds)
+        return record
+    cost = 0
+    for action in solution:
+        cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+    record.update(status="solved", length=len(solution), cost=cost, expanded=stats.expanded, seconds=seconds)
+    return record
+
+# Solve the problem file and return its record, the exceptions are reported in the record
+def solve_safely(path: str, kind: str, args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        return solve(path, kind, args)
+    except MemoryError:
+        return {"file": path, "kind": kind, "agent": args.agent, "status": "memory"}
+    except Exception as error:
+        return {"file": path, "kind": kind, "agent": args.agent, "status": "error", "error": repr(error)}
+
+# This is the entry point of the worker process, it sends the record of the problem file over the connection
+def worker(connection: Connection, path: str, kind: str, args: argparse.Namespace) -> None:
+    if resource is not None and args.memory_limit > 0:
+        limit = args.memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    connection.send(solve_safely(path, kind, args))
+    connection.close()
+
+def main(args: argparse.Namespace):
+    files = collect_files(args.paths, args.kind)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    def write(record: Dict[str, Any]):
+        output.write(json.dumps(record) + "\n")
+        output.flush()
+    # The worker processes are forked so that they start quickly and inherit the loaded modules
+    # Where fork is not available (e.g. Windows), the problem files are solved one after another in this process instead,
+    # so the time and memory limits are not applied and a crash stops the whole run
+    if "fork" not in multiprocessing.get_all_start_methods():
+        print("Fork is not available, the problem files are solved in this process without the time and memory limits", file=sys.stderr)
+        try:
+            for path, kind in files:
+                write(solve_safely(path, kind, args))
+        finally:
+            if output is not sys.stdout: output.close()
+        return
+    context = multiprocessing.get_context("fork")
+    workers = args.workers or os.cpu_count() or 1
+    pending = list(reversed(files))
+    # For every running process, we store its connection with (process, path, kind, start time)
+    running: Dict[Connection, Tuple[Any, str, str, float]] = {}
+    try:
+        while pending or running:
+            # Start new processes while there are free workers
+            while pending and len(running) < workers:
+                path, kind = pending.pop()
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=worker, args=(sender, path, kind, args), daemon=True)
+                process.start()
+                sender.close()
+                running[receiver] = (process, path, kind, time.perf_counter())
+            # Wait until a process is done or the nearest deadline is reached
+            timeout = None
+            if args.time_limit > 0:
+                timeout = max(0, min(start for *_, start in running.values()) + args.time_limit - time.perf_counter())
+            for receiver in wait(list(running.keys()), timeout):
+                process, path, kind, start = running.pop(receiver)
+                try:
+                    record = receiver.recv()
+                except EOFError:
+                    # The process died without sending a record
+                    process.join()
+                    record = {"file": path, "kind": kind, "agent": args.agent, "status": "crashed",
+                              "error": f"exit code {process.exitcode}", "seconds": time.perf_counter() - start}
+                receiver.close()
+                process.join()
+                write(record)
+            # Kill the processes that went over the time budget
+            if args.time_limit > 0:
+                now = time.perf_counter()
+                for receiver, (process, path, kind, start) in list(running.items()):
+                    if now - start >= args.time_limit:
+                        process.kill()
+                        process.join()
+                        receiver.close()
+                        del running[receiver]
+                        write({"file": path, "kind": kind, "agent": args.agent, "status": "timeout", "seconds": now - start})
+    finally:
+        for receiver, (process, *_) in running.items():
+            process.kill()
+            process.join()
+            receiver.close()
+        if output is not sys.stdout: output.close()
+
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Solve many problem files in parallel and write one JSON line per file")
+    parser.add_argument("paths", nargs="+", help="the problem files and directories to solve")
+    parser.add_argument("--agent", "-a", default="astar",
+                        choices=['bfs', 'dfs', 'ucs', 'bidir', 'astar', 'gbfs', 'idastar', 'rbfs'],
+                        help="the search algorithm used to solve the problems")
+    parser.add_argument("--heuristic", '-hf', default="strong",
+                        choices=["zero", "weak", "strong"],
+                        help="the sokoban heuristic used by the informed search algorithms")
+    parser.add_argument("--kind", "-k", default="auto",
+                        choices=["auto", "sokoban", "parking", "graph", "csr"],
+                        help="the kind of the problem files (auto detects it from each file)")
+    parser.add_argument("--packed", "-p", action="store_true", default=False,
+                        help="Search on packed integer states for sokoban and parking problems (faster)")
+    parser.add_argument("--workers", "-j", type=int, default=None,
+                        help="the number of problems solved in parallel (default: the number of CPUs)")
+    parser.add_argument("--time-limit", "-t", type=float, default=60,
+                        help="the time budget of each problem in seconds (0 disables the limit)")
+    parser.add_argument("--memory-limit", "-m", type=int, default=0,
+                        help="the memory budget of each problem in megabytes (0 disables the limit)")
+    parser.add_argument("--output", "-o", default=None,
+                        help="the file to which the JSON lines are written (default: the standard output)")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!", file=sys.stderr)
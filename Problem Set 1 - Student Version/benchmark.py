@@ -0,0 +1,354 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass, asdict
+from multiprocessing.connection import Connection, wait
+from search_statistics import SearchStatistics
+import argparse, json, math, multiprocessing, os, platform, random, statistics, sys, time
+
+try:
+    import resource # Only available on POSIX, without it the peak memory is not measured
+except ImportError:
+    resource = None
+
+# This script runs a fixed suite of search benchmarks and compares the results with a stored baseline
+# Each case runs a search function on a problem (a shipped graph, level or parking lot or a generated larger instance)
+# in its own forked process, and records the wall time, the number of expanded nodes, the peak memory (RSS) growth
+# of the process over its memory right after the fork (which includes the parent's memory) and the solution cost. The cases run one at a time so that they do not disturb each other's timings.
+#
+# To compare the results, the times are divided by the speed multiplier of the machine (see speed_test.py)
+# and a case regresses if:
+#   its status changes (for example from "solved" to "timeout")
+#   its solution cost increases or it expands more nodes (these are deterministic)
+#   its time exceeds baseline * (1 + time tolerance) + max(time slack, 2 * (baseline spread + current spread))
+#       where the spread is the difference between the slowest and the fastest repeat (this is the measured noise)
+#   its peak memory exceeds baseline * (1 + memory tolerance) + memory slack
+#
+# Typical usage:
+#   python benchmark.py --save-baseline      (run the suite and store the results as the baseline)
+#   python benchmark.py                      (run the suite, compare with the baseline and fail on regressions)
+#   python benchmark.py --filter level1      (only run the cases whose name contains "level1")
+
+BASELINE_PATH = "benchmark_baseline.json"
+
+# A benchmark case runs the search named "search" on the problem described by "source"
+# The source is either a problem file or a generated instance written as "generator:arguments" (see GENERATORS)
+@dataclass(frozen=True)
+class BenchmarkCase:
+    source: str
+    kind: str       # "sokoban", "parking" or "graph"
+    search: str     # a key of SEARCHES
+
+    @property
+    def name(self) -> str:
+        return f"{self.source}:{self.search}"
+
+# The search functions by name: (search function, whether it needs a heuristic)
+# The time limit of ARA* is infinite so it always runs until its solution is optimal (and its results are deterministic)
+# The ALT heuristic (alt) and the contraction hierarchy (ch) are built in memory by the first call, so their time includes the preprocessing
+# The agents that plan step by step (tree and dstar) run from the initial state to the goal (see agent_search)
+# The zobrist variants run the same search with the Zobrist hashes of the states (see zobrist.py) to compare them with the native hashes
+def get_searches() -> Dict[str, Tuple[Callable, bool]]:
+    import search
+    from functools import partial
+    from agents import ShortestPathTreeAgent, IncrementalSearchAgent
+    from contraction_hierarchy import ContractionHierarchySearch
+    from graph import graphrouting_distance
+    from graph_landmarks import landmark_heuristic
+    from sokoban import push_level_search
+    from zobrist import zobrist_search
+    return {
+        "bfs": (search.BreadthFirstSearch, False),
+        "dfs": (search.DepthFirstSearch, False),
+        "ucs": (search.UniformCostSearch, False),
+        "bidir": (search.BidirectionalUniformCostSearch, False),
+        "bidir-bfs": (search.BidirectionalBreadthFirstSearch, False),
+        "astar": (search.AStarSearch, True),
+        "astar-zobrist": (zobrist_search(search.AStarSearch), True),
+        "alt": (partial(search.AStarSearch, heuristic=landmark_heuristic), False),
+        "ch": (ContractionHierarchySearch, False),
+        "gbfs": (search.BestFirstSearch, True),
+        "wastar": (search.WeightedAStarSearch, True),
+        "arastar": (partial(search.AnytimeRepairingAStarSearch, time_limit=math.inf), True),
+        "idastar": (search.IterativeDeepeningAStarSearch, True),
+        "idastar-table": (partial(search.IterativeDeepeningAStarSearch, table_size=1 << 16), True),
+        "idastar-zobrist": (partial(search.IterativeDeepeningAStarSearch, table_size=1 << 16, zobrist=True), True),
+        "rbfs": (search.RecursiveBestFirstSearch, True),
+        "push-astar": (push_level_search(search.AStarSearch), True),
+        "tree": (agent_search(ShortestPathTreeAgent), False),
+        "dstar": (agent_search(IncrementalSearchAgent, graphrouting_distance), False),
+    }
+
+# Wrap an agent class as a search function that creates the agent and calls "act" until the goal is reached
+# It returns the actions taken by the agent (or None if the agent finds no action)
+def agent_search(agent_class: Callable, *args) -> Callable:
+    def search(problem, state, stats: Optional[SearchStatistics] = None):
+        if problem.is_goal(state): return None
+        agent = agent_class(*args, stats=stats)
+        solution = []
+        while not problem.is_goal(state):
+            action = agent.act(problem, state)
+            if action is None: return None
+            solution.append(action)
+            state = problem.get_successor(state, action)
+        return solution
+    return search
+
+# The following functions generate larger instances than the shipped ones, they are deterministic for a given seed
+
+# A grid graph where every node is connected to its 4 neighbors, some edges are removed (in both directions)
+# and the node positions are jittered so that the costs differ. The start and the goal are opposite corners.
+def generate_grid_graph(width: int, height: int, seed: int = 0):
+    from graph import GraphRoutingProblem, GraphNode
+    from mathutils import Point
+    generator = random.Random(seed)
+    nodes = {(x, y): GraphNode(f"n{x}_{y}", Point(x * 10 + generator.randint(-3, 3), y * 10 + generator.randint(-3, 3)))
+             for x in range(width) for y in range(height)}
+    adjacency = {node: [] for node in nodes.values()}
+    for (x, y), node in nodes.items():
+        for neighbor in ((x + 1, y), (x, y + 1)):
+            # The edges along the border are always kept so that the goal is always reachable
+            if neighbor in nodes and (x in (0, width - 1) or y in (0, height - 1) or generator.random() >= 0.2):
+                adjacency[node].append(nodes[neighbor])
+                adjacency[nodes[neighbor]].append(node)
+    for node in adjacency: adjacency[node].sort(key=lambda other: other.name)
+    return GraphRoutingProblem(nodes[(0, 0)], nodes[(width - 1, height - 1)], adjacency)
+
+# An open sokoban room where the crates and the goals are placed away from the walls (so no crate starts on a dead square)
+def generate_sokoban_room(width: int, height: int, crates: int, seed: int = 0):
+    from sokoban import SokobanProblem
+    generator = random.Random(seed)
+    inner = [(x, y) for x in range(2, width - 2) for y in range(2, height - 2)]
+    cells = generator.sample(inner, 2 * crates)
+    grid = [["#" if x in (0, width - 1) or y in (0, height - 1) else " " for x in range(width)] for y in range(height)]
+    for x, y in cells[:crates]: grid[y][x] = "$"
+    for x, y in cells[crates:]: grid[y][x] = "."
+    player = next((x, y) for x in range(1, width - 1) for y in range(1, height - 1) if grid[y][x] == " ")
+    grid[player[1]][player[0]] = "@"
+    return SokobanProblem.from_text("\n".join("".join(row) for row in grid))
+
+# An open parking lot with the given number of cars and slots at random positions
+def generate_parking_lot(width: int, height: int, cars: int, seed: int = 0):
+    from parking import ParkingProblem
+    generator = random.Random(seed)
+    inner = [(x, y) for x in range(1, width - 1) for y in range(1, height - 1)]
+    cells = generator.sample(inner, 2 * cars)
+    grid = [["#" if x in (0, width - 1) or y in (0, height - 1) else "." for x in range(width)] for y in range(height)]
+    for car, (x, y) in enumerate(cells[:cars]): grid[y][x] = chr(ord('A') + car)
+    for car, (x, y) in enumerate(cells[cars:]): grid[y][x] = str(car)
+    return ParkingProblem.from_text("\n".join("".join(row) for row in grid))
+
+# The generators by name, the arguments in the source are integers separated by "x" (for example "grid:80x80x1")
+GENERATORS: Dict[str, Callable] = {
+    "grid": generate_grid_graph,
+    "room": generate_sokoban_room,
+    "lot": generate_parking_lot,
+}
+
+# The benchmark suite: the slow searches only run on the small instances
+# Every search of get_searches is included, the graph searches and agents only run on graphs and push-astar only runs on sokoban
+def get_suite() -> List[BenchmarkCase]:
+    all_graph = ["bfs", "dfs", "ucs", "bidir", "bidir-bfs", "astar", "alt", "ch", "gbfs", "wastar", "arastar", "idastar", "rbfs", "tree", "dstar"]
+    all_sokoban = ["bfs", "dfs", "ucs", "astar", "gbfs", "wastar", "arastar", "idastar", "rbfs"]
+    cases = []
+    add = lambda sources, kind, searches: cases.extend(BenchmarkCase(source, kind, search) for source in sources for search in searches)
+    add([f"graphs/graph{index}.json" for index in range(1, 7)], "graph", all_graph)
+    add(["levels/level1.txt"], "sokoban", all_sokoban + ["push-astar"])
+    add(["levels/level2.txt"], "sokoban", ["bfs", "dfs", "ucs", "astar", "gbfs", "wastar", "arastar", "push-astar"])
+    add(["levels/level3.txt", "levels/level4.txt"], "sokoban", ["astar", "gbfs", "wastar", "push-astar"])
+    add([f"parks/park{index}.txt" for index in range(1, 6)], "parking", ["bfs", "dfs", "ucs", "astar", "gbfs", "wastar", "arastar"])
+    add(["grid:80x80x1"], "graph", ["bfs", "ucs", "bidir", "bidir-bfs", "astar", "alt", "gbfs", "wastar", "arastar", "tree", "dstar"])
+    # Building the contraction hierarchy of the 80x80 grid takes too long, so it runs on a smaller grid
+    add(["grid:30x30x1"], "graph", ["ucs", "astar", "ch"])
+    add(["room:10x9x3x1"], "sokoban", ["bfs", "astar", "gbfs", "push-astar"])
+    add(["lot:7x6x4x1"], "parking", ["astar", "gbfs", "wastar"])
+    # The Zobrist hashes (see zobrist.py) are compared with the native hashes of the same searches
+    add(["levels/level1.txt", "levels/level2.txt", "levels/level3.txt"], "sokoban", ["astar-zobrist", "idastar-table", "idastar-zobrist"])
+    add([f"parks/park{index}.txt" for index in range(1, 6)] + ["lot:7x6x4x1"], "parking", ["astar-zobrist", "idastar-table", "idastar-zobrist"])
+    return cases
+
+def load_case_problem(case: BenchmarkCase):
+    if ":" in case.source:
+        generator, arguments = case.source.split(":", 1)
+        return GENERATORS[generator](*(int(argument) for argument in arguments.split("x")))
+    from batch_solve import load_problem
+    return load_problem(case.source, case.kind, False)
+
+# The heuristic of each kind of problem (the pattern databases are not stored on disk so that every run builds them)
+def get_case_heuristic(kind: str):
+    if kind == "sokoban":
+        from sokoban_heuristic import strong_heuristic
+        from helpers.utils import memoized
+        return memoized(strong_heuristic)
+    if kind == "parking":
+        from parking_heuristic import pattern_database_heuristic_with
+        return pattern_database_heuristic_with(2, None)
+    from graph import graphrouting_heuristic
+    return graphrouting_heuristic
+
+# Run a case once and return (status, seconds, expanded, cost, length)
+def run_case(case: BenchmarkCase) -> Tuple[str, float, int, Optional[float], Optional[int]]:
+    problem = load_case_problem(case)
+    state = problem.get_initial_state()
+    search_fn, informed = get_searches()[case.search]
+    stats = SearchStatistics()
+    start = time.perf_counter()
+    if informed:
+        solution = search_fn(problem, state, get_case_heuristic(case.kind), stats=stats)
+    else:
+        solution = search_fn(problem, state, stats=stats)
+    seconds = time.perf_counter() - start
+    if solution is None: return "no solution", seconds, stats.expanded, None, None
+    cost = 0
+    for action in solution:
+        cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+    return "solved", seconds, stats.expanded, cost, len(solution)
+
+# This is the entry point of the process of a case, it sends the result and the peak memory (in megabytes) over the connection
+# The forked process starts with the memory of the parent, so the peak memory is measured from the peak right after the fork
+def case_worker(connection: Connection, case: BenchmarkCase) -> None:
+    peak_at_fork = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else 0
+    try:
+        result = run_case(case)
+    except MemoryError:
+        result = ("memory", 0, 0, None, None)
+    except Exception as error:
+        result = ("error: " + repr(error), 0, 0, None, None)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = 0
+    if resource is not None:
+        peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - peak_at_fork) / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    connection.send(result + (peak,))
+    connection.close()
+
+# Run a case in a forked process with a time limit and return (status, seconds, expanded, cost, length, peak memory)
+def run_isolated(case: BenchmarkCase, time_limit: float) -> Tuple[str, float, int, Optional[float], Optional[int], float]:
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=case_worker, args=(sender, case), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        if not wait([receiver], time_limit if time_limit > 0 else None):
+            process.kill()
+            return "timeout", time_limit, 0, None, None, 0
+        try:
+            return receiver.recv()
+        except EOFError:
+            return f"crashed: exit code {process.exitcode}", 0, 0, None, None, 0
+    finally:
+        process.join()
+        receiver.close()
+
+# Run the case "repeat" times and return its record (the time is the median, the other values come from the first run)
+def benchmark_case(case: BenchmarkCase, repeat: int, time_limit: float, multiplier: float) -> Dict[str, Any]:
+    runs = [run_isolated(case, time_limit)]
+    while len(runs) < repeat and runs[0][0] == "solved":
+        runs.append(run_isolated(case, time_limit))
+    status, _, expanded, cost, length, _ = runs[0]
+    times = [run[1] / multiplier for run in runs]
+    return {
+        **asdict(case), "status": status, "expanded": expanded, "cost": cost, "length": length,
+        "seconds": statistics.median(times), "spread": max(times) - min(times), "repeats": len(runs),
+        "peak_rss_mb": max(run[5] for run in runs),
+    }
+
+# Compare the results with the baseline and return a list of (case name, message, is regression)
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], args: argparse.Namespace) -> List[Tuple[str, str, bool]]:
+    findings = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            findings.append((name, "new case (not in the baseline)", False))
+            continue
+        if result["status"] != base["status"]:
+            findings.append((name, f"status changed from '{base['status']}' to '{result['status']}'", True))
+            continue
+        if result["status"] != "solved": continue
+        if result["cost"] > base["cost"] + 1e-9 * max(1, abs(base["cost"])):
+            findings.append((name, f"cost increased from {base['cost']} to {result['cost']}", True))
+        elif result["cost"] < base["cost"] - 1e-9 * max(1, abs(base["cost"])):
+            findings.append((name, f"cost decreased from {base['cost']} to {result['cost']}", False))
+        if result["expanded"] > base["expanded"]:
+            findings.append((name, f"expanded nodes increased from {base['expanded']} to {result['expanded']}", True))
+        elif result["expanded"] < base["expanded"]:
+            findings.append((name, f"expanded nodes decreased from {base['expanded']} to {result['expanded']}", False))
+        noise = max(args.time_slack, 2 * (base["spread"] + result["spread"]))
+        if result["seconds"] > base["seconds"] * (1 + args.time_tolerance) + noise:
+            findings.append((name, f"time increased from {base['seconds']:.4f} to {result['seconds']:.4f} seconds", True))
+        elif result["seconds"] < base["seconds"] / (1 + args.time_tolerance) - noise:
+            findings.append((name, f"time decreased from {base['seconds']:.4f} to {result['seconds']:.4f} seconds", False))
+        if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + args.memory_tolerance) + args.memory_slack:
+            findings.append((name, f"peak memory increased from {base['peak_rss_mb']:.1f} to {result['peak_rss_mb']:.1f} MB", True))
+    for name in baseline:
+        if name not in results and (not args.filter or args.filter in name):
+            findings.append((name, "missing case (in the baseline but not in the suite)", False))
+    return findings
+
+def main(args: argparse.Namespace):
+    from speed_test import get_time_limit_multiplier
+    multiplier = get_time_limit_multiplier()
+    cases = [case for case in get_suite() if not args.filter or args.filter in case.name]
+    results = {}
+    for case in cases:
+        record = results[case.name] = benchmark_case(case, args.repeat, args.time_limit, multiplier)
+        cost = "" if record["cost"] is None else f", cost {record['cost']:.4g}"
+        print(f"{case.name}: {record['status']} in {record['seconds']:.4f} seconds (±{record['spread']:.4f}), "
+              f"expanded {record['expanded']}, peak {record['peak_rss_mb']:.1f} MB{cost}", flush=True)
+    report = {"multiplier": multiplier, "python": platform.python_version(), "results": results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        # When only a part of the suite runs, the other cases of the baseline are kept
+        baseline = {}
+        if args.filter and os.path.exists(args.baseline):
+            with open(args.baseline, 'r') as f:
+                baseline = json.load(f)["results"]
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({**report, "results": baseline}, f, indent=2)
+        print(f"Saved the baseline to '{args.baseline}'")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"There is no baseline at '{args.baseline}', use --save-baseline to create it")
+        return
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)["results"]
+    findings = compare(results, baseline, args)
+    regressions = [finding for finding in findings if finding[2]]
+    for name, message, regression in findings:
+        print(f"{'REGRESSION' if regression else 'note'}: {name}: {message}")
+    print(f"{len(regressions)} regressions in {len(results)} cases")
+    exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Run the search benchmarks and compare them with the baseline")
+    parser.add_argument("--filter", "-f", default="",
+                        help="only run the cases whose name (source:search) contains this text")
+    parser.add_argument("--repeat", "-r", type=int, default=3,
+                        help="the number of times each case runs (the median time is used)")
+    parser.add_argument("--time-limit", "-t", type=float, default=60,
+                        help="the time budget of each run in seconds (0 disables the limit)")
+    parser.add_argument("--baseline", "-b", default=BASELINE_PATH,
+                        help="the baseline file")
+    parser.add_argument("--save-baseline", "-s", action="store_true", default=False,
+                        help="store the results as the baseline instead of comparing them")
+    parser.add_argument("--output", "-o", default=None,
+                        help="the file to which the results are written as JSON")
+    parser.add_argument("--time-tolerance", type=float, default=0.25,
+                        help="the allowed relative increase of the time")
+    parser.add_argument("--time-slack", type=float, default=0.05,
+                        help="the minimum allowed absolute increase of the time in seconds")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25,
+                        help="the allowed relative increase of the peak memory")
+    parser.add_argument("--memory-slack", type=float, default=8,
+                        help="the allowed absolute increase of the peak memory in megabytes")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!", file=sys.stderr)
@@ -0,0 +1,307 @@
+from typing import Dict, List, Optional, Tuple, Union
+from array import array
+from bisect import bisect_left
+from heapq import heappush, heappop
+from problem import Solution
+from graph import GraphRoutingProblem, GraphNode
+from csr_graph import CSRGraphRoutingProblem
+from graph_index import IndexedGraph, get_indexed_graph, file_stamp
+from search_statistics import SearchStatistics
+import os, struct, time
+
+# This file implements contraction hierarchies for answering many routing queries on the same graph
+# The preprocessing contracts the nodes one by one (from the least important to the most important):
+# when a node v is contracted, for every pair of edges u -> v -> w between nodes that are not contracted yet,
+# a shortcut edge u -> w (with the cost of the two edges) is added unless a witness search finds another path
+# from u to w that is not longer and does not go through v. The order in which the node is contracted is its rank.
+# After the preprocessing, the shortest path between any two nodes goes up the ranks and then down the ranks,
+# so the query runs two searches that only follow the edges to higher ranked nodes:
+# a forward search from the start and a backward search (on the reversed edges) from the goal.
+# Each shortcut remembers the node it skips (the middle node) so the path can be unpacked to the original edges.
+
+CH_MAGIC = b"CHIERARC"
+CH_VERSION = 1
+# The header contains: magic, version, padding, node count, upward edge count, downward edge count,
+# graph file size and graph file modification time
+CH_HEADER = struct.Struct("<8sIIqqqqq")
+
+# The contraction hierarchy of a graph (all the node ids are the ids of the IndexedGraph)
+#   up:   up_offsets, up_targets, up_costs, up_middles store the edges v -> w where w is ranked higher than v
+#   down: down_offsets, down_sources, down_costs, down_middles store the edges u -> v where u is ranked higher than v
+#         (they are stored at v since the backward search goes from v to u)
+# The middle is the skipped node for shortcuts and -1 for original edges. The edges of each node are sorted by the other node.
+class ContractionHierarchy:
+    def __init__(self, node_count: int, up: Tuple[array, array, array, array], down: Tuple[array, array, array, array]) -> None:
+        self.node_count = node_count
+        self.up_offsets, self.up_targets, self.up_costs, self.up_middles = up
+        self.down_offsets, self.down_sources, self.down_costs, self.down_middles = down
+
+    def save(self, path: str, graph_stamp: Tuple[int, int] = (0, 0)) -> None:
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as f:
+            f.write(CH_HEADER.pack(CH_MAGIC, CH_VERSION, 0, self.node_count, len(self.up_targets), len(self.down_sources), *graph_stamp))
+            for table in (self.up_offsets, self.up_targets, self.up_costs, self.up_middles,
+                          self.down_offsets, self.down_sources, self.down_costs, self.down_middles):
+                table.tofile(f)
+        os.replace(temporary_path, path)
+
+    # Load the hierarchy from a file, returns None if the file does not exist or does not match the given node count and stamp
+    @staticmethod
+    def load(path: str, node_count: int, graph_stamp: Tuple[int, int] = (0, 0)) -> Optional['ContractionHierarchy']:
+        if not os.path.exists(path): return None
+        with open(path, 'rb') as f:
+            header = f.read(CH_HEADER.size)
+            if len(header) != CH_HEADER.size: return None
+            magic, version, _, stored_nodes, up_count, down_count, *stored_stamp = CH_HEADER.unpack(header)
+            if (magic, version, stored_nodes, tuple(stored_stamp)) != (CH_MAGIC, CH_VERSION, node_count, graph_stamp):
+                return None
+            tables = []
+            for count in (up_count, down_count):
+                offsets, others, costs, middles = array('q'), array('I'), array('d'), array('q')
+                offsets.fromfile(f, node_count + 1)
+                others.fromfile(f, count)
+                costs.fromfile(f, count)
+                middles.fromfile(f, count)
+                tables.append((offsets, others, costs, middles))
+        return ContractionHierarchy(node_count, *tables)
+
+    # The upward and downward edges as lists of (other node, cost, middle) for each node, they are faster to iterate than the arrays
+    # They are built on the first query
+    def _adjacency(self) -> Tuple[List[Tuple[Tuple[int, float, int]]], List[Tuple[Tuple[int, float, int]]]]:
+        adjacency = getattr(self, "_lists", None)
+        if adjacency is None:
+            adjacency = self._lists = tuple(
+                [tuple(zip(others[offsets[node]:offsets[node + 1]], costs[offsets[node]:offsets[node + 1]], middles[offsets[node]:offsets[node + 1]]))
+                 for node in range(self.node_count)]
+                for offsets, others, costs, middles in (
+                    (self.up_offsets, self.up_targets, self.up_costs, self.up_middles),
+                    (self.down_offsets, self.down_sources, self.down_costs, self.down_middles),
+                )
+            )
+        return adjacency
+
+    # Returns (cost, middle) of the edge from "source" to "target" that is stored at "node" (or None if there is no such edge)
+    def _edge(self, offsets: array, others: array, costs: array, middles: array, node: int, other: int) -> Optional[Tuple[float, int]]:
+        start, end = offsets[node], offsets[node + 1]
+        index = bisect_left(others, other, start, end)
+        if index < end and others[index] == other:
+            return costs[index], middles[index]
+        return None
+
+    # Unpack the edge from u to w (with the given middle node) to the list of original nodes after u (ending with w)
+    def unpack(self, u: int, w: int, middle: int) -> List[int]:
+        path = []
+        stack = [(u, w, middle)]
+        while stack:
+            u, w, middle = stack.pop()
+            if middle == -1:
+                path.append(w)
+                continue
+            # The middle node was contracted before u and w, so u -> middle is a downward edge stored at the middle
+            # and middle -> w is an upward edge stored at the middle. We push the second half first since this is a stack.
+            _, second = self._edge(self.up_offsets, self.up_targets, self.up_costs, self.up_middles, middle, w)
+            _, first = self._edge(self.down_offsets, self.down_sources, self.down_costs, self.down_middles, middle, u)
+            stack.append((middle, w, second))
+            stack.append((u, middle, first))
+        return path
+
+    # Find the shortest path from source to target and return (cost, list of node ids after the source) or None if there is no path
+    # The two searches alternate and each one stops once its lowest priority is no less than the best path found
+    def query(self, source: int, target: int, counters: Optional[List[int]] = None) -> Optional[Tuple[float, List[int]]]:
+        if source == target: return 0, []
+        infinity = float('inf')
+        sides = self._adjacency()
+        distances: Tuple[Dict[int, float], Dict[int, float]] = ({source: 0}, {target: 0})
+        # The parents store (previous node, middle) where the previous node is closer to the source (or the target for the backward side)
+        parents: Tuple[Dict[int, Tuple[int, int]], Dict[int, Tuple[int, int]]] = ({source: (-1, -1)}, {target: (-1, -1)})
+        frontiers = ([(0, source)], [(0, target)])
+        settled = (set(), set())
+        best, meeting = infinity, -1
+        expanded = generated = 0
+        side = 0
+        while (frontiers[0] and frontiers[0][0][0] < best) or (frontiers[1] and frontiers[1][0][0] < best):
+            # Switch to the other side if this side is done
+            if not frontiers[side] or frontiers[side][0][0] >= best: side = 1 - side
+            frontier, distance_table, parent_table, other_table = frontiers[side], distances[side], parents[side], distances[1 - side]
+            distance, node = heappop(frontier)
+            if node in settled[side]: continue # an outdated entry
+            settled[side].add(node)
+            expanded += 1
+            side, this_side = 1 - side, side
+            other_distance = other_table.get(node)
+            if other_distance is not None and distance + other_distance < best:
+                best, meeting = distance + other_distance, node
+            # Stall on demand: if a higher ranked node that this side reached has an edge to this node that gives a shorter distance,
+            # then this node is not on a shortest path from this side so we do not relax its edges
+            stalled = False
+            for other, cost, _ in sides[1 - this_side][node]:
+                if distance_table.get(other, infinity) + cost < distance:
+                    stalled = True
+                    break
+            if stalled: continue
+            for other, cost, middle in sides[this_side][node]:
+                generated += 1
+                next_distance = distance + cost
+                if next_distance < distance_table.get(other, infinity):
+                    distance_table[other] = next_distance
+                    parent_table[other] = (node, middle)
+                    heappush(frontier, (next_distance, other))
+                    other_distance = other_table.get(other)
+                    if other_distance is not None and next_distance + other_distance < best:
+                        best, meeting = next_distance + other_distance, other
+        if counters is not None:
+            counters[0] += expanded
+            counters[1] += generated
+        if meeting == -1: return None
+        # Walk from the meeting node back to the source, then from the meeting node to the target, unpacking each edge
+        upward = []
+        node = meeting
+        while node != source:
+            previous, middle = parents[0][node]
+            upward.append((previous, node, middle))
+            node = previous
+        path = []
+        for previous, node, middle in reversed(upward):
+            path.extend(self.unpack(previous, node, middle))
+        node = meeting
+        while node != target:
+            next_node, middle = parents[1][node]
+            path.extend(self.unpack(node, next_node, middle))
+            node = next_node
+        return best, path
+
+# Contract the nodes of the graph and return the contraction hierarchy
+# The node order is decided by the edge difference (the number of added shortcuts minus the number of removed edges)
+# plus the number of contracted neighbors and the level of the node (both spread the contraction over the graph
+# which keeps the query search spaces small). The priorities are updated lazily:
+# before contracting the node with the lowest priority, its priority is recomputed and if it is no longer the lowest, it is pushed back.
+# The witness searches are stopped after settling witness_limit nodes, which can only add unnecessary shortcuts.
+def build_contraction_hierarchy(graph: IndexedGraph, witness_limit: int = 500) -> ContractionHierarchy:
+    node_count = graph.node_count
+    # The remaining graph: outgoing[v][w] and incoming[w][v] are the cost of the edge v -> w (and its middle node)
+    # Parallel edges are merged by keeping the cheapest one and self loops are dropped since they are never on a shortest path
+    outgoing: List[Dict[int, Tuple[float, int]]] = [{} for _ in range(node_count)]
+    incoming: List[Dict[int, Tuple[float, int]]] = [{} for _ in range(node_count)]
+    for node in range(node_count):
+        for edge in range(graph.offsets[node], graph.offsets[node + 1]):
+            target, cost = graph.targets[edge], graph.costs[edge]
+            if target == node: continue
+            old = outgoing[node].get(target)
+            if old is None or cost < old[0]:
+                outgoing[node][target] = incoming[target][node] = (cost, -1)
+    contracted_neighbors = [0] * node_count
+    up_edges: List[List[Tuple[int, float, int]]] = [[] for _ in range(node_count)]
+    down_edges: List[List[Tuple[int, float, int]]] = [[] for _ in range(node_count)]
+
+    # Find the shortcuts needed to contract the node
+    def shortcuts(node: int) -> List[Tuple[int, int, float]]:
+        result = []
+        targets = outgoing[node]
+        if not targets: return result
+        for source, (source_cost, _) in incoming[node].items():
+            # The longest path that needs a witness from this source
+            limit = source_cost + max(cost for cost, _ in targets.values())
+            # A dijkstra from the source that does not go through the node
+            distances = {source: 0}
+            frontier = [(0, source)]
+            settled, remaining = 0, len(targets)
+            while frontier and settled < witness_limit and remaining:
+                distance, current = heappop(frontier)
+                if distance > distances[current]: continue
+                if distance > limit: break
+                settled += 1
+                if current in targets: remaining -= 1 # the search stops once every target is settled
+                for next_node, (cost, _) in outgoing[current].items():
+                    if next_node == node: continue
+                    next_distance = distance + cost
+                    if next_distance < distances.get(next_node, float('inf')):
+                        distances[next_node] = next_distance
+                        heappush(frontier, (next_distance, next_node))
+            for target, (target_cost, _) in targets.items():
+                if target == source: continue
+                shortcut_cost = source_cost + target_cost
+                if distances.get(target, float('inf')) > shortcut_cost:
+                    result.append((source, target, shortcut_cost))
+        return result
+
+    # The priority of a node and the shortcuts needed to contract it
+    def priority(node: int) -> Tuple[int, List[Tuple[int, int, float]]]:
+        needed = shortcuts(node)
+        return len(needed) - len(outgoing[node]) - len(incoming[node]) + contracted_neighbors[node] + levels[node], needed
+
+    levels = [0] * node_count # the level of a node is one more than the highest level of its contracted neighbors
+    queue = [(priority(node)[0], node) for node in range(node_count)]
+    queue.sort()
+    while queue:
+        _, node = heappop(queue)
+        # Lazy update: if the recomputed priority is higher than the next node's, push it back
+        current, needed = priority(node)
+        if queue and current > queue[0][0]:
+            heappush(queue, (current, node))
+            continue
+        for source, target, cost in needed:
+            old = outgoing[source].get(target)
+            if old is None or cost < old[0]:
+                outgoing[source][target] = incoming[target][source] = (cost, node)
+        level = levels[node] + 1
+        for neighbor in list(outgoing[node]) + list(incoming[node]):
+            if levels[neighbor] < level: levels[neighbor] = level
+        # The remaining edges of the node go to higher ranked nodes, so they become the node's upward and downward edges
+        for target, (cost, middle) in outgoing[node].items():
+            up_edges[node].append((target, cost, middle))
+            del incoming[target][node]
+            contracted_neighbors[target] += 1
+        for source, (cost, middle) in incoming[node].items():
+            down_edges[node].append((source, cost, middle))
+            del outgoing[source][node]
+            contracted_neighbors[source] += 1
+        outgoing[node], incoming[node] = {}, {}
+
+    def to_csr(edges: List[List[Tuple[int, float, int]]]) -> Tuple[array, array, array, array]:
+        offsets, others, costs, middles = array('q', [0]), array('I'), array('d'), array('q')
+        for node_edges in edges:
+            for other, cost, middle in sorted(node_edges):
+                others.append(other)
+                costs.append(cost)
+                middles.append(middle)
+            offsets.append(len(others))
+        return offsets, others, costs, middles
+
+    return ContractionHierarchy(node_count, to_csr(up_edges), to_csr(down_edges))
+
+# Load the contraction hierarchy of the graph stored at graph_path (from "graph_path.ch") or build and save it if needed
+# The hierarchy is also stored in the problem cache so that ContractionHierarchySearch can use it
+def load_contraction_hierarchy(problem: Union[GraphRoutingProblem, CSRGraphRoutingProblem], graph_path: str) -> ContractionHierarchy:
+    graph = get_indexed_graph(problem)
+    path = graph_path + ".ch"
+    stamp = file_stamp(graph_path)
+    hierarchy = ContractionHierarchy.load(path, graph.node_count, stamp)
+    if hierarchy is None:
+        hierarchy = build_contraction_hierarchy(graph)
+        try:
+            hierarchy.save(path, stamp)
+        except OSError:
+            pass # If the directory is not writable, we just skip storing the hierarchy
+    problem.cache()["contraction_hierarchy"] = hierarchy
+    return hierarchy
+
+# This search function answers the query with the contraction hierarchy of the problem
+# It uses the hierarchy stored in the problem cache by load_contraction_hierarchy, and if there is none, it is built in memory
+# The returned path has the same cost as the path returned by UniformCostSearch (it is the same path unless there are ties)
+def ContractionHierarchySearch(problem: Union[GraphRoutingProblem, CSRGraphRoutingProblem], initial_state: Union[GraphNode, int],
+                               stats: Optional[SearchStatistics] = None) -> Solution:
+    if problem.is_goal(initial_state): return None
+    start = time.perf_counter() if stats is not None else 0
+    cache = problem.cache()
+    hierarchy: ContractionHierarchy = cache.get("contraction_hierarchy")
+    graph = get_indexed_graph(problem)
+    if hierarchy is None:
+        hierarchy = cache["contraction_hierarchy"] = build_contraction_hierarchy(graph)
+    counters = [0, 0]
+    result = hierarchy.query(graph.index(initial_state), graph.index(problem.goal), counters)
+    if stats is not None:
+        stats.record(counters[0], counters[1], 0, 0)
+        stats.phases["search"] = stats.phases.get("search", 0) + time.perf_counter() - start
+    if result is None: return None
+    states = graph.states
+    return [states[node] for node in result[1]]
@@ -0,0 +1,176 @@
+from typing import Dict, Iterable, List, Tuple
+from array import array
+from problem import Problem
+from graph import GraphNode
+from mathutils import Point
+import json, math, mmap, struct, sys
+
+# This file implements a compact binary format for the graph routing problem and a problem class that works on it
+# The graph is stored in the CSR (compressed sparse row) format:
+#   the edges of node "i" are targets[offsets[i]:offsets[i+1]]
+# The nodes are identified by integer ids (0 to node_count-1) which are assigned in the order of the sorted node names,
+# and the edges of each node are sorted by the target id. This gives the same action order as GraphRoutingProblem.from_file.
+#
+# The file layout is (all the numbers are little endian and every section starts at a multiple of 8 bytes):
+#   header:       magic (8 bytes), version (uint32), padding (uint32), node_count, edge_count, start, goal (int64 each)
+#   xs, ys:       float64[node_count] each, the node coordinates
+#   offsets:      int64[node_count + 1], the CSR offsets
+#   targets:      uint32[edge_count], the CSR targets
+#   name_offsets: int64[node_count + 1], the offsets of the node names inside the string table
+#   names:        the UTF-8 string table
+#
+# The file is memory-mapped when loaded so only the pages that the search touches are read from the disk
+
+CSR_MAGIC = b"CSRGRAPH"
+CSR_VERSION = 1
+CSR_HEADER = struct.Struct("<8sIIqqqq")
+
+def _aligned(size: int) -> int:
+    return (size + 7) & ~7
+
+# Convert a graph routing problem from the JSON format (see GraphRoutingProblem.from_file) to the binary format
+def convert_json_to_csr(json_path: str, csr_path: str) -> None:
+    with open(json_path, 'r') as f:
+        problem_def: Dict[str, Dict] = json.load(f)
+    graph_def: Dict[str, Dict] = problem_def.get("graph", {})
+    names = sorted(graph_def)
+    ids = {name: index for index, name in enumerate(names)}
+    xs, ys = array('d'), array('d')
+    offsets, targets = array('q', [0]), array('I')
+    for name in names:
+        item = graph_def[name]
+        x, y = item.get("position", [0, 0])
+        xs.append(x)
+        ys.append(y)
+        targets.extend(sorted(ids[adjacent] for adjacent in item.get("adjacent", []) if adjacent in ids))
+        offsets.append(len(targets))
+    encoded_names = [name.encode() for name in names]
+    name_offsets = array('q', [0])
+    for encoded in encoded_names:
+        name_offsets.append(name_offsets[-1] + len(encoded))
+    sections = [xs, ys, offsets, targets, name_offsets]
+    if sys.byteorder != "little":
+        for section in sections: section.byteswap()
+    with open(csr_path, 'wb') as f:
+        f.write(CSR_HEADER.pack(CSR_MAGIC, CSR_VERSION, 0, len(names), len(targets),
+                                ids[problem_def.get("start", "")], ids[problem_def.get("goal", "")]))
+        for section in sections + [b"".join(encoded_names)]:
+            data = section.tobytes() if isinstance(section, array) else section
+            f.write(data)
+            f.write(bytes(_aligned(len(data)) - len(data)))
+
+# This is the graph routing problem on integer node ids backed by a memory-mapped CSR file
+# The states and the actions are node ids (the action is the next node as in GraphRoutingProblem)
+# Use "node" or "to_nodes" to get the GraphNode objects of the returned paths
+class CSRGraphRoutingProblem(Problem[int, int]):
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, node_count, edge_count, start, goal = CSR_HEADER.unpack_from(self.map, 0)
+        if magic != CSR_MAGIC or version != CSR_VERSION:
+            raise ValueError(f"'{path}' is not a CSR graph file (version {CSR_VERSION})")
+        if sys.byteorder != "little":
+            raise ValueError("CSR graph files can only be memory-mapped on little endian machines")
+        self.node_count, self.edge_count = node_count, edge_count
+        self.start, self.goal = start, goal
+        view = memoryview(self.map)
+        position = CSR_HEADER.size
+        # Each section is a typed view into the memory-mapped file (nothing is copied)
+        def section(format: str, count: int) -> memoryview:
+            nonlocal position
+            size = count * struct.calcsize(format)
+            data = view[position:position + size].cast(format)
+            position += _aligned(size)
+            return data
+        self.xs = section('d', node_count)
+        self.ys = section('d', node_count)
+        self.offsets = section('q', node_count + 1)
+        self.targets = section('I', edge_count)
+        self.name_offsets = section('q', node_count + 1)
+        self.names = view[position:position + self.name_offsets[node_count]]
+
+    def get_initial_state(self) -> int:
+        return self.start
+
+    def is_goal(self, state: int) -> bool:
+        return state == self.goal
+
+    def get_actions(self, state: int) -> Iterable[int]:
+        offsets = self.offsets
+        return self.targets[offsets[state]:offsets[state + 1]]
+
+    # The reverse CSR arrays are built once (with a counting sort of the edges) and stored in the problem cache
+    # This is used by the bidirectional searches to search backward from the goal
+    def get_predecessors(self, state: int) -> List[Tuple[int, int]]:
+        cache = self.cache()
+        reverse = cache.get("reverse_csr")
+        if reverse is None:
+            offsets, targets = self.offsets, self.targets
+            reverse_offsets = array('q', [0]) * (self.node_count + 1)
+            for target in targets: reverse_offsets[target + 1] += 1
+            for node in range(self.node_count): reverse_offsets[node + 1] += reverse_offsets[node]
+            fill = array('q', reverse_offsets)
+            sources = array('I', [0]) * self.edge_count
+            for node in range(self.node_count):
+                for index in range(offsets[node], offsets[node + 1]):
+                    target = targets[index]
+                    sources[fill[target]] = node
+                    fill[target] += 1
+            reverse = cache["reverse_csr"] = (reverse_offsets, sources)
+        reverse_offsets, sources = reverse
+        return [(source, state) for source in sources[reverse_offsets[state]:reverse_offsets[state + 1]]]
+
+    def get_successor(self, state: int, action: int) -> int:
+        return action
+
+    # The cost of an action is the distance between the current node and the next node
+    def get_cost(self, state: int, action: int) -> float:
+        xs, ys = self.xs, self.ys
+        dx, dy = xs[state] - xs[action], ys[state] - ys[action]
+        return math.sqrt(dx * dx + dy * dy)
+
+    def name(self, node: int) -> str:
+        name_offsets = self.name_offsets
+        return bytes(self.names[name_offsets[node]:name_offsets[node + 1]]).decode()
+
+    # Returns the id of the node with the given name (the names are sorted so we can use a binary search)
+    def node_id(self, name: str) -> int:
+        low, high = 0, self.node_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.name(middle) < name: low = middle + 1
+            else: high = middle
+        if low == self.node_count or self.name(low) != name:
+            raise KeyError(name)
+        return low
+
+    # Materialize the GraphNode of the given node id
+    def node(self, node: int) -> GraphNode:
+        x, y = self.xs[node], self.ys[node]
+        # The coordinates are stored as floats, integral coordinates are converted back to integers as in the JSON format
+        if x.is_integer() and y.is_integer(): x, y = int(x), int(y)
+        return GraphNode(self.name(node), Point(x, y))
+
+    # Convert a path of node ids (such as a solution) to a list of GraphNode
+    def to_nodes(self, path: Iterable[int]) -> List[GraphNode]:
+        return [self.node(node) for node in path]
+
+    # Read a graph routing problem from a CSR file (use convert_json_to_csr to create it)
+    @staticmethod
+    def from_file(path: str) -> 'CSRGraphRoutingProblem':
+        return CSRGraphRoutingProblem(path)
+
+def csr_graphrouting_heuristic(problem: CSRGraphRoutingProblem, state: int) -> float:
+    return problem.get_cost(state, problem.goal)
+
+
+if __name__ == "__main__":
+    # Convert a JSON graph to the CSR format, for example:
+    #   python csr_graph.py graphs/graph1.json graphs/graph1.csrg
+    import argparse
+    parser = argparse.ArgumentParser(description="Convert a graph from the JSON format to the binary CSR format")
+    parser.add_argument("json", help="path to the JSON graph")
+    parser.add_argument("csr", help="path to the CSR graph to write")
+    args = parser.parse_args()
+    convert_json_to_csr(args.json, args.csr)
@@ -0,0 +1,120 @@
+from typing import Dict, Generic, List, Optional, Tuple, TypeVar
+from itertools import count
+
+# T is used for generic typing where T represents the type of the items stored in the frontier
+T = TypeVar("T")
+
+# This is an indexed binary min-heap that is used as a priority queue for the search frontier
+# Each item is stored at most once and the heap keeps track of the position of every item
+# so that we can check membership, read the priority and decrease the priority in O(1)/O(log n)
+# Ties between equal priorities are broken by the insertion order (first in, first out),
+# which is the same order we get from a stable sort of a list followed by pop(0).
+# If an item's priority is decreased, it is treated as if it was removed and re-inserted at the end,
+# i.e. it loses its place among the items with the same priority.
+# It is used by the bidirectional searches (see search.py). GraphSearch (UCS, A*, best first search) uses lazy deletion
+# on a plain heapq instead since it is faster in Python, the expansion order is the same.
+class PriorityFrontier(Generic[T]):
+    def __init__(self) -> None:
+        # Each heap entry is a list [priority, order, item] so that we can update it in place
+        self._heap: List[list] = []
+        # This dictionary maps each item to its current index inside the heap
+        self._index: Dict[T, int] = {}
+        self._counter = count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __bool__(self) -> bool:
+        return bool(self._heap)
+
+    def __contains__(self, item: T) -> bool:
+        return item in self._index
+
+    # Returns the priority of the given item or None if it is not in the frontier
+    def priority(self, item: T) -> Optional[float]:
+        index = self._index.get(item)
+        return None if index is None else self._heap[index][0]
+
+    # Adds a new item to the frontier (the item must not be in the frontier already)
+    def push(self, item: T, priority: float) -> None:
+        entry = [priority, next(self._counter), item]
+        heap = self._heap
+        heap.append(entry)
+        self._index[item] = len(heap) - 1
+        self._sift_up(len(heap) - 1)
+
+    # Removes and returns the item with the lowest priority as a tuple (priority, item)
+    def pop(self) -> Tuple[float, T]:
+        heap = self._heap
+        last = heap.pop()
+        if heap:
+            top = heap[0]
+            heap[0] = last
+            self._index[last[2]] = 0
+            self._sift_down(0)
+        else:
+            top = last
+        del self._index[top[2]]
+        return top[0], top[2]
+
+    # Returns the item with the lowest priority as a tuple (priority, item) without removing it
+    def peek(self) -> Tuple[float, T]:
+        top = self._heap[0]
+        return top[0], top[2]
+
+    # Lowers the priority of an item that is already in the frontier
+    # The item gets a new insertion order so it goes behind the items that already have the same priority
+    def decrease_key(self, item: T, priority: float) -> None:
+        index = self._index[item]
+        entry = self._heap[index]
+        entry[0] = priority
+        entry[1] = next(self._counter)
+        self._sift_up(index)
+
+    # Adds the item if it is not in the frontier, or lowers its priority if the new priority is strictly lower
+    # Returns True if the frontier was changed
+    def push_or_decrease(self, item: T, priority: float) -> bool:
+        index = self._index.get(item)
+        if index is None:
+            self.push(item, priority)
+            return True
+        if self._heap[index][0] > priority:
+            self.decrease_key(item, priority)
+            return True
+        return False
+
+    # Entries are compared by (priority, order) only since the items themselves may not be comparable
+    def _sift_up(self, index: int) -> None:
+        heap, positions = self._heap, self._index
+        entry = heap[index]
+        key = (entry[0], entry[1])
+        while index > 0:
+            parent_index = (index - 1) >> 1
+            parent = heap[parent_index]
+            if (parent[0], parent[1]) <= key: break
+            heap[index] = parent
+            positions[parent[2]] = index
+            index = parent_index
+        heap[index] = entry
+        positions[entry[2]] = index
+
+    def _sift_down(self, index: int) -> None:
+        heap, positions = self._heap, self._index
+        size = len(heap)
+        entry = heap[index]
+        key = (entry[0], entry[1])
+        while True:
+            child_index = 2 * index + 1
+            if child_index >= size: break
+            child = heap[child_index]
+            right_index = child_index + 1
+            if right_index < size:
+                right = heap[right_index]
+                if (right[0], right[1]) < (child[0], child[1]):
+                    child_index, child = right_index, right
+            if key <= (child[0], child[1]): break
+            heap[index] = child
+            positions[child[2]] = index
+            index = child_index
+        heap[index] = entry
+        positions[entry[2]] = index
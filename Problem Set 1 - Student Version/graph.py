@@ -1,4 +1,4 @@
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Optional, Tuple
 from dataclasses import dataclass
 import json
 
@@ -26,6 +26,8 @@ class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
         self.start = start
         self.goal = goal
         self.adjacency = adjacency
+        # The edges whose cost was changed with set_cost (the cost of the other edges is the distance between the nodes)
+        self.costs: Dict[Tuple[GraphNode, GraphNode], float] = {}
     
     def get_initial_state(self) -> GraphNode:
         return self.start
@@ -39,14 +41,68 @@ class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
     def get_actions(self, state: GraphNode) -> Iterable[GraphNode]:
         return self.adjacency.get(state, [])
     
+    # Returns a list of (previous node, action) pairs for all the nodes that have an edge into the given node
+    # The reverse adjacency is built once and stored in the problem cache
+    # This is used by the bidirectional searches to search backward from the goal
+    def get_predecessors(self, state: GraphNode) -> List[Tuple[GraphNode, GraphNode]]:
+        cache = self.cache()
+        reverse = cache.get("reverse_adjacency")
+        if reverse is None:
+            reverse = {}
+            for node, adjacent in self.adjacency.items():
+                for next_node in adjacent:
+                    reverse.setdefault(next_node, []).append((node, next_node))
+            cache["reverse_adjacency"] = reverse
+        return reverse.get(state, [])
+
     # The next state and the action are the exact same thing for this problem
     def get_successor(self, state: GraphNode, action: GraphNode) -> GraphNode:
         return action
     
     # The cost of an action is the distance between the current node and the next node 
     def get_cost(self, state: GraphNode, action: GraphNode) -> float:
+        if self.costs:
+            cost = self.costs.get((state, action))
+            if cost is not None: return cost
         return euclidean_distance(state.position, action.position)
     
+    # The following functions change the graph and report the changed edges (see Problem.report_changed_edges)
+    # The problem cache is cleared since the data stored in it (such as the landmarks) may be outdated
+    # except for the reverse adjacency which is updated
+    # Note that graphrouting_heuristic is only admissible if every cost is at least the distance between the nodes
+
+    # Change the cost of an edge
+    def set_cost(self, state: GraphNode, next_state: GraphNode, cost: float) -> None:
+        self.costs[(state, next_state)] = cost
+        self._changed(state, next_state)
+
+    # Add an edge (if cost is None, the cost is the distance between the nodes)
+    def add_edge(self, state: GraphNode, next_state: GraphNode, cost: Optional[float] = None) -> None:
+        self.costs.pop((state, next_state), None)
+        if cost is not None: self.costs[(state, next_state)] = cost
+        adjacent = self.adjacency.get(state, [])
+        if next_state not in adjacent:
+            # The lists are replaced instead of changed in place since a search may be iterating over them
+            self.adjacency[state] = sorted(adjacent + [next_state], key=lambda node: node.name)
+            reverse = self.cache().get("reverse_adjacency")
+            if reverse is not None: reverse[next_state] = reverse.get(next_state, []) + [(state, next_state)]
+        self._changed(state, next_state)
+
+    # Remove an edge
+    def remove_edge(self, state: GraphNode, next_state: GraphNode) -> None:
+        self.adjacency[state] = [node for node in self.adjacency.get(state, []) if node != next_state]
+        self.costs.pop((state, next_state), None)
+        reverse = self.cache().get("reverse_adjacency")
+        if reverse is not None: reverse[next_state] = [edge for edge in reverse.get(next_state, []) if edge[0] != state]
+        self._changed(state, next_state)
+
+    def _changed(self, state: GraphNode, next_state: GraphNode) -> None:
+        cache = self.cache()
+        reverse = cache.get("reverse_adjacency")
+        cache.clear()
+        if reverse is not None: cache["reverse_adjacency"] = reverse
+        self.report_changed_edges([(state, next_state)])
+
     # Read a graph routing problem from file
     @staticmethod
     def from_file(path: str) -> 'GraphRoutingProblem':
@@ -63,4 +119,8 @@ class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
         return GraphRoutingProblem(start, goal, adjacency)
 
 def graphrouting_heuristic(problem: GraphRoutingProblem, state: GraphNode) -> float:
-    return euclidean_distance(state.position, problem.goal.position)
\ No newline at end of file
+    return euclidean_distance(state.position, problem.goal.position)
+
+# This estimates the path cost between any two nodes (it is used by the incremental search agent)
+def graphrouting_distance(problem: GraphRoutingProblem, state: GraphNode, other: GraphNode) -> float:
+    return euclidean_distance(state.position, other.position)
\ No newline at end of file
@@ -0,0 +1,101 @@
+from typing import Any, Callable, Sequence, Tuple, Union
+from array import array
+from heapq import heappush, heappop
+from graph import GraphRoutingProblem
+from csr_graph import CSRGraphRoutingProblem
+import os
+
+# This is an integer-indexed view of a graph routing problem that is shared by the graph preprocessing steps
+# (such as the landmarks and the contraction hierarchies)
+# The node ids are the same as in the CSR format: the nodes sorted by name
+# so the preprocessed data of a JSON graph can be used with its CSR version and vice versa
+# The edges are stored in the CSR format with their costs, and the reverse edges are stored in the same way
+class IndexedGraph:
+    node_count: int
+    states: Sequence[Any]           # states[i] is the state of node i (the node id itself for CSR problems)
+    index: Callable[[Any], int]     # index(state) is the id of the node of the given state
+    offsets: Sequence[int]          # the edges of node i are (targets[j], costs[j]) for j in range(offsets[i], offsets[i+1])
+    targets: Sequence[int]
+    costs: Sequence[float]
+    reverse_offsets: Sequence[int]  # the edges into node i are (sources[j], reverse_costs[j]) for j in range(reverse_offsets[i], reverse_offsets[i+1])
+    sources: Sequence[int]
+    reverse_costs: Sequence[float]
+
+    def __init__(self, problem: Union[GraphRoutingProblem, CSRGraphRoutingProblem]) -> None:
+        get_cost = problem.get_cost
+        if isinstance(problem, CSRGraphRoutingProblem):
+            self.node_count = problem.node_count
+            self.states = range(problem.node_count)
+            self.index = int
+            self.offsets, self.targets = problem.offsets, problem.targets
+            costs = array('d', [0]) * problem.edge_count
+            for node in range(problem.node_count):
+                for edge in range(self.offsets[node], self.offsets[node + 1]):
+                    costs[edge] = get_cost(node, self.targets[edge])
+            self.costs = costs
+        else:
+            # A node may only appear as an edge target (e.g. after add_edge) or as the start or the goal, so we collect all of them
+            nodes = set(problem.adjacency)
+            for adjacent in problem.adjacency.values(): nodes.update(adjacent)
+            nodes.update((problem.start, problem.goal))
+            states = sorted(nodes, key=lambda node: node.name)
+            ids = {state: index for index, state in enumerate(states)}
+            self.node_count = len(states)
+            self.states = states
+            self.index = ids.__getitem__
+            offsets, targets, costs = array('q', [0]), array('I'), array('d')
+            # We read the adjacency directly since get_actions records its calls to show the traversal order
+            for state in states:
+                for next_state in problem.adjacency.get(state, []):
+                    targets.append(ids[next_state])
+                    costs.append(get_cost(state, next_state))
+                offsets.append(len(targets))
+            self.offsets, self.targets, self.costs = offsets, targets, costs
+        # The reverse edges are sorted by the target with a counting sort
+        node_count, offsets, targets, costs = self.node_count, self.offsets, self.targets, self.costs
+        reverse_offsets = array('q', [0]) * (node_count + 1)
+        for target in targets: reverse_offsets[target + 1] += 1
+        for node in range(node_count): reverse_offsets[node + 1] += reverse_offsets[node]
+        fill = array('q', reverse_offsets)
+        sources, reverse_costs = array('I', [0]) * len(targets), array('d', [0]) * len(targets)
+        for node in range(node_count):
+            for edge in range(offsets[node], offsets[node + 1]):
+                target = targets[edge]
+                position = fill[target]
+                sources[position], reverse_costs[position] = node, costs[edge]
+                fill[target] = position + 1
+        self.reverse_offsets, self.sources, self.reverse_costs = reverse_offsets, sources, reverse_costs
+
+    # Run dijkstra from the given node and return the distance to every node (infinity for the unreachable nodes)
+    # If backward is True, the edges are followed in reverse so the distances are from every node to the given node
+    def distances(self, source: int, backward: bool = False) -> array:
+        if backward:
+            offsets, targets, costs = self.reverse_offsets, self.sources, self.reverse_costs
+        else:
+            offsets, targets, costs = self.offsets, self.targets, self.costs
+        distances = array('d', [float('inf')]) * self.node_count
+        distances[source] = 0
+        frontier = [(0, source)]
+        while frontier:
+            distance, node = heappop(frontier)
+            if distance > distances[node]: continue # an outdated entry
+            for edge in range(offsets[node], offsets[node + 1]):
+                target, next_distance = targets[edge], distance + costs[edge]
+                if next_distance < distances[target]:
+                    distances[target] = next_distance
+                    heappush(frontier, (next_distance, target))
+        return distances
+
+# The indexed graph is built once per problem and stored in the problem cache
+def get_indexed_graph(problem: Union[GraphRoutingProblem, CSRGraphRoutingProblem]) -> IndexedGraph:
+    cache = problem.cache()
+    graph = cache.get("indexed_graph")
+    if graph is None:
+        graph = cache["indexed_graph"] = IndexedGraph(problem)
+    return graph
+
+# Returns the size and modification time of a file, it is stored with the preprocessed data of a graph file
+# to detect that the graph file was changed after the preprocessing
+def file_stamp(path: str) -> Tuple[int, int]:
+    status = os.stat(path)
+    return status.st_size, status.st_mtime_ns
@@ -0,0 +1,138 @@
+from typing import Optional, Tuple, Union
+from array import array
+from graph import GraphRoutingProblem, GraphNode, graphrouting_heuristic
+from csr_graph import CSRGraphRoutingProblem
+from graph_index import IndexedGraph, get_indexed_graph, file_stamp
+import os, struct
+
+# This file implements the ALT (A*, Landmarks and Triangle inequality) heuristic for graph routing
+# We pick a few nodes as landmarks and store the exact distance from every landmark to every node and back.
+# For any node v, goal and landmark L, the triangle inequality gives two lower bounds of the distance from v to the goal:
+#   d(v, goal) >= d(v, L) - d(goal, L)
+#   d(v, goal) >= d(L, goal) - d(L, v)
+# The heuristic is the maximum of these bounds over the landmarks and the euclidean distance,
+# and since each bound is consistent, the maximum is also consistent.
+# The landmarks are chosen with the "farthest" method: each new landmark is the node that is farthest
+# from the landmarks that were already chosen, so they end up around the border of the graph.
+
+LANDMARKS_MAGIC = b"LANDMARK"
+LANDMARKS_VERSION = 1
+# The header contains: magic, version, landmark count, node count, graph file size and graph file modification time
+# The graph file size and modification time are used to detect that the graph file was changed after the preprocessing
+LANDMARKS_HEADER = struct.Struct("<8sIIqqq")
+
+# The landmark tables of a graph:
+#   landmarks: the node id of each landmark
+#   from_landmarks: from_landmarks[v * k + i] is the distance from landmark i to node v
+#   to_landmarks: to_landmarks[v * k + i] is the distance from node v to landmark i
+# The tables are node-major so the k values of a node are next to each other
+class Landmarks:
+    def __init__(self, landmarks: array, from_landmarks: array, to_landmarks: array) -> None:
+        self.landmarks = landmarks
+        self.from_landmarks = from_landmarks
+        self.to_landmarks = to_landmarks
+
+    # Save the tables to a file (the graph file size and modification time are stored to detect outdated tables)
+    def save(self, path: str, graph_stamp: Tuple[int, int] = (0, 0)) -> None:
+        node_count = len(self.from_landmarks) // max(len(self.landmarks), 1)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as f:
+            f.write(LANDMARKS_HEADER.pack(LANDMARKS_MAGIC, LANDMARKS_VERSION, len(self.landmarks), node_count, *graph_stamp))
+            for table in (self.landmarks, self.from_landmarks, self.to_landmarks):
+                table.tofile(f)
+        os.replace(temporary_path, path)
+
+    # Load the tables from a file, returns None if the file does not exist or does not match the given stamp and sizes
+    @staticmethod
+    def load(path: str, landmark_count: int, node_count: int, graph_stamp: Tuple[int, int] = (0, 0)) -> Optional['Landmarks']:
+        if not os.path.exists(path): return None
+        with open(path, 'rb') as f:
+            header = f.read(LANDMARKS_HEADER.size)
+            if len(header) != LANDMARKS_HEADER.size: return None
+            magic, version, stored_landmarks, stored_nodes, *stored_stamp = LANDMARKS_HEADER.unpack(header)
+            if (magic, version, stored_landmarks, stored_nodes, tuple(stored_stamp)) != (LANDMARKS_MAGIC, LANDMARKS_VERSION, landmark_count, node_count, graph_stamp):
+                return None
+            landmarks, from_landmarks, to_landmarks = array('q'), array('d'), array('d')
+            landmarks.fromfile(f, landmark_count)
+            from_landmarks.fromfile(f, landmark_count * node_count)
+            to_landmarks.fromfile(f, landmark_count * node_count)
+        return Landmarks(landmarks, from_landmarks, to_landmarks)
+
+# Pick landmark_count landmarks and compute their tables
+def build_landmarks(graph: IndexedGraph, landmark_count: int = 8) -> Landmarks:
+    node_count = graph.node_count
+    landmark_count = min(landmark_count, node_count)
+    infinity = float('inf')
+    # The first landmark is the node that is farthest from node 0, then each landmark is the node
+    # whose distance to the nearest chosen landmark is the largest (only the reachable nodes are considered)
+    nearest = graph.distances(0) if node_count else array('d')
+    landmarks, forward_tables, backward_tables = array('q'), [], []
+    for index in range(landmark_count):
+        candidates = [(distance, node) for node, distance in enumerate(nearest) if distance != infinity and node not in landmarks]
+        if candidates:
+            landmark = max(candidates)[1]
+        else:
+            landmark = next(node for node in range(node_count) if node not in landmarks)
+        forward, backward = graph.distances(landmark), graph.distances(landmark, backward=True)
+        landmarks.append(landmark)
+        forward_tables.append(forward)
+        backward_tables.append(backward)
+        if index == 0:
+            nearest = array('d', forward)
+        else:
+            for node in range(node_count):
+                if forward[node] < nearest[node]: nearest[node] = forward[node]
+    k = len(landmarks)
+    from_landmarks, to_landmarks = array('d', [0]) * (k * node_count), array('d', [0]) * (k * node_count)
+    for i in range(k):
+        forward, backward = forward_tables[i], backward_tables[i]
+        for node in range(node_count):
+            from_landmarks[node * k + i] = forward[node]
+            to_landmarks[node * k + i] = backward[node]
+    return Landmarks(landmarks, from_landmarks, to_landmarks)
+
+# Load the landmarks of the graph stored at graph_path (from "graph_path.landmarks") or build and save them if needed
+# The landmarks are also stored in the problem cache so that landmark_heuristic can use them
+def load_landmarks(problem: Union[GraphRoutingProblem, CSRGraphRoutingProblem], graph_path: str, landmark_count: int = 8) -> Landmarks:
+    graph = get_indexed_graph(problem)
+    path = graph_path + ".landmarks"
+    stamp = file_stamp(graph_path)
+    landmarks = Landmarks.load(path, min(landmark_count, graph.node_count), graph.node_count, stamp)
+    if landmarks is None:
+        landmarks = build_landmarks(graph, landmark_count)
+        try:
+            landmarks.save(path, stamp)
+        except OSError:
+            pass # If the directory is not writable, we just skip storing the landmarks
+    problem.cache()["landmarks"] = landmarks
+    return landmarks
+
+# The ALT heuristic. It uses the landmarks stored in the problem cache by load_landmarks
+# and if there are none, the landmarks are built in memory (with the default landmark count)
+def landmark_heuristic(problem: Union[GraphRoutingProblem, CSRGraphRoutingProblem], state: Union[GraphNode, int]) -> float:
+    cache = problem.cache()
+    landmarks: Landmarks = cache.get("landmarks")
+    if landmarks is None:
+        landmarks = cache["landmarks"] = build_landmarks(get_indexed_graph(problem))
+    graph = get_indexed_graph(problem)
+    if isinstance(problem, CSRGraphRoutingProblem):
+        euclidean = problem.get_cost(state, problem.goal)
+    else:
+        euclidean = graphrouting_heuristic(problem, state)
+    node, goal = graph.index(state), graph.index(problem.goal)
+    k = len(landmarks.landmarks)
+    from_landmarks, to_landmarks = landmarks.from_landmarks, landmarks.to_landmarks
+    best = euclidean
+    node_offset, goal_offset = node * k, goal * k
+    for i in range(k):
+        # If both distances are infinite, the bound is undefined (nan) so we skip it
+        # If only the first distance is infinite, the node can not reach the goal and the bound is infinite
+        to_node, to_goal = to_landmarks[node_offset + i], to_landmarks[goal_offset + i]
+        if to_node != to_goal:
+            bound = to_node - to_goal
+            if bound > best: best = bound
+        from_node, from_goal = from_landmarks[node_offset + i], from_landmarks[goal_offset + i]
+        if from_goal != from_node:
+            bound = from_goal - from_node
+            if bound > best: best = bound
+    return best
@@ -3,9 +3,8 @@ from agents import HeuristicFunction
 from graph import GraphRoutingProblem, graphrouting_heuristic
 from sokoban import SokobanProblem, Direction
 from problem import A, S, Problem
-from .utils import Result, fetch_recorded_calls, fetch_tracked_call_count, load_function
+from .utils import Result, fetch_recorded_calls, fetch_tracked_call_count, load_function, memoized
 from .heuristic_checks import InconsistentHeuristicException, test_heuristic_consistency
-from functools import lru_cache
 import time
 
 def run_parking_trajectory(
@@ -119,7 +118,7 @@ def test_sokoban_heuristic(
     function_path: str, 
     problem: SokobanProblem) -> Tuple[float, int, str, float]:
     fetch_tracked_call_count(SokobanProblem.get_actions)
-    heuristic = lru_cache(2**16)(load_function("sokoban_heuristic.strong_heuristic"))
+    heuristic = memoized(load_function("sokoban_heuristic.strong_heuristic"))
     original_get_successor = SokobanProblem.get_successor
     SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
     search_fn = load_function(function_path)
@@ -1,6 +1,6 @@
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, Hashable, List, Optional
 from dataclasses import dataclass
-from collections import deque
+from collections import OrderedDict, deque
 import importlib, os, sys
 from importlib import util as ilu
 import traceback
@@ -86,6 +86,153 @@ class CacheContainer:
             setattr(self, "_cache", cache)
             return cache
 
+    # Returns the memoization table with the given name (see MemoTable), it is created with the given options
+    # the first time it is requested and stored in the cache so it is shared by every later call
+    # Requesting an existing table with different options raises a ValueError
+    def memo(self, name: Hashable, capacity: Optional[int] = 2**16, policy: str = "lru",
+             key: Optional[Callable[[Any], Hashable]] = None) -> 'MemoTable':
+        cache = self.cache()
+        table = cache.get(("memo", name))
+        if table is None:
+            table = cache[("memo", name)] = MemoTable(capacity, policy, key, getattr(name, "__name__", str(name)))
+        elif (table.capacity, table.policy, table.key) != (capacity, policy, key):
+            # Silently sharing a table created with other options would ignore the requested options
+            raise ValueError(f"The memoization table '{table.name}' already exists with capacity {table.capacity}, policy '{table.policy}' "
+                             f"and key {table.key} (requested capacity {capacity}, policy '{policy}' and key {key})")
+        return table
+
+    # Returns the counters of every memoization table of this object (see MemoTable.counters)
+    def memo_counters(self) -> Dict[str, Dict[str, Any]]:
+        return {table.name: table.counters() for cache_key, table in self.cache().items()
+                if isinstance(cache_key, tuple) and cache_key[:1] == ("memo",)}
+
+# This is a bounded memoization table with counters that show whether the caching pays off
+#   capacity: the maximum number of entries (None means that the table is unbounded)
+#   policy: which entry is evicted when the table is full
+#       "lru" evicts the least recently used entry
+#       "clock" evicts the first entry the clock hand finds that was not used since the hand last passed it
+#       (it approximates LRU but a hit only sets a flag instead of moving the entry)
+#   key: an optional function that maps each key to a compact key (such as a state hash) which is stored instead of the key
+#       Keys with the same compact key share the entry, so only use it with hashes that do not collide in practice
+class MemoTable:
+    MISSING = object() # returned by "get" if the key is not in the table (None may be a memoized value)
+
+    def __init__(self, capacity: Optional[int] = 2**16, policy: str = "lru",
+                 key: Optional[Callable[[Any], Hashable]] = None, name: str = "") -> None:
+        if policy not in ("lru", "clock"):
+            raise ValueError(f"Unknown eviction policy '{policy}' (expected 'lru' or 'clock')")
+        if capacity is not None and capacity < 1:
+            raise ValueError("The capacity must be at least 1 (or None for an unbounded table)")
+        self.capacity = capacity
+        self.policy = policy
+        self.key = key
+        self.name = name
+        self.hits = self.misses = self.evictions = 0
+        # LRU: the entries are kept in the order of their last use (the least recently used first)
+        self.entries: OrderedDict = OrderedDict()
+        # CLOCK: entries[key] is the slot of the key and the slots hold the keys, the values and the reference flags
+        self.slot_keys: List[Hashable] = []
+        self.slot_values: List[Any] = []
+        self.referenced = bytearray()
+        self.hand = 0
+        # get and put are bound to the functions of the policy once instead of checking the policy in every call
+        if policy == "lru":
+            self.get, self.put = self._lru_get, self._lru_put
+        else:
+            self.get, self.put = self._clock_get, self._clock_put
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # The following functions implement get and put for each policy:
+    #   get(key) returns the value of the key or MemoTable.MISSING if the key is not in the table
+    #   put(key, value) stores the value of the key (and evicts an entry if the table is full)
+    def _lru_get(self, key: Hashable) -> Any:
+        if self.key is not None: key = self.key(key)
+        value = self.entries.get(key, MemoTable.MISSING)
+        if value is MemoTable.MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def _lru_put(self, key: Hashable, value: Any) -> None:
+        if self.key is not None: key = self.key(key)
+        entries = self.entries
+        # The key becomes the most recently used entry (whether it is new or not)
+        entries[key] = value
+        entries.move_to_end(key)
+        if self.capacity is not None and len(entries) > self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def _clock_get(self, key: Hashable) -> Any:
+        if self.key is not None: key = self.key(key)
+        slot = self.entries.get(key)
+        if slot is None:
+            self.misses += 1
+            return MemoTable.MISSING
+        self.hits += 1
+        self.referenced[slot] = 1
+        return self.slot_values[slot]
+
+    def _clock_put(self, key: Hashable, value: Any) -> None:
+        if self.key is not None: key = self.key(key)
+        entries = self.entries
+        slot = entries.get(key)
+        if slot is not None:
+            self.slot_values[slot] = value
+            self.referenced[slot] = 1
+        elif self.capacity is None or len(self.slot_keys) < self.capacity:
+            entries[key] = len(self.slot_keys)
+            self.slot_keys.append(key)
+            self.slot_values.append(value)
+            self.referenced.append(0)
+        else:
+            # Move the hand (clearing the flags) until it finds an entry that was not used since the hand last passed it
+            referenced, hand = self.referenced, self.hand
+            while referenced[hand]:
+                referenced[hand] = 0
+                hand = (hand + 1) % self.capacity
+            del entries[self.slot_keys[hand]]
+            entries[key] = hand
+            self.slot_keys[hand], self.slot_values[hand] = key, value
+            self.hand = (hand + 1) % self.capacity
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.slot_keys, self.slot_values, self.referenced, self.hand = [], [], bytearray(), 0
+
+    def counters(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries), "capacity": self.capacity, "policy": self.policy,
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0
+        }
+
+# Memoize a function whose first argument is a cache container and the second is the key,
+# such as a heuristic function (problem, state) or an evaluation function (game, state)
+# The values are stored in a memoization table of the container (see CacheContainer.memo)
+# so each problem gets its own table and the table is dropped with the problem
+# The options of the table are checked (by CacheContainer.memo) the first time each table is used by this function
+def memoized(function: Callable[[Any, Any], Any], capacity: Optional[int] = 2**16, policy: str = "lru",
+             key: Optional[Callable[[Any], Hashable]] = None) -> Callable[[Any, Any], Any]:
+    cache_key = ("memo", function)
+    checked = [None] # the last table whose options were checked
+    def memoized_function(container: CacheContainer, item: Any) -> Any:
+        table = container.cache().get(cache_key)
+        if table is None or table is not checked[0]:
+            table = checked[0] = container.memo(function, capacity, policy, key)
+        value = table.get(item)
+        if value is MemoTable.MISSING:
+            value = function(container, item)
+            table.put(item, value)
+        return value
+    return memoized_function
+
 # Unused
 def _cache_function(self) -> Dict[Any, Any]:
     if hasattr(self, "_cache"):
@@ -0,0 +1,289 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+from collections import deque
+from heapq import heappush, heappop, nlargest
+from problem import HeuristicFunction, Problem, S
+import argparse, math, multiprocessing, os, random, sys, time
+
+# This script checks a heuristic offline instead of during the search (see helpers/heuristic_checks.py)
+# It collects the reachable states of a problem up to a budget, either by enumerating them in BFS order
+# or by sampling them with random walks, then it checks every collected state across a pool of worker processes:
+#   consistency:   h(state) - h(next state) <= cost(state, action) for every action of the state
+#   goal:          h(goal) == 0
+#   admissibility: h(state) <= the exact path cost from the state to the nearest goal
+# The exact path costs come from a backward uniform cost search from the goals over the reverse edges,
+# so they are only known if every reachable state was collected (or if the problem implements "get_predecessors"
+# and has a single goal "problem.goal" as in the graph routing problem).
+# Note that a consistent heuristic with h(goal) = 0 is always admissible, so the consistency check is enough
+# when the exact path costs are not known.
+
+# This is the tolerance used to ignore floating point errors in the comparisons
+TOLERANCE = 1e-9
+
+# This describes a violation, the amount is how much the heuristic exceeds its bound
+@dataclass
+class Violation:
+    kind: str                       # "consistency", "goal" or "admissibility"
+    amount: float
+    state: Any
+    h: float
+    action: Any = None              # the following are only set for the consistency violations
+    next_state: Any = None
+    next_h: Optional[float] = None
+    cost: Optional[float] = None
+    exact: Optional[float] = None   # only set for the admissibility violations
+
+    def __str__(self) -> str:
+        message = f"State (heuristic = {self.h}):" + "\n" + str(self.state) + "\n"
+        if self.kind == "consistency":
+            message += f"Action: {str(self.action)} (cost = {self.cost})" + "\n"
+            message += f"Next State (heuristic = {self.next_h}):" + "\n" + str(self.next_state) + "\n"
+            message += f"h(state) - h(next state) = {self.h} - {self.next_h} = {self.h - self.next_h} > {self.cost} (action cost)"
+        elif self.kind == "goal":
+            message += f"The state is a goal but h(state) = {self.h} != 0"
+        else:
+            message += f"h(state) = {self.h} > {self.exact} (exact path cost to the nearest goal)"
+        return message
+
+@dataclass
+class VerificationReport:
+    states: int = 0                 # The number of checked states
+    transitions: int = 0            # The number of checked transitions (consistency checks)
+    complete: bool = False          # Whether every reachable state was checked
+    exact_costs: bool = False       # Whether the admissibility was checked against the exact path costs
+    violations: Dict[str, int] = field(default_factory=lambda: {"consistency": 0, "goal": 0, "admissibility": 0})
+    worst: List[Violation] = field(default_factory=list) # The largest violations (the largest first)
+    seconds: float = 0
+
+    @property
+    def passed(self) -> bool:
+        return not any(self.violations.values())
+
+    def __str__(self) -> str:
+        text = f"Checked {self.states} states and {self.transitions} transitions in {self.seconds:.3f} seconds"
+        text += " (every reachable state)" if self.complete else " (a part of the reachable states)"
+        if not self.exact_costs: text += "\nThe admissibility was not checked since the exact path costs are unknown"
+        text += "\n" + ", ".join(f"{count} {kind} violations" for kind, count in self.violations.items())
+        for index, violation in enumerate(self.worst):
+            text += f"\n\nViolation {index + 1} ({violation.kind}, exceeds the bound by {violation.amount}):\n{violation}"
+        return text
+
+# Collect up to "budget" states in BFS order from the initial state and the reverse edges between them
+# Returns the states, the reverse edges (reverse[i] is a list of (index of the previous state, action cost))
+# and whether every reachable state was collected
+def enumerate_states(problem: Problem[S, Any], initial_state: S, budget: int) -> Tuple[List[S], List[List[Tuple[int, float]]], bool]:
+    states, reverse = [initial_state], [[]]
+    ids = {initial_state: 0}
+    queue = deque([0])
+    while queue:
+        index = queue.popleft()
+        state = states[index]
+        for action in problem.get_actions(state):
+            next_state = problem.get_successor(state, action)
+            next_index = ids.get(next_state)
+            if next_index is None:
+                if len(states) >= budget: return states, reverse, False
+                next_index = ids[next_state] = len(states)
+                states.append(next_state)
+                reverse.append([])
+                queue.append(next_index)
+            reverse[next_index].append((index, problem.get_cost(state, action)))
+    return states, reverse, True
+
+# Collect up to "budget" distinct states with random walks of at most "depth" actions from the initial state
+def sample_states(problem: Problem[S, Any], initial_state: S, budget: int, depth: int = 100, seed: int = 0) -> List[S]:
+    generator = random.Random(seed)
+    states, seen = [initial_state], {initial_state}
+    attempts = 0
+    # We stop if the walks keep finding the same states (a small state space)
+    while len(states) < budget and attempts < budget * 4:
+        state = initial_state
+        for _ in range(depth):
+            attempts += 1
+            actions = list(problem.get_actions(state))
+            if not actions: break
+            state = problem.get_successor(state, generator.choice(actions))
+            if state not in seen:
+                seen.add(state)
+                states.append(state)
+                if len(states) >= budget: break
+    return states
+
+# Compute the exact path cost from every collected state to the nearest goal with a backward uniform cost search
+def exact_costs_from_edges(problem: Problem[S, Any], states: Sequence[S], reverse: List[List[Tuple[int, float]]]) -> List[float]:
+    costs = [math.inf] * len(states)
+    frontier = []
+    for index, state in enumerate(states):
+        if problem.is_goal(state):
+            costs[index] = 0
+            frontier.append((0, index))
+    while frontier:
+        cost, index = heappop(frontier)
+        if cost > costs[index]: continue # an outdated entry
+        for previous, action_cost in reverse[index]:
+            previous_cost = cost + action_cost
+            if previous_cost < costs[previous]:
+                costs[previous] = previous_cost
+                heappush(frontier, (previous_cost, previous))
+    return costs
+
+# Compute the exact path cost from the given states to "problem.goal" with a backward uniform cost search
+# that uses "problem.get_predecessors" (the states that can not reach the goal get infinity)
+def exact_costs_from_predecessors(problem: Problem[S, Any], states: Sequence[S]) -> List[float]:
+    distances = {problem.goal: 0}
+    frontier = [(0, 0, problem.goal)]
+    order = 1
+    remaining = set(states)
+    settled = set()
+    while frontier and remaining:
+        distance, _, state = heappop(frontier)
+        if state in settled: continue # an outdated entry
+        settled.add(state)
+        remaining.discard(state)
+        for previous, action in problem.get_predecessors(state):
+            previous_distance = distance + problem.get_cost(previous, action)
+            if previous not in settled and previous_distance < distances.get(previous, math.inf):
+                distances[previous] = previous_distance
+                heappush(frontier, (previous_distance, order, previous))
+                order += 1
+    return [distances[state] if state in settled else math.inf for state in states]
+
+# The worker processes get the problem, the heuristic, the states and the exact costs once when they start
+# (they are forked so nothing is pickled, which matters since some states can not be pickled)
+_verifier_problem: Optional[Problem] = None
+_verifier_heuristic: Optional[HeuristicFunction] = None
+_verifier_states: Sequence[Any] = ()
+_verifier_exact: Optional[Sequence[float]] = None
+
+def _verifier_init(problem: Problem, heuristic: HeuristicFunction, states: Sequence[Any], exact: Optional[Sequence[float]]) -> None:
+    global _verifier_problem, _verifier_heuristic, _verifier_states, _verifier_exact
+    _verifier_problem, _verifier_heuristic, _verifier_states, _verifier_exact = problem, heuristic, states, exact
+
+# Check the states in range(start, end) and return (transitions, violation counts, the largest violations)
+# Each violation is returned as (amount, kind, state index, action index, h, next h, cost, exact cost)
+# since the states and the actions may not be picklable, the main process recomputes them from the indices
+def _verify_range(task: Tuple[int, int, int]) -> Tuple[int, Dict[str, int], List[tuple]]:
+    start, end, keep = task
+    problem, heuristic, states, exact = _verifier_problem, _verifier_heuristic, _verifier_states, _verifier_exact
+    transitions = 0
+    counts = {"consistency": 0, "goal": 0, "admissibility": 0}
+    violations = []
+    for index in range(start, end):
+        state = states[index]
+        h = heuristic(problem, state)
+        if problem.is_goal(state) and h != 0:
+            counts["goal"] += 1
+            violations.append((abs(h), "goal", index, -1, h, None, None, None))
+        if exact is not None and h - exact[index] > TOLERANCE * max(1, abs(exact[index])):
+            counts["admissibility"] += 1
+            violations.append((h - exact[index], "admissibility", index, -1, h, None, None, exact[index]))
+        for action_index, action in enumerate(problem.get_actions(state)):
+            transitions += 1
+            next_h = heuristic(problem, problem.get_successor(state, action))
+            cost = problem.get_cost(state, action)
+            if h - next_h - cost > TOLERANCE * max(1, abs(cost)):
+                counts["consistency"] += 1
+                violations.append((h - next_h - cost, "consistency", index, action_index, h, next_h, cost, None))
+        if len(violations) > 4 * keep: violations = nlargest(keep, violations, key=lambda violation: violation[0])
+    return transitions, counts, nlargest(keep, violations, key=lambda violation: violation[0])
+
+# Check the heuristic on the reachable states of the problem (see the top of this file)
+#   budget: the maximum number of checked states
+#   sample: if True, the states are sampled with random walks of at most "depth" actions instead of enumerated in BFS order
+#   processes: the number of worker processes (default: the number of CPUs), 1 checks the states in this process (as does a platform without fork)
+#   keep: the number of the largest violations to report
+def verify_heuristic(problem: Problem[S, Any], heuristic: HeuristicFunction, initial_state: Optional[S] = None,
+                     budget: int = 100000, sample: bool = False, depth: int = 100, seed: int = 0,
+                     processes: Optional[int] = None, keep: int = 5) -> VerificationReport:
+    start = time.perf_counter()
+    if initial_state is None: initial_state = problem.get_initial_state()
+    report = VerificationReport()
+    exact = None
+    if sample:
+        states = sample_states(problem, initial_state, budget, depth, seed)
+    else:
+        states, reverse, report.complete = enumerate_states(problem, initial_state, budget)
+        if report.complete: exact = exact_costs_from_edges(problem, states, reverse)
+        del reverse
+    if exact is None and hasattr(problem, "get_predecessors") and hasattr(problem, "goal"):
+        exact = exact_costs_from_predecessors(problem, states)
+    report.states, report.exact_costs = len(states), exact is not None
+    # The states are split into chunks so that the workers stay busy until the end
+    processes = max(1, processes or os.cpu_count() or 1)
+    # Without fork, the workers would need the problem, the heuristic and the states pickled (which may fail), so we check them here
+    if "fork" not in multiprocessing.get_all_start_methods(): processes = 1
+    chunk = max(1, min(2000, len(states) // (processes * 8) or 1))
+    tasks = [(begin, min(begin + chunk, len(states)), keep) for begin in range(0, len(states), chunk)]
+    worst = []
+    if processes == 1:
+        _verifier_init(problem, heuristic, states, exact)
+        results = map(_verify_range, tasks)
+        pool = None
+    else:
+        context = multiprocessing.get_context("fork")
+        pool = context.Pool(processes, initializer=_verifier_init, initargs=(problem, heuristic, states, exact))
+        results = pool.imap_unordered(_verify_range, tasks)
+    try:
+        for transitions, counts, violations in results:
+            report.transitions += transitions
+            for kind, count in counts.items(): report.violations[kind] += count
+            worst = nlargest(keep, worst + violations, key=lambda violation: violation[0])
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    for amount, kind, index, action_index, h, next_h, cost, exact_cost in worst:
+        state = states[index]
+        violation = Violation(kind, amount, state, h, exact=exact_cost)
+        if kind == "consistency":
+            violation.action = list(problem.get_actions(state))[action_index]
+            violation.next_state = problem.get_successor(state, violation.action)
+            violation.next_h, violation.cost = next_h, cost
+        report.worst.append(violation)
+    report.seconds = time.perf_counter() - start
+    return report
+
+def main(args: argparse.Namespace):
+    from batch_solve import detect_kind, load_problem, get_heuristic
+    kind = detect_kind(args.problem) if args.kind == "auto" else args.kind
+    if kind is None:
+        print(f"Could not detect the kind of '{args.problem}'", file=sys.stderr)
+        exit(-1)
+    problem = load_problem(args.problem, kind, args.packed)
+    heuristic = get_heuristic(kind, args.heuristic, args.packed)
+    report = verify_heuristic(problem, heuristic, budget=args.budget, sample=args.sample, depth=args.depth, seed=args.seed,
+                              processes=args.workers, keep=args.keep)
+    print(report)
+    exit(0 if report.passed else 1)
+
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Check the consistency and the admissibility of a heuristic on the reachable states of a problem")
+    parser.add_argument("problem", help="the problem file")
+    parser.add_argument("--heuristic", '-hf', default="strong",
+                        choices=["zero", "weak", "strong"],
+                        help="the sokoban heuristic to check (graphs and parking lots use their own heuristic, see batch_solve.py)")
+    parser.add_argument("--kind", "-k", default="auto",
+                        choices=["auto", "sokoban", "parking", "graph", "csr"],
+                        help="the kind of the problem file (auto detects it from the file)")
+    parser.add_argument("--packed", "-p", action="store_true", default=False,
+                        help="Check the heuristic on packed integer states for sokoban and parking problems")
+    parser.add_argument("--budget", "-b", type=int, default=100000,
+                        help="the maximum number of checked states")
+    parser.add_argument("--sample", "-s", action="store_true", default=False,
+                        help="Sample the states with random walks instead of enumerating them in BFS order")
+    parser.add_argument("--depth", "-d", type=int, default=100,
+                        help="the maximum length of each random walk")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="the seed of the random walks")
+    parser.add_argument("--workers", "-j", type=int, default=None,
+                        help="the number of worker processes (default: the number of CPUs)")
+    parser.add_argument("--keep", "-n", type=int, default=5,
+                        help="the number of the largest violations to print")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!", file=sys.stderr)
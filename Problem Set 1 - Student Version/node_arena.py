@@ -0,0 +1,66 @@
+from typing import Dict, Generic, List, Optional
+from array import array
+from problem import S, A
+
+# The node arena stores the search nodes of a graph search in parallel arrays instead of a dictionary of tuples
+# Every state is interned once to an integer id (the index of the node) and every action is interned once to an action index,
+# then the parent id, the action index, the path cost (g), the priority and the status flags of node i are stored at index i.
+# The frontier and the closed checks only need the node ids so each state object is stored once
+# (in the ids dictionary and the states list, which reference the same object).
+class NodeArena(Generic[S, A]):
+    # The status flags
+    CLOSED = 1
+
+    def __init__(self) -> None:
+        self.ids: Dict[S, int] = {}         # ids[state] is the id of the state's node
+        self.states: List[S] = []           # states[id] is the state of the node
+        self.parents = array('i')           # parents[id] is the id of the parent node (-1 for the root)
+        self.actions = array('i')           # actions[id] is the index of the action that leads from the parent to the node (-1 for the root)
+        self.costs = array('d')             # costs[id] is the path cost (g) of the node
+        self.priorities = array('d')        # priorities[id] is the priority that the node was last added to the frontier with
+        self.flags = bytearray()            # flags[id] is the combination of the status flags of the node
+        self.action_ids: Dict[A, int] = {}  # action_ids[action] is the index of the action
+        self.action_table: List[A] = []     # action_table[index] is the action
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    # Returns the id of the state's node or None if the state was never added
+    def get(self, state: S) -> Optional[int]:
+        return self.ids.get(state)
+
+    # Returns the index of the action (the action is interned if it is new)
+    def action_index(self, action: A) -> int:
+        index = self.action_ids.get(action)
+        if index is None:
+            index = self.action_ids[action] = len(self.action_table)
+            self.action_table.append(action)
+        return index
+
+    # Add a node for a new state and return its id (parent is -1 and action is None for the root)
+    def add(self, state: S, parent: int, action: Optional[A], cost: float, priority: float) -> int:
+        node = len(self.states)
+        self.ids[state] = node
+        self.states.append(state)
+        self.parents.append(parent)
+        self.actions.append(-1 if action is None else self.action_index(action))
+        self.costs.append(cost)
+        self.priorities.append(priority)
+        self.flags.append(0)
+        return node
+
+    # Change the parent of a node (when a cheaper path to its state is found)
+    def update(self, node: int, parent: int, action: A, cost: float, priority: float) -> None:
+        self.parents[node] = parent
+        self.actions[node] = self.action_index(action)
+        self.costs[node] = cost
+        self.priorities[node] = priority
+
+    # Walk the parent ids from the given node back to the root to get the list of actions
+    def path(self, node: int) -> List[A]:
+        parents, actions, action_table = self.parents, self.actions, self.action_table
+        path = []
+        while parents[node] != -1:
+            path.append(action_table[actions[node]])
+            node = parents[node]
+        return path[::-1]
@@ -1,7 +1,8 @@
 from typing import Any, Dict, Set, Tuple, List
 from problem import Problem
-from mathutils import Direction, Point
+from mathutils import Direction, GridIndex, Point
 from helpers.utils import NotImplemented
+from zobrist import ZobristKeys
 
 #DONE: (Optional) Instead of Any, you can define a type for the parking state
 ParkingState = Tuple[Point] # A tuple of points where state[i] is the position of car 'i'. and I decided to make it a tuple to be similar to cars
@@ -9,6 +10,9 @@ ParkingState = Tuple[Point] # A tuple of points where state[i] is the position o
 # An action of the parking problem is a tuple containing an index 'i' and a direction 'd' where car 'i' should move in the direction 'd'.
 ParkingAction = Tuple[int, Direction]
 
+# This is the order in which the directions of each car are listed in the actions
+ParkingDirections = (Direction.RIGHT, Direction.LEFT, Direction.UP, Direction.DOWN)
+
 # This is the implementation of the parking problem
 class ParkingProblem(Problem[ParkingState, ParkingAction]):
     passages: Set[Point]    # A set of points which indicate where a car can be (in other words, every position except walls).
@@ -17,6 +21,13 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
                             # if a position does not contain a parking slot, it will not be in this dictionary.
     width: int              # The width of the parking lot.
     height: int             # The height of the parking lot.
+    # The following tables are indexed by the cell index "y * width + x" (see GridIndex) so the inner loops work on integers
+    # and the positions in the states are the interned points of the grid
+    grid: GridIndex
+    cell_slots: Tuple[int]                      # cell_slots[cell] is the index of the car whose slot is at this cell (or -1 if there is no slot)
+    moves: Tuple[Tuple[Tuple[Direction, int]]]  # For every passage cell, a tuple of (direction, next cell) for each direction that leads to another passage.
+                                                # The directions are in the order RIGHT, LEFT, UP, DOWN which is the order of the actions.
+    steps: Tuple[Tuple[int]]                    # For every passage cell, steps[cell][direction] is the next cell in the direction (or -1 if it is a wall).
 
     # This function should return the initial state
     def get_initial_state(self) -> ParkingState:
@@ -25,47 +36,68 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
     # This function should return True if the given state is a goal. Otherwise, it should return False.
     def is_goal(self, state: ParkingState) -> bool:
         #need to check if each car is on its slot
+        width, cell_slots = self.width, self.cell_slots
         for s in range(len(state)): #loop as index in order to get index of car for checking if the slot that the car at is correct
-            if self.slots.get(state[s]) != s: #checking if the slot that the car at is correct goal point
+            if cell_slots[state[s].y * width + state[s].x] != s: #checking if the slot that the car at is correct goal point
                 return False
         return True
     
     # This function returns a list of all the possible actions that can be applied to the given state
     def get_actions(self, state: ParkingState) -> List[ParkingAction]:
         ans = []
-        for s in range(len(state)):
-            #using function add to move 1 step in each direction to check if valid along with checking there is no car there
-            goRight = state[s].__add__(Direction.RIGHT.to_vector()) 
-            if (goRight in self.passages) and (goRight not in state): 
-                ans.append((s,Direction.RIGHT))
-            goLeft = state[s].__add__(Direction.LEFT.to_vector())
-            if (goLeft in self.passages) and (goLeft not in state): 
-                ans.append((s,Direction.LEFT))
-            goUp = state[s].__add__(Direction.UP.to_vector())
-            if (goUp in self.passages) and (goUp not in state): 
-                ans.append((s,Direction.UP))
-            goDown = state[s].__add__(Direction.DOWN.to_vector())
-            if (goDown in self.passages) and (goDown not in state): 
-                ans.append((s,Direction.DOWN))
+        width, moves = self.width, self.moves
+        cells = [position.y * width + position.x for position in state]
+        occupied = 0 # a bitmask of the occupied cells, computed once for the state so that each check is O(1)
+        for cell in cells: occupied |= 1 << cell
+        for s in range(len(cells)):
+            #using the precomputed move table to get the cells we can move to in each direction (walls are already excluded) and check there is no car there
+            for direction, cell in moves[cells[s]]:
+                if not occupied >> cell & 1:
+                    ans.append((s, direction))
         return ans
              
     
     # This function returns a new state which is the result of applying the given action to the given state
     def get_successor(self, state: ParkingState, action: ParkingAction) -> ParkingState:
-        newState = state[action[0]].__add__(action[1].to_vector()) #get the new state of the car
+        newState = self._step(state[action[0]], action[1]) #get the new state of the car
         tempStat = list(state)                                      #make a list of the state to be able to change it
         tempStat[action[0]] = newState                              #change the state of the car
         return tuple(tempStat)
     
     # This function returns the cost of applying the given action to the given state
     def get_cost(self, state: ParkingState, action: ParkingAction) -> float:
-        newPos = state[action[0]].__add__(action[1].to_vector())
-        if newPos in self.slots and action[0] != self.slots.get(newPos) : #if the car is on the slot of another car
+        newPos = self._step(state[action[0]], action[1])
+        slot = self.cell_slots[newPos.y * self.width + newPos.x] if newPos in self.grid else -1
+        if slot != -1 and action[0] != slot : #if the car is on the slot of another car
             #apply cost of 100 plus rank of car
             return (26-action[0]) + 100
         else:
             return 26-action[0] #else cost according to car rank
 
+    # The following functions implement Zobrist hashing (see zobrist.py)
+    # There is a group of keys for each car with a key for every cell (the cell index is "y * width + x")
+    def zobrist_keys(self) -> ZobristKeys:
+        return ZobristKeys([self.width * self.height] * len(self.cars))
+
+    def zobrist_hash(self, state: ParkingState, keys: ZobristKeys) -> int:
+        hash = 0
+        for car, position in enumerate(state):
+            hash ^= keys[car][self.grid.cell_of(position)]
+        return hash
+
+    def zobrist_update(self, hash: int, state: ParkingState, action: ParkingAction, keys: ZobristKeys) -> int:
+        car, direction = action
+        position, next_position = state[car], self._step(state[car], direction)
+        car_keys, cell_of = keys[car], self.grid.cell_of
+        return hash ^ car_keys[cell_of(position)] ^ car_keys[cell_of(next_position)]
+
+    # Returns the position we reach by moving one step from the given position in the given direction
+    # The precomputed step table is used for passages (and gives an interned point), other moves (e.g. into a wall) are computed directly
+    def _step(self, position: Point, direction: Direction) -> Point:
+        if position in self.grid:
+            steps = self.steps[position.y * self.width + position.x]
+            if steps and steps[direction] != -1: return self.grid.points[steps[direction]]
+        return position + direction.to_vector()
 
      # Read a parking problem from text containing a grid of tiles
     @staticmethod
@@ -74,22 +106,33 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
         cars, slots = {}, {}
         lines = [line for line in (line.strip() for line in text.splitlines()) if line]
         width, height = max(len(line) for line in lines), len(lines)
+        grid = GridIndex(width, height)
         for y, line in enumerate(lines):
             for x, char in enumerate(line):
                 if char != "#":
-                    passages.add(Point(x, y))
+                    position = grid.points[y * width + x]
+                    passages.add(position)
                     if char == '.':
                         pass
                     elif char in "ABCDEFGHIJ":
-                        cars[ord(char) - ord('A')] = Point(x, y)
+                        cars[ord(char) - ord('A')] = position
                     elif char in "0123456789":
-                        slots[int(char)] = Point(x, y)
+                        slots[int(char)] = position
         problem = ParkingProblem()
         problem.passages = passages
         problem.cars = tuple(cars[i] for i in range(len(cars)))
         problem.slots = {position:index for index, position in slots.items()}
         problem.width = width
         problem.height = height
+        # precompute the move tables once so that the actions and successors do not need to create new points
+        problem.grid = grid
+        cell_slots = [-1] * grid.size
+        for position, index in problem.slots.items():
+            cell_slots[grid.cell_of(position)] = index
+        problem.cell_slots = tuple(cell_slots)
+        problem.steps = grid.neighbors(grid.cell_of(position) for position in passages)
+        problem.moves = tuple(tuple((direction, steps[direction]) for direction in ParkingDirections if steps[direction] != -1) if steps else ()
+                              for steps in problem.steps)
         return problem
 
     # Read a parking problem from file containing a grid of tiles
@@ -98,3 +141,91 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
         with open(path, 'r') as f:
             return ParkingProblem.from_text(f.read())
     
+
+# The packed parking state is a tuple of integers where state[i] is the index "y * width + x" of the cell of car 'i'
+PackedParkingState = Tuple[int]
+
+# This is the same parking problem but it works on packed states
+# The actions are the same and they are listed in the same order as in ParkingProblem,
+# so any search function will give the same result on both problems
+class PackedParkingProblem(Problem[PackedParkingState, ParkingAction]):
+    width: int
+    height: int
+    grid: GridIndex
+    cars: PackedParkingState
+    slots: Tuple[int]                         # slots[cell] is the index of the car whose slot is at this cell (or -1 if there is no slot)
+    moves: Tuple[Tuple[Tuple[Direction, int]]] # moves[cell] is a tuple of (direction, next cell) in the action order
+    steps: Tuple[Tuple[int]]                  # steps[cell][direction] is the next cell in the given direction (or -1 if it is a wall)
+
+    def get_initial_state(self) -> PackedParkingState:
+        return self.cars
+
+    def is_goal(self, state: PackedParkingState) -> bool:
+        slots = self.slots
+        for car, cell in enumerate(state):
+            if slots[cell] != car: return False
+        return True
+
+    def get_actions(self, state: PackedParkingState) -> List[ParkingAction]:
+        occupied = 0 # a bitmask of the occupied cells
+        for cell in state: occupied |= 1 << cell
+        moves = self.moves
+        actions = []
+        for car, cell in enumerate(state):
+            for direction, next_cell in moves[cell]:
+                if not occupied >> next_cell & 1:
+                    actions.append((car, direction))
+        return actions
+
+    def get_successor(self, state: PackedParkingState, action: ParkingAction) -> PackedParkingState:
+        car, direction = action
+        next_state = list(state)
+        next_state[car] = self.steps[state[car]][direction]
+        return tuple(next_state)
+
+    def get_cost(self, state: PackedParkingState, action: ParkingAction) -> float:
+        car, direction = action
+        slot = self.slots[self.steps[state[car]][direction]]
+        if slot != -1 and slot != car: #if the car is on the slot of another car
+            return (26 - car) + 100
+        return 26 - car
+
+    # The following functions implement Zobrist hashing (see zobrist.py) with the same keys as ParkingProblem
+    def zobrist_keys(self) -> ZobristKeys:
+        return ZobristKeys([self.width * self.height] * len(self.cars))
+
+    def zobrist_hash(self, state: PackedParkingState, keys: ZobristKeys) -> int:
+        hash = 0
+        for car, cell in enumerate(state):
+            hash ^= keys[car][cell]
+        return hash
+
+    def zobrist_update(self, hash: int, state: PackedParkingState, action: ParkingAction, keys: ZobristKeys) -> int:
+        car, direction = action
+        cell = state[car]
+        return hash ^ keys[car][cell] ^ keys[car][self.steps[cell][direction]]
+
+    # Convert a parking state to a packed state and vice versa
+    def pack(self, state: ParkingState) -> PackedParkingState:
+        return tuple(position.y * self.width + position.x for position in state)
+
+    def unpack(self, state: PackedParkingState) -> ParkingState:
+        points = self.grid.points
+        return tuple(points[cell] for cell in state)
+
+    # Create a packed problem from the given parking problem
+    @staticmethod
+    def from_problem(problem: ParkingProblem) -> 'PackedParkingProblem':
+        packed = PackedParkingProblem()
+        packed.width = problem.width
+        packed.height = problem.height
+        # the tables of the parking problem are already indexed by cell so they are shared
+        packed.slots, packed.steps, packed.moves = problem.cell_slots, problem.steps, problem.moves
+        packed.grid = problem.grid
+        packed.cars = packed.pack(problem.cars)
+        return packed
+
+    # Read a packed parking problem from file containing a grid of tiles
+    @staticmethod
+    def from_file(path: str) -> 'PackedParkingProblem':
+        return PackedParkingProblem.from_problem(ParkingProblem.from_file(path))
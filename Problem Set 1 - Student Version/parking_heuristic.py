@@ -0,0 +1,129 @@
+from typing import Optional, Tuple, Union
+from array import array
+from heapq import heappush, heappop
+from parking import ParkingProblem, ParkingState, PackedParkingProblem, PackedParkingState
+from problem import HeuristicFunction
+import hashlib, os, pickle
+
+# This file implements an additive pattern database heuristic for the parking problem
+# The cars are split into groups and, for each group, we compute the exact cost of parking the cars of that group
+# in an abstract problem where the other cars are removed and only the moves of the group's cars are paid for.
+# Since every action moves exactly one car, its cost is counted by exactly one group,
+# so the sum over the groups is admissible and consistent.
+# The tables only depend on the lot layout (walls and slots) and the groups, not on the initial positions of the cars,
+# so they are stored on disk and loaded again for any problem with the same layout.
+
+# The directory where the pattern databases are stored
+PATTERN_DATABASE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".pattern_databases")
+# This is a part of the file key so that the old files are ignored if the table format changes
+PATTERN_DATABASE_VERSION = 1
+
+# The pattern database of a lot:
+#   groups: the cars of each group
+#   cells: for every cell index "y * width + x", the index of the passage in the abstract states (or -1 for walls)
+#   passage_count: the number of passages (P)
+#   tables: for each group, tables[group][index] is the cost to park the group where the index of an abstract state
+#           with the group's cars on passages p0, p1, ... is "p0 + p1 * P + p2 * P^2 ..." (P is the number of passages)
+PatternDatabase = Tuple[Tuple[Tuple[int]], Tuple[int], int, Tuple[array]]
+
+# Split the cars into groups of consecutive cars with at most group_size cars in each group
+def partition_cars(car_count: int, group_size: int) -> Tuple[Tuple[int]]:
+    return tuple(tuple(range(start, min(start + group_size, car_count))) for start in range(0, car_count, group_size))
+
+# Compute the exact cost of parking the given group of cars from every placement of the group's cars
+# We run a uniform cost search backward from the goal placement. Moving a car from a cell to a neighbor
+# has the same cost as in the parking problem (it depends on the car and the cell it moves into).
+def build_pattern_table(problem: PackedParkingProblem, group: Tuple[int], cells: Tuple[int], passage_count: int) -> array:
+    infinity = float('inf')
+    table = array('d', [infinity]) * (passage_count ** len(group))
+    goal = []
+    for car in group:
+        if car not in problem.slots: return table # this car has no slot so the group can never be parked
+        goal.append(problem.slots.index(car))
+    multipliers = [passage_count ** position for position in range(len(group))]
+    encode = lambda placement: sum(cells[cell] * multiplier for cell, multiplier in zip(placement, multipliers))
+    # The cost of moving each car into each cell
+    move_costs = [[(26 - car) + (100 if problem.slots[cell] not in (-1, car) else 0) for cell in range(len(cells))] for car in group]
+    goal = tuple(goal)
+    table[encode(goal)] = 0
+    frontier = [(0, goal)]
+    while frontier:
+        cost, placement = heappop(frontier)
+        if cost > table[encode(placement)]: continue # an outdated entry
+        for position, cell in enumerate(placement):
+            # The car at "position" could have come to "cell" from any neighboring passage that is not occupied
+            next_cost = cost + move_costs[position][cell]
+            for previous_cell in problem.steps[cell]:
+                if previous_cell == -1 or previous_cell in placement: continue
+                previous = placement[:position] + (previous_cell,) + placement[position+1:]
+                index = encode(previous)
+                if next_cost < table[index]:
+                    table[index] = next_cost
+                    heappush(frontier, (next_cost, previous))
+    return table
+
+# This key identifies the lot layout and the groups, it is used as the file name of the pattern database
+def pattern_database_key(problem: PackedParkingProblem, groups: Tuple[Tuple[int]]) -> str:
+    description = repr((PATTERN_DATABASE_VERSION, problem.width, problem.height, problem.slots, problem.steps, groups))
+    return hashlib.sha1(description.encode()).hexdigest()
+
+# Build the pattern database of the problem or load it from the directory if it was built before
+# If the directory is None, the pattern database is not stored on disk
+def load_pattern_database(problem: PackedParkingProblem, group_size: int = 2, directory: Optional[str] = PATTERN_DATABASE_DIRECTORY) -> PatternDatabase:
+    groups = partition_cars(len(problem.cars), group_size)
+    path = None
+    if directory is not None:
+        path = os.path.join(directory, pattern_database_key(problem, groups) + ".pdb")
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+    cells, passage_count = [], 0
+    for steps in problem.steps:
+        if steps:
+            cells.append(passage_count)
+            passage_count += 1
+        else:
+            cells.append(-1)
+    cells = tuple(cells)
+    database = (groups, cells, passage_count, tuple(build_pattern_table(problem, group, cells, passage_count) for group in groups))
+    if path is not None:
+        # We write to a temporary file first so that a concurrent run never reads a partially written file
+        # If the directory is not writable, we just skip storing the pattern database
+        try:
+            os.makedirs(directory, exist_ok=True)
+            temporary_path = f"{path}.{os.getpid()}.tmp"
+            with open(temporary_path, 'wb') as f:
+                pickle.dump(database, f)
+            os.replace(temporary_path, path)
+        except OSError:
+            pass
+    return database
+
+# Returns a heuristic that uses pattern databases with the given group size
+# Larger groups give a better estimate, but the size of each table is (number of passages)^group_size
+# The heuristic works with both ParkingProblem and PackedParkingProblem
+def pattern_database_heuristic_with(group_size: int = 2, directory: Optional[str] = PATTERN_DATABASE_DIRECTORY) -> HeuristicFunction:
+    cache_key = ("pattern_database", group_size, directory)
+    def heuristic(problem: Union[ParkingProblem, PackedParkingProblem], state: Union[ParkingState, PackedParkingState]) -> float:
+        # The pattern database is loaded once per problem and stored in the problem cache
+        cache = problem.cache()
+        database = cache.get(cache_key)
+        if database is None:
+            packed = problem if isinstance(problem, PackedParkingProblem) else PackedParkingProblem.from_problem(problem)
+            database = cache[cache_key] = load_pattern_database(packed, group_size, directory)
+        groups, cells, passage_count, tables = database
+        if not isinstance(problem, PackedParkingProblem):
+            width = problem.width
+            state = tuple(position.y * width + position.x for position in state)
+        total = 0
+        for group, table in zip(groups, tables):
+            index, multiplier = 0, 1
+            for car in group:
+                index += cells[state[car]] * multiplier
+                multiplier *= passage_count
+            total += table[index]
+        return total
+    return heuristic
+
+# The default pattern database heuristic (groups of 2 cars, stored in PATTERN_DATABASE_DIRECTORY)
+pattern_database_heuristic = pattern_database_heuristic_with()
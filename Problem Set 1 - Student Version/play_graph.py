@@ -1,7 +1,8 @@
 import time
-from graph import GraphRoutingProblem, GraphNode, graphrouting_heuristic
-from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
+from graph import GraphRoutingProblem, GraphNode, graphrouting_heuristic, graphrouting_distance
+from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent, ShortestPathTreeAgent, IncrementalSearchAgent
 from helpers.utils import fetch_recorded_calls
+from search_statistics import SearchStatistics
 import argparse, os, json
 
 # Create an agent based on the user selections
@@ -35,12 +36,34 @@ def create_agent(args: argparse.Namespace):
     if agent_type == "ucs":
         from search import UniformCostSearch
         return UninformedSearchAgent(UniformCostSearch)
+    if agent_type == "bidir":
+        from search import BidirectionalUniformCostSearch
+        return UninformedSearchAgent(BidirectionalUniformCostSearch)
     if agent_type == "astar":
         from search import AStarSearch
         return InformedSearchAgent(AStarSearch, graphrouting_heuristic)
+    if agent_type == "alt":
+        from search import AStarSearch
+        from graph_landmarks import landmark_heuristic
+        return InformedSearchAgent(AStarSearch, landmark_heuristic)
+    if agent_type == "ch":
+        from contraction_hierarchy import ContractionHierarchySearch
+        return UninformedSearchAgent(ContractionHierarchySearch)
+    if agent_type == "tree":
+        # One backward search from the goal gives the next action for every state that can reach the goal
+        return ShortestPathTreeAgent()
+    if agent_type == "dstar":
+        # D* Lite keeps its search between the steps and only repairs it when the graph changes
+        return IncrementalSearchAgent(graphrouting_distance)
     if agent_type == "gbfs":
         from search import BestFirstSearch
         return InformedSearchAgent(BestFirstSearch, graphrouting_heuristic)
+    if agent_type == "idastar":
+        from search import IterativeDeepeningAStarSearch
+        return InformedSearchAgent(IterativeDeepeningAStarSearch, graphrouting_heuristic)
+    if agent_type == "rbfs":
+        from search import RecursiveBestFirstSearch
+        return InformedSearchAgent(RecursiveBestFirstSearch, graphrouting_heuristic)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
@@ -61,6 +84,16 @@ def main(args: argparse.Namespace):
         print(figure)
     print("Current Node:", state)
     agent = create_agent(args)
+    # The ALT agent loads the landmarks that are stored next to the graph file (or builds and stores them)
+    if args.agent == "alt":
+        from graph_landmarks import load_landmarks
+        load_landmarks(problem, graph_path, args.landmarks)
+    # The contraction hierarchy agent loads the hierarchy that is stored next to the graph file (or builds and stores it)
+    if args.agent == "ch":
+        from contraction_hierarchy import load_contraction_hierarchy
+        load_contraction_hierarchy(problem, graph_path)
+    # The search agents collect the search statistics in this object
+    if not isinstance(agent, HumanAgent): agent.stats = SearchStatistics()
     step = 0 # This will store the current step
     path_cost = 0 # This will store the total path cost
     traversed_nodes = [] # This will store all the traversed nodes in order of traversal
@@ -89,9 +122,12 @@ def main(args: argparse.Namespace):
         print("Current Node:", state)
     if not unsolvable: print("YOU WON!!")
     print("Path Cost:", path_cost)
-    # This was a search agent, display the traversed nodes
+    # This was a search agent, display the traversed nodes and the number of expanded nodes (as counted by SearchStatistics)
     if not isinstance(agent, HumanAgent):
         print(f"Traversal Order: {'->'.join(traversed_nodes)}")
+        print(f"Search expanded {agent.stats.expanded} nodes")
+        # If desired by the user, print all the search statistics as JSON
+        if args.stats: print(agent.stats.to_json())
     # Finally print the elapsed time for the whole process
     print(f"Elapsed time: {time.time() - start} seconds")
 
@@ -100,8 +136,12 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Graph as Human or AI")
     parser.add_argument("graph", help="path to the graph to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'bidir', 'astar', 'alt', 'ch', 'tree', 'dstar', 'gbfs', 'idastar', 'rbfs'],
                         help="the agent that will play the game")
+    parser.add_argument("--landmarks", "-l", type=int, default=8,
+                        help="the number of landmarks used by the ALT agent")
+    parser.add_argument("--stats", "-st", action="store_true", default=False,
+                        help="Print the search statistics as JSON")
 
     args = parser.parse_args()
     try:
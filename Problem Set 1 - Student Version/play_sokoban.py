@@ -1,10 +1,10 @@
 from typing import List
-from sokoban import SokobanProblem, Direction, SokobanState, SokobanTile
-from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
-from helpers.utils import fetch_tracked_call_count
+from sokoban import SokobanProblem, PackedSokobanProblem, PushSokobanProblem, Direction, SokobanState, SokobanTile, unpacked_heuristic, push_level_search
+from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent, PortfolioAgent, PortfolioConfig
+from search_statistics import SearchStatistics
 from helpers.heuristic_checks import test_heuristic_consistency
-from functools import lru_cache
-import argparse, time
+from helpers.utils import memoized
+import argparse, json, time
 
 def colored_sokoban(level: str):
     from helpers.utils import bcolors
@@ -18,18 +18,31 @@ def colored_sokoban(level: str):
     return level
 
 # Return the heuristic selected by the user
-def get_heuristic(name: str):
+# If the search runs on packed states, the heuristic is wrapped to unpack the state first
+def get_heuristic(name: str, packed: bool = False):
     if name == "zero":
         return lambda *_: 0
     if name == "weak":
         from sokoban_heuristic import weak_heuristic
-        return weak_heuristic
+        return unpacked_heuristic(weak_heuristic) if packed else weak_heuristic
     if name == "strong":
         from sokoban_heuristic import strong_heuristic
-        return strong_heuristic
+        return unpacked_heuristic(strong_heuristic) if packed else strong_heuristic
     print(f"Requested Heuristic '{name}' is invalid")
     exit(-1)
 
+# Track every transition of the searched problem and check the heuristic consistency for each transition
+# With --push, the searches run on PushSokobanProblem (see push_level_search) so its transitions are checked instead
+# and the heuristic is given the packed push states (it is unpacked first if it was written for SokobanState)
+def add_consistency_checks(args: argparse.Namespace, heuristic) -> None:
+    if args.push:
+        if not args.packed: heuristic = unpacked_heuristic(heuristic)
+        PushSokobanProblem.get_successor = test_heuristic_consistency(heuristic)(PushSokobanProblem.get_successor)
+    else:
+        # The search agents work on packed states if requested by the user
+        problem_class = PackedSokobanProblem if args.packed else SokobanProblem
+        problem_class.get_successor = test_heuristic_consistency(heuristic)(problem_class.get_successor)
+
 # Create an agent based on the user selections
 def create_agent(args: argparse.Namespace):
     agent_type: str = args.agent
@@ -62,19 +75,58 @@ def create_agent(args: argparse.Namespace):
     if agent_type == "astar":
         from search import AStarSearch
         # We cache the heuristic calls to speed up the search process if the heuristic is not fast
-        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # (the values are stored in a bounded table of the problem, see CacheContainer.memo)
+        heuristic = memoized(get_heuristic(args.heuristic, args.packed), args.memo_size, args.memo_policy)
         # If desired by the user, we track every transition and check for the heuristic consistency for each transition
         if args.checks:
-            SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
+            add_consistency_checks(args, heuristic)
         return InformedSearchAgent(AStarSearch, heuristic)
     if agent_type == "gbfs":
         from search import BestFirstSearch
         # We cache the heuristic calls to speed up the search process if the heuristic is not fast
-        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        heuristic = memoized(get_heuristic(args.heuristic, args.packed), args.memo_size, args.memo_policy)
         # If desired by the user, we track every transition and check for the heuristic consistency for each transition
         if args.checks:
-            SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
+            add_consistency_checks(args, heuristic)
         return InformedSearchAgent(BestFirstSearch, heuristic)
+    if agent_type == "idastar":
+        from search import IterativeDeepeningAStarSearch
+        from functools import partial
+        heuristic = memoized(get_heuristic(args.heuristic, args.packed), args.memo_size, args.memo_policy)
+        if args.checks:
+            add_consistency_checks(args, heuristic)
+        # The transposition table size is given by the user (0 means that only the current path is stored)
+        # and the table is keyed by the Zobrist hashes of the states if requested (the push-level problem does not implement them)
+        if args.zobrist and args.push:
+            print("The Zobrist transposition table can not be used with --push")
+            exit(-1)
+        return InformedSearchAgent(partial(IterativeDeepeningAStarSearch, table_size=args.table_size, zobrist=args.zobrist), heuristic)
+    if agent_type == "rbfs":
+        from search import RecursiveBestFirstSearch
+        heuristic = memoized(get_heuristic(args.heuristic, args.packed), args.memo_size, args.memo_policy)
+        if args.checks:
+            add_consistency_checks(args, heuristic)
+        return InformedSearchAgent(RecursiveBestFirstSearch, heuristic)
+    if agent_type == "arastar":
+        from search import AnytimeRepairingAStarSearch
+        from functools import partial
+        heuristic = memoized(get_heuristic(args.heuristic, args.packed), args.memo_size, args.memo_policy)
+        if args.checks:
+            add_consistency_checks(args, heuristic)
+        # Every solution found by ARA* is reported with its cost and suboptimality bound
+        report = lambda solution, cost, bound: print(f"ARA* found a solution with cost {cost} (at most {bound:.3f} times the optimal cost)")
+        return InformedSearchAgent(partial(AnytimeRepairingAStarSearch, time_limit=args.time_limit, on_solution=report), heuristic)
+    if agent_type == "portfolio":
+        from search import BreadthFirstSearch, AStarSearch, BestFirstSearch
+        # Each configuration gets its own cached heuristic since each one runs in a separate process
+        cached_heuristic = lambda name: memoized(get_heuristic(name, args.packed), args.memo_size, args.memo_policy)
+        # BFS is optimal for sokoban since all the actions have the same cost
+        return PortfolioAgent([
+            PortfolioConfig("bfs", BreadthFirstSearch, optimal=True),
+            PortfolioConfig("astar-weak", AStarSearch, cached_heuristic("weak"), optimal=True),
+            PortfolioConfig("astar-strong", AStarSearch, cached_heuristic("strong"), optimal=True),
+            PortfolioConfig("gbfs-strong", BestFirstSearch, cached_heuristic("strong")),
+        ], processes=args.processes, grace=args.grace)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
@@ -87,19 +139,27 @@ def main(args: argparse.Namespace):
     print("Initial State:")
     state_printer(state)
     agent = create_agent(args)
+    # If requested, the search agents search over crate pushes and expand the pushes back to the player steps
+    if args.push and isinstance(agent, (UninformedSearchAgent, InformedSearchAgent)):
+        agent.search_fn = push_level_search(agent.search_fn)
+    # The search agents collect the search statistics in this object
+    if not isinstance(agent, HumanAgent): agent.stats = SearchStatistics()
+    # If requested, the search agents work on the packed version of the problem
+    # while the game loop still uses the original problem to apply the actions and display the states
+    problem.prune_dead_squares = args.prune
+    search_problem = problem
+    if args.packed and not isinstance(agent, HumanAgent):
+        search_problem = PackedSokobanProblem.from_problem(problem)
     step = 0 # This will store the current step
-    total_explored_nodes = 0 # This will store the number of traversed nodes during search
     unsolvable = False # This will store whether the problem is unsolvable or not
     while not problem.is_goal(state):
-        fetch_tracked_call_count(SokobanProblem.is_goal) # Clear the call counter
-        action = agent.act(problem, state) # Request an action from the agent
+        observation = search_problem.pack(state) if search_problem is not problem else state
+        action = agent.act(search_problem, observation) # Request an action from the agent
         # If no solution was found, break
         if action is None:
             print("Agent cannot find a solution, exiting...")
             unsolvable = True
             break
-        # Get the number of traversed nodes
-        total_explored_nodes += fetch_tracked_call_count(SokobanProblem.is_goal)
         # Apply the action to the state
         state = problem.get_successor(state, action)
         step += 1
@@ -110,13 +170,27 @@ def main(args: argparse.Namespace):
     if not unsolvable: 
         # If desired by the user, we check that the heuristic is zero at the goal state
         if args.checks and isinstance(agent, InformedSearchAgent):
-            goal_heuristic = agent.heuristic(problem, state)
+            observation = search_problem.pack(state) if search_problem is not problem else state
+            goal_heuristic = agent.heuristic(search_problem, observation)
             if goal_heuristic != 0:
                 print(f"ERROR: Expected heuristic at goal to be 0, got {goal_heuristic}")
         print("YOU WON!!")
-    # This was a search agent, display the number of traversed nodes
+    # This was a search agent, display the number of expanded nodes
+    # (the states whose successors were generated, as counted by SearchStatistics, not the number of goal tests)
     if not isinstance(agent, HumanAgent):
-        print(f"Search explored {total_explored_nodes} nodes")
+        print(f"Search expanded {agent.stats.expanded} nodes")
+        # For the portfolio agent, print which configuration won and how long each configuration ran
+        if isinstance(agent, PortfolioAgent):
+            if agent.winner is not None: print(f"Portfolio winner: {agent.winner.name}")
+            for result in agent.report:
+                cost = "" if result.cost is None else f", cost {result.cost}"
+                print(f"  {result.name}: {result.status} after {result.elapsed:.3f} seconds{cost}")
+        # If desired by the user, print all the search statistics and the counters of the memoization tables as JSON
+        # (the portfolio agent and the uninformed searches have no tables in this process, so nothing is printed for them)
+        if args.stats:
+            print(agent.stats.to_json())
+            counters = search_problem.memo_counters()
+            if counters: print(json.dumps(counters))
     # Finally print the elapsed time for the whole process
     print(f"Elapsed time: {time.time() - start} seconds")
 
@@ -126,13 +200,35 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Sokoban as Human or AI")
     parser.add_argument("level", help="path to the sokoban level to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs', 'idastar', 'rbfs', 'arastar', 'portfolio'],
                         help="the agent that will play the game")
     parser.add_argument("--heuristic", '-hf', default="zero",
                         choices=["zero", "weak", "strong"],
                         help="choose the heuristic to use with A* or Greedy Best First Search")
+    parser.add_argument("--table-size", "-ts", type=int, default=0,
+                        help="the maximum number of states in the transposition table of IDA* (0 disables the table)")
+    parser.add_argument("--zobrist", "-z", action="store_true", default=False,
+                        help="Key the transposition table of IDA* by the Zobrist hashes of the states (see zobrist.py)")
+    parser.add_argument("--time-limit", "-tl", type=float, default=0.2,
+                        help="the time budget (seconds) of ARA* (the first solution is returned even if it takes longer)")
+    parser.add_argument("--processes", "-j", type=int, default=None,
+                        help="the number of processes used by the portfolio agent (default: one per configuration)")
+    parser.add_argument("--grace", "-g", type=float, default=None,
+                        help="the time (seconds) the portfolio agent waits for an optimal solution after getting a non-optimal one (default: until the optimal searches finish)")
+    parser.add_argument("--memo-size", "-ms", type=int, default=2**16,
+                        help="the maximum number of heuristic values cached per problem")
+    parser.add_argument("--memo-policy", "-mp", default="lru", choices=["lru", "clock"],
+                        help="which cached heuristic value is evicted when the cache is full")
+    parser.add_argument("--packed", "-p", action="store_true", default=False,
+                        help="Search on packed integer states instead of SokobanState (faster)")
+    parser.add_argument("--push", "-pu", action="store_true", default=False,
+                        help="Search over crate pushes instead of player steps (finds the fewest pushes, use the strong heuristic)")
+    parser.add_argument("--prune", "-pr", action="store_true", default=False,
+                        help="Never push crates into dead squares (squares from which a crate can not reach any goal)")
     parser.add_argument("--checks", "-c", action='store_true', default=False,
-                        help="Enable consistency checks for the heuristic")
+                        help="Enable consistency checks for the heuristic during the search (heuristic_verifier.py checks it offline)")
+    parser.add_argument("--stats", "-st", action="store_true", default=False,
+                        help="Print the search statistics as JSON")
     parser.add_argument("--ansicolors", "-ac", action="store_true",
                         help="Print the level on the console with ANSI colors (only works on some terminals)")
 
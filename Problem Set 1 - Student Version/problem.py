@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Generic, Iterable, List, TypeVar, Union
+from typing import Callable, Generic, Iterable, List, Tuple, TypeVar, Union
 from helpers.utils import CacheContainer, with_cache
 
 # S and A are used for generic typing where S represents the state type and A represents the action type
@@ -34,6 +34,19 @@ class Problem(ABC, Generic[S, A], CacheContainer):
     def get_cost(self, state: S, action: A) -> float:
         return 1.0
 
+    # Problems whose edges can change (for example, see GraphRoutingProblem.set_cost) report every changed edge
+    # as a (state, next state) pair so that incremental searches can repair their results instead of searching again
+    # (see IncrementalSearchAgent in agents.py)
+    def report_changed_edges(self, edges: Iterable[Tuple[S, S]]) -> None:
+        if not hasattr(self, "_changed_edges"): self._changed_edges = []
+        self._changed_edges.extend(edges)
+
+    # Returns the edges that were reported after the first "since" changes and the total number of reported changes
+    # (which should be passed as "since" in the next call to get only the new changes)
+    def get_changed_edges(self, since: int = 0) -> Tuple[List[Tuple[S, S]], int]:
+        changes = getattr(self, "_changed_edges", [])
+        return changes[since:], len(changes)
+
 # These are type aliases for:
 # A solution which is a list of actions (or None if no solution is found)
 Solution = Union[List[A], None]
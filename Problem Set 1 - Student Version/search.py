@@ -2,9 +2,17 @@ from problem import HeuristicFunction, Problem, S, A, Solution
 from collections import deque
 from helpers.utils import NotImplemented
 from queue import LifoQueue
+from typing import Any, Callable, Iterator, Optional, Tuple
 
 #DONE: Import any modules you want to use
-import heapq
+from frontier import PriorityFrontier
+from node_arena import NodeArena
+from heapq import heappush, heappop, heapify
+from itertools import count
+from collections import OrderedDict
+from search_statistics import SearchStatistics
+from zobrist import TranspositionTable
+import time
 
 # All search functions take a problem and a state
 # If it is an informed search function, it will also receive a heuristic function
@@ -14,177 +22,479 @@ import heapq
 # 1. A list of actions which represent the path from the initial state to the final state
 # 2. None if there is no solution
 
-def BreadthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
-    Frontier = [] #initializing a Q for frontier
-    frontSet = set() #without the use of this set will gove out time limit ----> needed for faster search synced with the frontier
-    expSet = set() #explored set to check if node visited
-    ac = dict() # dict to traverse on each child to get parent for back tracking
-    ans = [] #empty list to store final path
-    #need to check on the initial state if goal
-    if problem.is_goal(initial_state): return None # y none-> this means no actions
-    Frontier.append(initial_state)
-    frontSet.add(initial_state) #here is the synch of the set
-    while(Frontier != []):
-        node = Frontier.pop(0)
-        frontSet.remove(node) #here is the synch of the set
-        expSet.add(node) # add node to explore set
-        for action in problem.get_actions(node): #loop on available actions 
-            child = problem.get_successor(node, action) #get child for each action 
-            if (child not in frontSet) and (child not in expSet): # i have to check if it is not available in the frontier (here used the set for fast search) as well as the                                               
-                                                                    # explored set because we are performing graph search 
-                ac[child] = (node, action) #I made this dict for back tracking saving ther child as key and value => (parent, ACtion to that child)                    
-                if problem.is_goal(child):
-                    #start back tracking
-                    i = child #getting the child to start back tracking
-                    while(i in ac): #check if the child is in the dict to get the parent and the action to that parent
-                        ans.append(ac[i][1])
-                        i = ac[i][0]
-                    return ans[::-1]
-                else:        #in BFS i check if it is a goal or not before inserting in the frontier
-                    Frontier.append(child)
-                    frontSet.add(child)#here is the synch of the se
-
-def DepthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution: #the dfs is the same code as the BFS
-                                                                            #but we change some conditions
-    Frontier = LifoQueue() #initializing a stack for frontier
-    frontSet = set() #without the use of this set will gove out time limit ----> needed for faster search synced with the frontier
-    expSet = set() #explored set to check if node visited
-    ac = dict() # dict to traverse on each child to get parent for back tracking
-    ans = [] #empty list to store final path
-    #need to check on the initial state if goal
-    if problem.is_goal(initial_state): return None # y none-> this means no actions
-    Frontier.put(initial_state)
-    frontSet.add(initial_state) #here is the synch of the set
-    while(not Frontier.empty()):
-        node = Frontier.get()
-        frontSet.remove(node) #here is the synch of the set
-        expSet.add(node) # add node to explore set
-        if problem.is_goal(node): #====> here is the difference between the bfs and Dfs
-            #start back tracking
-            i = node
-            while(i in ac):
-                ans.append(ac[i][1])
-                i = ac[i][0]
-            return ans[::-1]
-        for action in problem.get_actions(node): #loop on available actions 
-            child = problem.get_successor(node, action) #get child for each action 
-            if (child not in frontSet) and (child not in expSet): # i have to check if it is not available in the frontier (here used the set for fast search) as well as the                                               
-                                                                # explored set because we are performing graph search 
-                ac[child] = (node, action) #I made this dict for back tracking saving ther child as key and value => (parent, ACtion to that child)                    
-                Frontier.put(child)
-                frontSet.add(child)#here is the synch of the set
-
-
-def UniformCostSearch(problem: Problem[S, A], initial_state: S) -> Solution:
-    Frontier = [] #initializing a stack for frontier
-    frontSet = set() #without the use of this set will gove out time limit ----> needed for faster search synced with the frontier
-    expSet = set() #explored set to check if node visited
-    ac = dict() # dict to traverse on each child to get parent for back tracking
-    ans = [] #empty list to store final path
-    #need to check on the initial state if goal
-    if problem.is_goal(initial_state): return None # y none-> this means no actions
-    Frontier.append((0,initial_state)) #here i add node with cost as a tuple
-    frontSet.add(initial_state) #here is the synch of the set
-    while(Frontier != []):
-        Frontier.sort(key = lambda x : x[0])
-        nodeT = Frontier.pop(0)
-        frontSet.remove(nodeT[1]) #here is the synch of the set
-        expSet.add(nodeT[1]) # add node to explore set
-        if problem.is_goal(nodeT[1]):
-            #start back tracking
-            i = nodeT[1]
-            while(i in ac):
-                ans.append(ac[i][1])
-                i = ac[i][0]
-            return ans[::-1]
-        for action in problem.get_actions(nodeT[1]): #loop on available actions
-            child = problem.get_successor(nodeT[1], action) #get child for each action 
-            if (child not in frontSet) and (child not in expSet):# i have to check if it is not available in the frontier (here used the set for fast search) as well as the                                               
-                                                          # explored set because we are performing graph search 
-                ac[child] = (nodeT[1], action)#I made this dict for back tracking saving ther child as key and value => (parent, ACtion to that child)           
-                Frontier.append((problem.get_cost(nodeT[1],action) + nodeT[0] , child))#here is the accumlative cost part adding the cost of the path
-                                                                                        #the next child  of this node if exist will add his path cost to the one added here
-                                                                                        # therfore it will be accumlative 
-                frontSet.add(child)#here is the synch of the set
-            elif child in frontSet: #=============> in this else if i loop to replace the child if he is in the frontier with already higher cost 
-                for i in range(len(Frontier)):
-                    if Frontier[i][1] == child and Frontier[i][0] > (problem.get_cost(nodeT[1],action)+  nodeT[0]): #check if the current node accumlative is less than the one in frontier
-                        Frontier.remove(Frontier[i])
-                        ac[child] = (nodeT[1], action) #===> rinsert the child with his new parent and action
-                        Frontier.append((problem.get_cost(nodeT[1],action) + nodeT[0] , child))
-                        break
-
-def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
-    Frontier = [] #initializing a stack for frontier
-    frontSet = set() #without the use of this set will gove out time limit ----> needed for faster search synced with the frontier
-    expSet = set() #explored set to check if node visited
-    ac = dict() # dict to traverse on each child to get parent for back tracking
-    ans = [] #empty list to store final path
-    #need to check on the initial state if goal
-    if problem.is_goal(initial_state): return None # y none-> this means no actions
-    Frontier.append((0,initial_state)) 
-    frontSet.add(initial_state) #here is the synch of the set
-    while(Frontier != []):
-        Frontier.sort(key = lambda x : x[0])
-        nodeT = Frontier.pop(0)
-        frontSet.remove(nodeT[1]) #here is the synch of the set
-        expSet.add(nodeT[1]) # add node to explore set
-        if problem.is_goal(nodeT[1]): #====> here is the difference between the bfs and Dfs
-            #start back tracking
-            i = nodeT[1]
-            while(i in ac): 
-                ans.append(ac[i][1]) 
-                i = ac[i][0]
-            return ans[::-1]
-        for action in problem.get_actions(nodeT[1]): #loop on available actions
-            child = problem.get_successor(nodeT[1], action) #get child for each action 
-            if (child not in frontSet) and (child not in expSet): # i have to check if it is not available in the frontier (here used the set for fast search) as well as the                                               
-                                                                # explored set because we are performing graph search 
-                ac[child] = (nodeT[1], action)#I made this dict for back tracking saving ther child as key and value => (parent, ACtion to that child)           
-                
-                #here is the accumlative cost part adding the cost of the path
-                #the next child  of this node if exist will add his path cost to the one added here
-                # therfore it will be accumlative + the heuristic of the current node (-) its parent beecause it is not accumlative
-                Frontier.append((problem.get_cost(nodeT[1],action) + nodeT[0]+ heuristic(problem,child) - heuristic(problem,nodeT[1]) , child))
-                frontSet.add(child)#here is the synch of the set
-
-            elif child in frontSet: 
-                for i in range(len(Frontier)): #check if the current node accumlative cost is less than the one in frontier
-                    if Frontier[i][1] == child and Frontier[i][0] > (problem.get_cost(nodeT[1],action)+  nodeT[0]+ heuristic(problem,child) - heuristic(problem,nodeT[1])):
-                        Frontier.remove(Frontier[i])
-                        ac[child] = (nodeT[1], action)
-                        Frontier.append((problem.get_cost(nodeT[1],action) + nodeT[0]+ heuristic(problem,child) - heuristic(problem,nodeT[1]) , child))
-                        break #for faster search
-
-
-def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
-    Frontier = [] #initializing a stack for frontier
-    frontSet = set() #without the use of this set will gove out time limit ----> needed for faster search synced with the frontier
-    expSet = set() #explored set to check if node visited
-    ac = dict() # dict to traverse on each child to get parent for back tracking
-    ans = [] #empty list to store final path
+# A priority function receives the problem, a state and its path cost (g) and returns the priority of the state
+# The frontier always expands the state with the lowest priority first
+PriorityFunction = Callable[[Problem[S, A], S, float], float]
+# A tie breaker receives the path cost (g) and the insertion order of a state and returns a key that decides
+# which of the states with equal priorities is expanded first (lower keys are expanded first)
+# The returned key must be unique for each insertion order so that the states themselves are never compared
+TieBreaker = Callable[[float, int], Any]
+
+# These are the possible tie breaking policies
+def fifo_tie_breaker(g: float, order: int) -> Any:
+    return order # the oldest state is expanded first (queue)
+
+def lifo_tie_breaker(g: float, order: int) -> Any:
+    return -order # the newest state is expanded first (stack)
+
+def deepest_tie_breaker(g: float, order: int) -> Any:
+    return (-g, order) # the state with the highest path cost is expanded first, this usually reaches the goal faster in A*
+
+# These are the possible priority functions
+def constant_priority(problem: Problem[S, A], state: S, g: float) -> float:
+    return 0 # all states are equal so the order is decided by the tie breaker only (used for BFS and DFS)
+
+def path_cost_priority(problem: Problem[S, A], state: S, g: float) -> float:
+    return g # f = g (used for UCS)
+
+def heuristic_priority(heuristic: HeuristicFunction) -> PriorityFunction:
+    return lambda problem, state, g: heuristic(problem, state) # f = h (used for greedy best first search)
+
+def astar_priority(heuristic: HeuristicFunction, weight: float = 1) -> PriorityFunction:
+    if weight == 1:
+        return lambda problem, state, g: g + heuristic(problem, state) # f = g + h (used for A*)
+    return lambda problem, state, g: g + weight * heuristic(problem, state) # f = g + w*h (used for weighted A*)
+
+# This is the search engine that all the graph search functions below are built on
+# The frontier is a binary heap of (priority, tie breaking key, node id) entries
+# The search nodes are stored in a node arena (see node_arena.py): every state gets an integer id once
+# and the parent, action, path cost, priority and closed flag of each node are stored in arrays
+# Duplicates are handled lazily: if a cheaper path is found to a state in the frontier, a new entry is pushed
+# and the old entry is skipped when it is popped since the state will be closed by then
+# If goal_on_generation is True, the goal test is applied when the state is generated (as in BFS)
+# otherwise it is applied when the state is expanded (which is needed for optimality in UCS and A*)
+# If stats is given, the search counters and the phase times are added to it
+def GraphSearch(problem: Problem[S, A], initial_state: S, priority: PriorityFunction,
+                tie_breaker: TieBreaker = fifo_tie_breaker, goal_on_generation: bool = False,
+                stats: Optional[SearchStatistics] = None) -> Solution:
     #need to check on the initial state if goal
     if problem.is_goal(initial_state): return None # y none-> this means no actions
-    Frontier.append((0,initial_state))
-    frontSet.add(initial_state) #here is the synch of the set
-    while(Frontier != []):
-        Frontier.sort(key = lambda x : x[0])
-        nodeT = Frontier.pop(0)
-        frontSet.remove(nodeT[1]) #here is the synch of the set
-        expSet.add(nodeT[1]) # add node to explore set
-        if problem.is_goal(nodeT[1]): #====> here is the difference between the bfs and Dfs
-            #start back tracking
-            i = nodeT[1]
-            while(i in ac):
-                ans.append(ac[i][1])
-                i = ac[i][0]
-            return ans[::-1]
-        for action in problem.get_actions(nodeT[1]): #loop on available actions
-            child = problem.get_successor(nodeT[1], action) #get child for each action 
-            if (child not in frontSet) and (child not in expSet): # i have to check if it is not available in the frontier (here used the set for fast search) as well as the                                               
-                                                                # explored set because we are performing graph search 
-                ac[child] = (nodeT[1], action) #I made this dict for back tracking saving ther child as key and value => (parent, ACtion to that child)                    
-                     
-                Frontier.append((heuristic(problem,child) , child)) #i only compare wiith the hwuristics available not the acculative so thats why i added it only
-                frontSet.add(child)#here is the synch of the set
-            #here no need to add the else if above as only compare with avaliable heuristics
\ No newline at end of file
+    start = time.perf_counter() if stats is not None else 0
+    orders = count()
+    arena = NodeArena()
+    initial_priority = priority(problem, initial_state, 0)
+    root = arena.add(initial_state, -1, None, 0, initial_priority)
+    frontier = [(initial_priority, tie_breaker(0, next(orders)), root)]
+    ids, states, costs, priorities, flags = arena.ids, arena.states, arena.costs, arena.priorities, arena.flags
+    add, update = arena.add, arena.update
+    CLOSED = NodeArena.CLOSED
+    is_goal, get_actions, get_successor, get_cost = problem.is_goal, problem.get_actions, problem.get_successor, problem.get_cost
+    found, goal = False, -1
+    expanded = generated = duplicates = 0
+    frontier_peak = 1
+    while frontier:
+        node = heappop(frontier)[2]
+        if flags[node] & CLOSED: continue # this is an outdated entry of a state that was already reached with a lower priority
+        flags[node] |= CLOSED
+        state = states[node]
+        if not goal_on_generation and is_goal(state):
+            found, goal = True, node
+            break
+        expanded += 1
+        g = costs[node]
+        for action in get_actions(state):
+            child = get_successor(state, action)
+            generated += 1
+            child_node = ids.get(child)
+            if child_node is not None and flags[child_node] & CLOSED:
+                duplicates += 1
+                continue
+            child_g = g + get_cost(state, action)
+            child_priority = priority(problem, child, child_g)
+            # add the child if it was never generated or if we found a path with a lower priority
+            if child_node is None:
+                child_node = add(child, node, action, child_g, child_priority)
+            elif priorities[child_node] > child_priority:
+                update(child_node, node, action, child_g, child_priority)
+            else:
+                duplicates += 1
+                continue
+            if goal_on_generation and is_goal(child):
+                found, goal = True, child_node
+                break
+            heappush(frontier, (child_priority, tie_breaker(child_g, next(orders)), child_node))
+            if len(frontier) > frontier_peak: frontier_peak = len(frontier)
+        if found: break
+    if stats is None:
+        return arena.path(goal) if found else None
+    stats.record(expanded, generated, duplicates, frontier_peak)
+    stats.phases["search"] = stats.phases.get("search", 0) + time.perf_counter() - start
+    with stats.phase("path"):
+        return arena.path(goal) if found else None
+
+# The search functions below accept an optional SearchStatistics object as "stats" (see search_statistics.py)
+# If the search is informed, the heuristic calls are also counted and timed when stats is given
+
+def BreadthFirstSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStatistics] = None) -> Solution:
+    # the frontier is a queue and the goal is checked before adding a child to the frontier
+    return GraphSearch(problem, initial_state, constant_priority, fifo_tie_breaker, goal_on_generation=True, stats=stats)
+
+def DepthFirstSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStatistics] = None) -> Solution:
+    # the frontier is a stack and the goal is checked when the node is expanded
+    return GraphSearch(problem, initial_state, constant_priority, lifo_tie_breaker, stats=stats)
+
+def UniformCostSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStatistics] = None) -> Solution:
+    return GraphSearch(problem, initial_state, path_cost_priority, stats=stats)
+
+def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStatistics] = None) -> Solution:
+    if stats is not None: heuristic = stats.wrap_heuristic(heuristic)
+    return GraphSearch(problem, initial_state, astar_priority(heuristic), stats=stats)
+
+def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStatistics] = None) -> Solution:
+    if stats is not None: heuristic = stats.wrap_heuristic(heuristic)
+    # here we only compare with the heuristic not the accumlative cost
+    return GraphSearch(problem, initial_state, heuristic_priority(heuristic), stats=stats)
+
+# Weighted A* inflates the heuristic by a weight >= 1 which finds a solution faster
+# but the solution cost can be up to "weight" times the optimal cost
+def WeightedAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, weight: float = 2, stats: Optional[SearchStatistics] = None) -> Solution:
+    if stats is not None: heuristic = stats.wrap_heuristic(heuristic)
+    return GraphSearch(problem, initial_state, astar_priority(heuristic, weight), stats=stats)
+
+# Anytime Repairing A* (ARA*) runs a series of weighted A* searches with a decreasing weight
+# and yields a better solution (or the same solution with a tighter bound) after each search
+# Instead of starting each search from scratch, it reuses the path costs found so far:
+# the states whose path cost was lowered after they were expanded are kept in an "inconsistent" list
+# and only they (with the current frontier) are expanded again in the next search
+# Each yielded tuple is (solution, cost, bound) where the solution cost is at most "bound" times the optimal cost
+# The bound is min(weight, cost / lowest g + h among the states that may still lead to a cheaper path)
+# so it may be lower than the weight. The search stops once the bound reaches 1 (the solution is optimal)
+# or when the frontier is empty. The heuristic must be admissible for the bounds to be correct.
+# If deadline (a time.perf_counter() value) is given, the search stops when the deadline is reached,
+# but only after the first solution is found so that the caller always gets a solution if one exists
+def AnytimeRepairingAStar(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction,
+                          initial_weight: float = 3, weight_step: float = 0.5, deadline: Optional[float] = None,
+                          stats: Optional[SearchStatistics] = None) -> Iterator[Tuple[Solution, float, float]]:
+    if problem.is_goal(initial_state): return
+    if stats is not None: heuristic = stats.wrap_heuristic(heuristic)
+    start = time.perf_counter() if stats is not None else 0
+    is_goal, get_actions, get_successor, get_cost = problem.is_goal, problem.get_actions, problem.get_successor, problem.get_cost
+    infinity = float('inf')
+    h_values = {} # the heuristic is computed once per state since the priorities are recomputed after each search
+    def h(state: S) -> float:
+        value = h_values.get(state)
+        if value is None: value = h_values[state] = heuristic(problem, state)
+        return value
+    orders = count()
+    weight = max(initial_weight, 1)
+    arena = NodeArena() # the priorities of the arena are not used since they change with the weight
+    root = arena.add(initial_state, -1, None, 0, 0)
+    ids, states, costs, flags = arena.ids, arena.states, arena.costs, arena.flags
+    CLOSED = NodeArena.CLOSED
+    frontier = [(weight * h(initial_state), next(orders), 0, root)] # (priority, order, path cost, node id)
+    closed, inconsistent = [], set() # the ids of the closed nodes are kept to clear their flags before the next search
+    goal, goal_cost = -1, infinity
+    expanded = generated = duplicates = 0
+    frontier_peak = 1
+    timed_out = False
+    while True:
+        # Improve the path: expand states until no state in the frontier can lead to a path cheaper than the goal's
+        while frontier and frontier[0][0] < goal_cost:
+            if goal != -1 and deadline is not None and (expanded & 63) == 0 and time.perf_counter() >= deadline:
+                timed_out = True
+                break
+            _, _, g, node = heappop(frontier)
+            if flags[node] & CLOSED or g != costs[node]: continue # an outdated entry
+            flags[node] |= CLOSED
+            closed.append(node)
+            expanded += 1
+            state = states[node]
+            for action in get_actions(state):
+                child = get_successor(state, action)
+                generated += 1
+                child_g = g + get_cost(state, action)
+                child_node = ids.get(child)
+                if child_node is None:
+                    child_node = arena.add(child, node, action, child_g, 0)
+                elif costs[child_node] <= child_g:
+                    duplicates += 1
+                    continue
+                else:
+                    arena.update(child_node, node, action, child_g, 0)
+                if is_goal(child):
+                    if child_g < goal_cost: goal, goal_cost = child_node, child_g
+                    continue
+                if flags[child_node] & CLOSED:
+                    inconsistent.add(child_node)
+                else:
+                    heappush(frontier, (child_g + weight * h(child), next(orders), child_g, child_node))
+                    if len(frontier) > frontier_peak: frontier_peak = len(frontier)
+        if goal == -1: break # there is no solution
+        # The optimal cost is at least the lowest g + h among the states that were not expanded with their current path cost
+        lowest = min((costs[node] + h(states[node]) for node in inconsistent), default=infinity)
+        for _, _, g, node in frontier:
+            if not flags[node] & CLOSED and g == costs[node] and g + h(states[node]) < lowest: lowest = g + h(states[node])
+        bound = max(1, min(weight, goal_cost / lowest)) if lowest > 0 else weight
+        yield arena.path(goal), goal_cost, bound
+        if timed_out or bound <= 1: break
+        # Lower the weight, then move the inconsistent states to the frontier and recompute the priorities
+        weight = max(1, weight - weight_step)
+        nodes = {node for _, _, g, node in frontier if not flags[node] & CLOSED and g == costs[node]} | inconsistent
+        frontier = [(costs[node] + weight * h(states[node]), next(orders), costs[node], node) for node in nodes]
+        heapify(frontier)
+        for node in closed: flags[node] &= ~CLOSED
+        closed, inconsistent = [], set()
+    if stats is not None:
+        stats.record(expanded, generated, duplicates, frontier_peak)
+        stats.phases["search"] = stats.phases.get("search", 0) + time.perf_counter() - start
+
+# This runs ARA* until the time limit (seconds) is reached or the solution is proven optimal and returns the best solution found
+# The first solution is returned even if it takes longer than the time limit to find it
+# If on_solution is given, it is called with (solution, cost, bound) for every solution found
+def AnytimeRepairingAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, time_limit: float = 0.2,
+                                initial_weight: float = 3, weight_step: float = 0.5,
+                                on_solution: Optional[Callable[[Solution, float, float], None]] = None,
+                                stats: Optional[SearchStatistics] = None) -> Solution:
+    deadline = time.perf_counter() + time_limit
+    solution = None
+    for solution, cost, bound in AnytimeRepairingAStar(problem, initial_state, heuristic, initial_weight, weight_step, deadline, stats):
+        if on_solution is not None: on_solution(solution, cost, bound)
+    return solution
+
+# The following searches use memory that is linear in the solution depth instead of storing every generated state
+# They trade memory for time since they re-expand states many times
+
+# Iterative Deepening A* runs depth first searches where any state with f = g + h larger than the bound is cut off
+# The bound starts at h(initial state) and after each iteration it is raised to the lowest f that was cut off
+# If table_size > 0, a transposition table of at most table_size states (least recently used are evicted first)
+# stores the lowest path cost each state was reached with in the current iteration,
+# so the states that are reached again with an equal or higher path cost are skipped
+# If zobrist is True, the problem must implement the Zobrist hashing functions (see zobrist.py)
+# and the table is a TranspositionTable keyed by the Zobrist hash of each state, which is updated along the path instead of hashing every state.
+# This table is cleared when it holds table_size states (instead of evicting the least recently used state)
+# and two states with the same 64-bit hash share the same entry.
+def IterativeDeepeningAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, table_size: int = 0,
+                                  zobrist: bool = False, stats: Optional[SearchStatistics] = None) -> Solution:
+    if problem.is_goal(initial_state): return None
+    if stats is not None:
+        heuristic = stats.wrap_heuristic(heuristic)
+        with stats.phase("search"):
+            return _IterativeDeepeningAStarSearch(problem, initial_state, heuristic, table_size, zobrist, stats)
+    return _IterativeDeepeningAStarSearch(problem, initial_state, heuristic, table_size, zobrist, stats)
+
+def _IterativeDeepeningAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, table_size: int,
+                                   zobrist: bool, stats: Optional[SearchStatistics]) -> Solution:
+    is_goal, get_actions, get_successor, get_cost = problem.is_goal, problem.get_actions, problem.get_successor, problem.get_cost
+    zobrist = zobrist and table_size > 0
+    if zobrist:
+        keys = problem.zobrist_keys()
+        zobrist_update = problem.zobrist_update
+        initial_hash = problem.zobrist_hash(initial_state, keys)
+    expanded = generated = duplicates = 0
+    depth_peak = 1 # for IDA*, the frontier peak is the maximum length of the current path
+    bound = heuristic(problem, initial_state)
+    solution = None
+    while bound != float('inf') and solution is None:
+        next_bound = float('inf')
+        table = OrderedDict() if table_size > 0 and not zobrist else None
+        hash_table = TranspositionTable(table_size) if zobrist else None
+        path, actions, costs = [initial_state], [], [0] # the current path, the actions along it and the path cost of each state on it
+        hashes = [initial_hash] if zobrist else None # the Zobrist hash of each state on the path
+        on_path = {initial_state} # used to avoid cycles along the current path
+        stack = [iter(get_actions(initial_state))] # the remaining actions of each state on the path
+        expanded += 1
+        while stack:
+            action = next(stack[-1], None)
+            if action is None: # all the actions of the last state are done so we backtrack
+                stack.pop()
+                on_path.remove(path.pop())
+                costs.pop()
+                if hashes: hashes.pop()
+                if actions: actions.pop()
+                continue
+            node = path[-1]
+            child = get_successor(node, action)
+            generated += 1
+            if child in on_path:
+                duplicates += 1
+                continue
+            g = costs[-1] + get_cost(node, action)
+            f = g + heuristic(problem, child)
+            if f > bound:
+                if f < next_bound: next_bound = f
+                continue
+            if table is not None:
+                old = table.get(child)
+                if old is not None and old <= g:
+                    duplicates += 1
+                    continue
+                table[child] = g
+                table.move_to_end(child)
+                if len(table) > table_size: table.popitem(last=False)
+            elif hash_table is not None:
+                child_hash = zobrist_update(hashes[-1], node, action, keys)
+                old = hash_table.get(child_hash)
+                if old is not None and old <= g:
+                    duplicates += 1
+                    continue
+                if old is None and len(hash_table) >= table_size: hash_table = TranspositionTable(table_size)
+                hash_table[child_hash] = g
+            if is_goal(child):
+                actions.append(action)
+                solution = actions
+                break
+            path.append(child)
+            actions.append(action)
+            costs.append(g)
+            if hash_table is not None: hashes.append(child_hash)
+            on_path.add(child)
+            stack.append(iter(get_actions(child)))
+            expanded += 1
+            if len(path) > depth_peak: depth_peak = len(path)
+        bound = next_bound
+    if stats is not None: stats.record(expanded, generated, duplicates, depth_peak)
+    return solution
+
+# Recursive Best First Search explores the best child while remembering the f of the best alternative path
+# If the best child's f exceeds that alternative, the search unwinds and stores the backed-up f in the child
+# The recursion is unrolled into an explicit stack (as in IDA*) so that deep solutions do not hit Python's recursion limit:
+# each record on the stack is [node, g, f, bound, children] where the children are [f, order, state, g, action] lists
+# sorted by (f, order) and the first child is the one being explored by the record above it
+def RecursiveBestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStatistics] = None) -> Solution:
+    if problem.is_goal(initial_state): return None
+    if stats is not None:
+        heuristic = stats.wrap_heuristic(heuristic)
+        start = time.perf_counter()
+    is_goal, get_actions, get_successor, get_cost = problem.is_goal, problem.get_actions, problem.get_successor, problem.get_cost
+    infinity = float('inf')
+    sort_key = lambda item: (item[0], item[1])
+    actions = []
+    on_path = {initial_state}
+    expanded = generated = duplicates = 0
+    depth_peak = 1 # the maximum stack depth
+    stack = []
+    found = False
+    # the (found, backed-up f) returned by the last record that was finished, None while the top record is still running
+    result: Optional[Tuple[bool, float]] = None
+    # the node to search next with its g, f and bound, a goal or a dead end returns right away, otherwise its record is pushed
+    node, g, f, bound = initial_state, 0, heuristic(problem, initial_state), infinity
+    search_node = True
+    while True:
+        if search_node:
+            search_node = False
+            if is_goal(node):
+                result = (True, f)
+            else:
+                expanded += 1
+                if len(actions) + 1 > depth_peak: depth_peak = len(actions) + 1
+                children = []
+                for order, action in enumerate(get_actions(node)):
+                    child = get_successor(node, action)
+                    generated += 1
+                    if child in on_path:
+                        duplicates += 1
+                        continue
+                    child_g = g + get_cost(node, action)
+                    # the child inherits the backed-up value of its parent if it is higher
+                    children.append([max(child_g + heuristic(problem, child), f), order, child, child_g, action])
+                if children:
+                    stack.append([node, g, f, bound, children])
+                else:
+                    result = (False, infinity)
+        if not stack: break
+        record = stack[-1]
+        children = record[4]
+        if result is not None: # the best child is done, so we store its backed-up f
+            found, children[0][0] = result
+            result = None
+            if found: break
+            on_path.remove(children[0][2])
+            actions.pop()
+        children.sort(key=sort_key)
+        best = children[0]
+        if best[0] > record[3] or best[0] == infinity: # infinity means all the children are dead ends
+            result = (False, best[0])
+            stack.pop()
+            continue
+        alternative = children[1][0] if len(children) > 1 else infinity
+        actions.append(best[4])
+        on_path.add(best[2])
+        node, g, f, bound = best[2], best[3], best[0], min(record[3], alternative)
+        search_node = True
+    if stats is not None:
+        stats.record(expanded, generated, duplicates, depth_peak)
+        stats.phases["search"] = stats.phases.get("search", 0) + time.perf_counter() - start
+    return actions if found else None
+
+# Bidirectional searches run two searches at the same time: one forward from the initial state and one backward from the goal
+# They work on problems that have a single goal state "problem.goal" and implement "problem.get_predecessors(state)"
+# which returns a list of (previous state, action) pairs such that applying the action to the previous state gives the state
+# The searches meet in the middle, so each of them only needs to cover about half the solution depth
+
+# Each side is a uniform cost search (Dijkstra) and the side with the lowest frontier priority is expanded next
+# A path is found whenever an edge connects a state reached by one side to a state reached by the other side
+# The search stops when the sum of the lowest priorities in the two frontiers is no less than the best path found,
+# since any path that is still undiscovered must be at least that long
+def BidirectionalUniformCostSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStatistics] = None) -> Solution:
+    return _BidirectionalSearch(problem, initial_state, lambda state, action: problem.get_cost(state, action), stats)
+
+# This is the same as the bidirectional uniform cost search but every action costs 1 (as in breadth first search)
+def BidirectionalBreadthFirstSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStatistics] = None) -> Solution:
+    return _BidirectionalSearch(problem, initial_state, lambda state, action: 1, stats)
+
+def _BidirectionalSearch(problem: Problem[S, A], initial_state: S, cost: Callable[[S, A], float], stats: Optional[SearchStatistics]) -> Solution:
+    if problem.is_goal(initial_state): return None
+    start = time.perf_counter() if stats is not None else 0
+    expanded = generated = duplicates = 0
+    frontier_peak = 2
+    goal = problem.goal
+    forward, backward = PriorityFrontier(), PriorityFrontier()
+    forward.push(initial_state, 0)
+    backward.push(goal, 0)
+    # The parent tables store (neighbor, action, path cost) where the neighbor is the parent for the forward search
+    # and the child for the backward search. They also hold all the states that were reached by each side.
+    forward_parents = {initial_state: (None, None, 0)}
+    backward_parents = {goal: (None, None, 0)}
+    forward_explored, backward_explored = set(), set()
+    best_cost, meeting = float('inf'), None
+    while forward and backward:
+        forward_top, backward_top = forward.peek()[0], backward.peek()[0]
+        if forward_top + backward_top >= best_cost: break
+        if forward_top <= backward_top:
+            g, node = forward.pop()
+            forward_explored.add(node)
+            expanded += 1
+            for action in problem.get_actions(node):
+                child = problem.get_successor(node, action)
+                generated += 1
+                if child in forward_explored:
+                    duplicates += 1
+                    continue
+                child_g = g + cost(node, action)
+                if forward.push_or_decrease(child, child_g):
+                    forward_parents[child] = (node, action, child_g)
+                other = backward_parents.get(child)
+                if other is not None and child_g + other[2] < best_cost:
+                    best_cost, meeting = child_g + other[2], child
+        else:
+            g, node = backward.pop()
+            backward_explored.add(node)
+            expanded += 1
+            for parent, action in problem.get_predecessors(node):
+                generated += 1
+                if parent in backward_explored:
+                    duplicates += 1
+                    continue
+                parent_g = g + cost(parent, action)
+                if backward.push_or_decrease(parent, parent_g):
+                    backward_parents[parent] = (node, action, parent_g)
+                other = forward_parents.get(parent)
+                if other is not None and parent_g + other[2] < best_cost:
+                    best_cost, meeting = parent_g + other[2], parent
+        if len(forward) + len(backward) > frontier_peak: frontier_peak = len(forward) + len(backward)
+    if stats is not None:
+        stats.record(expanded, generated, duplicates, frontier_peak)
+        stats.phases["search"] = stats.phases.get("search", 0) + time.perf_counter() - start
+    if meeting is None: return None
+    # The path is the forward path from the initial state to the meeting state followed by the backward path to the goal
+    path = []
+    state = meeting
+    while forward_parents[state][0] is not None:
+        state, action, _ = forward_parents[state]
+        path.append(action)
+    path.reverse()
+    state = meeting
+    while backward_parents[state][0] is not None:
+        state, action, _ = backward_parents[state]
+        path.append(action)
+    return path
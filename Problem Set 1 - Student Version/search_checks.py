@@ -0,0 +1,212 @@
+from typing import Dict, List, Optional, Tuple
+from graph import GraphRoutingProblem, GraphNode, graphrouting_distance
+from agents import IncrementalSearchAgent
+from search import BreadthFirstSearch, UniformCostSearch, BidirectionalBreadthFirstSearch, BidirectionalUniformCostSearch
+from search import IterativeDeepeningAStarSearch, RecursiveBestFirstSearch
+from sokoban import SokobanProblem
+from sokoban_heuristic import strong_heuristic
+from mathutils import Point
+from helpers.utils import fetch_recorded_calls
+import argparse, random, sys, time
+
+# This script checks the searches and the agents that have no autograder test cases (mostly against UniformCostSearch on random graphs)
+#   bidirectional: the bidirectional uniform cost and breadth first searches on random directed graphs (with random edge costs)
+#                  must return valid paths with the same cost as UniformCostSearch and the same length as BreadthFirstSearch.
+#   incremental: the incremental search agent (D* Lite) on a grid graph whose edges are changed at random between the calls to "act"
+#                and whose agent is sometimes moved (teleported) to a random node.
+#                Every chosen action must be the first action of an optimal path from the current node.
+#   deep: the linear memory searches (IDA* and RBFS) on a sokoban level with a single box in a long corridor
+#         whose solution is deeper than Python's recursion limit. They must return the optimal solution.
+# The script prints the failures and exits with 1 if any check fails.
+
+# This is the tolerance used to ignore floating point errors in the comparisons
+TOLERANCE = 1e-6
+
+# Create a grid graph with width * width nodes where each node is connected to its 4 neighbors in both directions
+# The nodes are named "x,y" and the goal is picked at random
+def grid_graph(rng: random.Random, width: int) -> GraphRoutingProblem:
+    nodes = {(x, y): GraphNode(f"{x},{y}", Point(x, y)) for x in range(width) for y in range(width)}
+    adjacency: Dict[GraphNode, List[GraphNode]] = {}
+    for (x, y), node in nodes.items():
+        adjacent = [nodes[neighbor] for neighbor in ((x+1, y), (x-1, y), (x, y+1), (x, y-1)) if neighbor in nodes]
+        adjacency[node] = sorted(adjacent, key=lambda node: node.name)
+    node_list = list(nodes.values())
+    return GraphRoutingProblem(rng.choice(node_list), rng.choice(node_list), adjacency)
+
+# Create a random directed graph with the given number of nodes where each edge exists with the given probability
+# Some edge costs are raised at random and the start and the goal are picked at random (so the goal may be unreachable)
+def random_graph(rng: random.Random, size: int, density: float) -> GraphRoutingProblem:
+    nodes = [GraphNode(str(index), Point(rng.randint(0, 100), rng.randint(0, 100))) for index in range(size)]
+    adjacency = {node: [other for other in nodes if other is not node and rng.random() < density] for node in nodes}
+    problem = GraphRoutingProblem(rng.choice(nodes), rng.choice(nodes), adjacency)
+    for node, adjacent in adjacency.items():
+        for next_node in adjacent:
+            if rng.random() < 0.3: problem.costs[(node, next_node)] = graphrouting_distance(problem, node, next_node) + rng.uniform(0, 50)
+    return problem
+
+# Returns the cost and the length of a solution or None if the solution is not a valid path from the state to the goal
+def path_cost(problem: GraphRoutingProblem, state: GraphNode, solution: Optional[List[GraphNode]]) -> Optional[Tuple[float, int]]:
+    if solution is None: return None
+    cost = 0
+    for action in solution:
+        if action not in problem.get_actions(state): return None
+        cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+    return (cost, len(solution)) if problem.is_goal(state) else None
+
+# Compare the bidirectional searches with UniformCostSearch and BreadthFirstSearch on the given number of random graphs
+# Returns a list of failure messages
+def check_bidirectional(graphs: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    failures: List[str] = []
+    for index in range(graphs):
+        problem = random_graph(rng, rng.randint(2, 60), rng.uniform(0.02, 0.3))
+        start = problem.get_initial_state()
+        for name, search, expected_search, compared in (("uniform cost", BidirectionalUniformCostSearch, UniformCostSearch, 0),
+                                                         ("breadth first", BidirectionalBreadthFirstSearch, BreadthFirstSearch, 1)):
+            solution, expected = search(problem, start), expected_search(problem, start)
+            result = path_cost(problem, start, solution)
+            if expected is None:
+                if solution is not None:
+                    failures.append(f"Graph {index}: bidirectional {name} returned {solution} but the goal is unreachable")
+                continue
+            expected_result = path_cost(problem, start, expected)
+            if result is None:
+                failures.append(f"Graph {index}: bidirectional {name} returned an invalid path {solution}")
+            elif result[compared] > expected_result[compared] + TOLERANCE:
+                failures.append(f"Graph {index}: bidirectional {name} returned a path with (cost, length) = {result} instead of {expected_result}")
+        fetch_recorded_calls(GraphRoutingProblem.get_actions) # drop the calls recorded by @record_calls
+    return failures
+
+# Returns the optimal path cost from the state to the goal according to UniformCostSearch (infinity if the goal is unreachable)
+def optimal_cost(problem: GraphRoutingProblem, state: GraphNode) -> float:
+    if problem.is_goal(state): return 0
+    solution = UniformCostSearch(problem, state)
+    fetch_recorded_calls(GraphRoutingProblem.get_actions) # drop the calls recorded by @record_calls
+    if solution is None: return float('inf')
+    cost = 0
+    for action in solution:
+        cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+    return cost
+
+# Apply a random change to the graph: raise or lower the cost of an edge, remove an edge or add a diagonal edge
+# The costs are never below the distance between the nodes so that graphrouting_distance stays admissible
+def change_graph(rng: random.Random, problem: GraphRoutingProblem, nodes: Dict[str, GraphNode]) -> None:
+    node = rng.choice(list(nodes.values()))
+    adjacent = problem.adjacency.get(node, [])
+    change = rng.random()
+    if adjacent and change < 0.5:
+        next_node = rng.choice(adjacent)
+        problem.set_cost(node, next_node, graphrouting_distance(problem, node, next_node) * rng.uniform(1, 4))
+    elif adjacent and change < 0.75:
+        problem.remove_edge(node, rng.choice(adjacent))
+    else:
+        x, y = node.position.x + rng.choice((-1, 1)), node.position.y + rng.choice((-1, 1))
+        next_node = nodes.get(f"{x},{y}")
+        if next_node is not None: problem.add_edge(node, next_node)
+
+# Run the incremental search agent for the given number of steps and compare each action with UniformCostSearch
+# Returns a list of failure messages
+def check_incremental(width: int, steps: int, changes: int, teleport: float, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    problem = grid_graph(rng, width)
+    nodes = list(problem.adjacency)
+    names = {node.name: node for node in nodes}
+    agent = IncrementalSearchAgent(graphrouting_distance)
+    failures: List[str] = []
+    state = problem.get_initial_state()
+    for step in range(steps):
+        if problem.is_goal(state): state = rng.choice(nodes)
+        action = agent.act(problem, state)
+        expected = optimal_cost(problem, state)
+        if expected == float('inf'):
+            if action is not None:
+                failures.append(f"Step {step}: the goal is unreachable from {state} but the agent moved to {action}")
+        elif action is None:
+            failures.append(f"Step {step}: the agent did not move from {state} (optimal cost = {expected})")
+        else:
+            cost = problem.get_cost(state, action) + optimal_cost(problem, problem.get_successor(state, action))
+            if cost > expected + TOLERANCE:
+                failures.append(f"Step {step}: moving from {state} to {action} costs {cost} > {expected} (optimal cost)")
+        if action is None or rng.random() < teleport:
+            state = rng.choice(nodes)
+        else:
+            state = problem.get_successor(state, action)
+        for _ in range(changes):
+            change_graph(rng, problem, names)
+    return failures
+
+# Create a sokoban level where the player pushes a single box along a corridor to a goal that is "length" cells away
+def corridor_level(length: int) -> SokobanProblem:
+    wall = "#" * (length + 4)
+    return SokobanProblem.from_text(f"{wall}\n#@${' ' * (length - 1)}.#\n{wall}")
+
+# Run the linear memory searches on a corridor level of the given length (the optimal solution is "length" pushes)
+# Returns a list of failure messages
+def check_deep(length: int) -> List[str]:
+    problem = corridor_level(length)
+    start = problem.get_initial_state()
+    failures: List[str] = []
+    for name, search in (("IDA*", IterativeDeepeningAStarSearch), ("RBFS", RecursiveBestFirstSearch)):
+        try:
+            solution = search(problem, start, strong_heuristic)
+        except RecursionError:
+            failures.append(f"{name} hit the recursion limit")
+            continue
+        result = path_cost(problem, start, solution)
+        if result is None:
+            failures.append(f"{name} returned an invalid path of {len(solution) if solution else None} actions")
+        elif result[0] > length + TOLERANCE:
+            failures.append(f"{name} returned a path with cost {result[0]} instead of {length}")
+    return failures
+
+def main(args: argparse.Namespace):
+    checks = ["bidirectional", "incremental", "deep"] if args.check == "all" else [args.check]
+    failed = False
+    for check in checks:
+        start = time.perf_counter()
+        if check == "bidirectional":
+            failures = check_bidirectional(args.graphs, args.seed)
+            description = f"{args.graphs} random graphs"
+        elif check == "incremental":
+            failures = check_incremental(args.width, args.steps, args.changes, args.teleport, args.seed)
+            description = f"{args.steps} steps on a {args.width * args.width}-node grid with {args.changes} edge changes per step"
+        elif check == "deep":
+            failures = check_deep(args.length)
+            description = f"a {args.length}-cell sokoban corridor"
+        print(f"{check}: {description}: {len(failures)} failures in {time.perf_counter() - start:.3f} seconds")
+        for failure in failures[:args.keep]:
+            print("   ", failure)
+        failed = failed or bool(failures)
+    exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Check the searches and the agents against uniform cost search on random graphs")
+    parser.add_argument("check", nargs="?", default="all",
+                        choices=["all", "bidirectional", "incremental", "deep"],
+                        help="the check to run")
+    parser.add_argument("--graphs", "-g", type=int, default=300,
+                        help="the number of random graphs in the bidirectional check")
+    parser.add_argument("--width", "-w", type=int, default=100,
+                        help="the width of the grid graph for the incremental check (the graph has width * width nodes)")
+    parser.add_argument("--steps", "-s", type=int, default=200,
+                        help="the number of agent steps in the incremental check")
+    parser.add_argument("--changes", "-c", type=int, default=3,
+                        help="the number of random edge changes after every step in the incremental check")
+    parser.add_argument("--teleport", "-t", type=float, default=0.1,
+                        help="the probability of moving the agent to a random node after a step in the incremental check")
+    parser.add_argument("--length", "-l", type=int, default=3000,
+                        help="the length of the sokoban corridor in the deep check (the recursion limit is usually 1000)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="the seed of the random graphs and changes")
+    parser.add_argument("--keep", "-n", type=int, default=5,
+                        help="the number of failures to print for each check")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!", file=sys.stderr)
@@ -0,0 +1,76 @@
+from typing import Any, Dict, Iterator
+from dataclasses import dataclass, field, asdict
+from contextlib import contextmanager
+import json, time
+
+from problem import HeuristicFunction, Problem, S
+
+# This holds the statistics collected by the search functions
+# To collect statistics, create an instance and pass it to a search function as "stats"
+# If a search function receives no statistics object, it does not do any extra work except for a few local counters
+# The statistics are accumulated so the same object can be passed to many searches (e.g. every search done by an agent)
+@dataclass
+class SearchStatistics:
+    searches: int = 0               # The number of searches that used this object
+    expanded: int = 0               # The number of states whose actions were listed
+    generated: int = 0              # The number of successors that were generated
+    duplicates: int = 0             # The number of generated successors that were skipped because they were already explored or in the frontier with a better priority
+    frontier_peak: int = 0          # The maximum number of entries in the frontier (including outdated entries)
+    heuristic_calls: int = 0        # The number of heuristic calls
+    heuristic_time: float = 0       # The total time spent inside the heuristic (seconds)
+    phases: Dict[str, float] = field(default_factory=dict) # The total wall time spent in each phase of the search (seconds)
+
+    # Add the counters of a single search
+    def record(self, expanded: int, generated: int, duplicates: int, frontier_peak: int) -> None:
+        self.searches += 1
+        self.expanded += expanded
+        self.generated += generated
+        self.duplicates += duplicates
+        self.frontier_peak = max(self.frontier_peak, frontier_peak)
+
+    # Add the statistics collected in another object (for example by a search that ran in another process)
+    def merge(self, other: 'SearchStatistics') -> None:
+        self.searches += other.searches
+        self.expanded += other.expanded
+        self.generated += other.generated
+        self.duplicates += other.duplicates
+        self.frontier_peak = max(self.frontier_peak, other.frontier_peak)
+        self.heuristic_calls += other.heuristic_calls
+        self.heuristic_time += other.heuristic_time
+        for name, elapsed in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0) + elapsed
+
+    # Measure the wall time of a phase, for example:
+    #   with stats.phase("search"):
+    #       ...
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    # Wrap a heuristic function to count its calls and measure the time spent inside it
+    def wrap_heuristic(self, heuristic: HeuristicFunction) -> HeuristicFunction:
+        def timed_heuristic(problem: Problem, state: S) -> float:
+            start = time.perf_counter()
+            value = heuristic(problem, state)
+            self.heuristic_time += time.perf_counter() - start
+            self.heuristic_calls += 1
+            return value
+        return timed_heuristic
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    def __str__(self) -> str:
+        text = f"Expanded {self.expanded} nodes, generated {self.generated} nodes, skipped {self.duplicates} duplicates, frontier peak {self.frontier_peak}"
+        if self.heuristic_calls:
+            text += f"\nHeuristic: {self.heuristic_calls} calls in {self.heuristic_time} seconds"
+        for name, elapsed in self.phases.items():
+            text += f"\nPhase '{name}': {elapsed} seconds"
+        return text
@@ -1,10 +1,12 @@
 from dataclasses import dataclass
-from typing import FrozenSet, Iterable
+from typing import Callable, FrozenSet, Iterable, List, Optional, Tuple, Union
+from collections import deque
 from enum import Enum
 
-from mathutils import Direction, Point
+from mathutils import Direction, GridIndex, Point
 from problem import Problem
 from helpers.utils import track_call_count
+from zobrist import ZobristKeys
 
 # This file contains the definition for the Sokoban problem
 # In this problem, the agent can move Up, Down, Left or Right
@@ -26,14 +28,54 @@ class SokobanTile(str, Enum):
 # we only need the default equality which compares objects by pointers.
 # The layout contains the problem details that are unchangeable across states such as:
 #   The walkable area (locations without walls) and the locations of the goals
+# The layout also precomputes some tables for the packed state representation (see PackedSokobanProblem):
+#   grid gives each cell an integer index "y * width + x" (see GridIndex)
+#   neighbors[cell][direction] is the index of the walkable cell next to "cell" in the given direction (or -1 if it is a wall)
+#   goal_mask is an integer where the bit of each goal cell is set
+# It also precomputes the dead squares: the cells from which a crate can never be pushed to any goal
+#   dead_squares is the set of dead positions and dead_mask is an integer where the bit of each dead cell is set
 @dataclass(eq=False, frozen=True)
 class SokobanLayout:
-    __slots__ = ("width", "height", "walkable", "goals")
+    __slots__ = ("width", "height", "walkable", "goals", "grid", "neighbors", "goal_mask", "dead_squares", "dead_mask")
     width: int
     height: int
     walkable: FrozenSet[Point]
     goals: FrozenSet[Point]
 
+    def __post_init__(self):
+        # The dataclass is frozen so we have to use object.__setattr__ to set the precomputed tables
+        grid = GridIndex(self.width, self.height)
+        object.__setattr__(self, "grid", grid)
+        object.__setattr__(self, "neighbors", grid.neighbors(grid.cell_of(position) for position in self.walkable))
+        object.__setattr__(self, "goal_mask", grid.mask_of(self.goals))
+        dead_squares = self.walkable - self._find_live_squares()
+        object.__setattr__(self, "dead_squares", dead_squares)
+        object.__setattr__(self, "dead_mask", grid.mask_of(dead_squares))
+
+    # Find all the positions from which a crate can be pushed to some goal (ignoring all the other crates)
+    # We start from the goals and pull the crate backward: a crate at "cell" could have been pushed there from
+    # the previous cell in the opposite direction if the player could stand on the cell before it
+    def _find_live_squares(self) -> FrozenSet[Point]:
+        neighbors = self.neighbors
+        live = {self.cell_of(goal) for goal in self.goals}
+        stack = list(live)
+        while stack:
+            cell = stack.pop()
+            for direction in AllDirections:
+                backward = (direction + 2) % 4
+                previous = neighbors[cell][backward]
+                if previous < 0 or previous in live or neighbors[previous][backward] < 0: continue
+                live.add(previous)
+                stack.append(previous)
+        return frozenset(self.point_of(cell) for cell in live)
+
+    # Convert a position to a cell index and vice versa (the points are interned by the grid)
+    def cell_of(self, position: Point) -> int:
+        return position.y * self.width + position.x
+
+    def point_of(self, cell: int) -> Point:
+        return self.grid.points[cell]
+
 # For the sokoban state, we use dataclass with frozen=True to automatically implement:
 #   the constructor, the == operator, the hash function and to make the class immutable
 # Now it can be added to sets and used as keys in dictionaries
@@ -68,11 +110,17 @@ AllSokobanActions = [
     Direction.LEFT
 ]
 
+# This is the list of all the directions in the order used by the neighbor tables of the layout
+AllDirections = list(Direction)
+
 # This is the implementation of the sokoban problem
 class SokobanProblem(Problem[SokobanState, Direction]):
     # The problem will contain the sokoban layout and the inital state
     layout: SokobanLayout
     initial_state: SokobanState
+    # If True, the actions that push a crate into a dead square are not generated
+    # This never removes a solution since a crate on a dead square can never reach a goal
+    prune_dead_squares: bool = False
 
     def get_initial_state(self) -> SokobanState:
         return self.initial_state
@@ -83,39 +131,70 @@ class SokobanProblem(Problem[SokobanState, Direction]):
     # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
     @track_call_count
     def get_actions(self, state: SokobanState) -> Iterable[Direction]:
+        # The movement is done on cell indices and the cells are converted to interned points only to check the crates
+        layout = self.layout
+        neighbors, points, crates = layout.neighbors, layout.grid.points, state.crates
         actions = []
-        for direction in Direction:
-            position = state.player + direction.to_vector()
+        for direction, position in zip(AllDirections, neighbors[layout.cell_of(state.player)]):
             # Disallow walking into walls
-            if position not in self.layout.walkable: continue
+            if position < 0: continue
             # Check if walking into a crate
-            if position in state.crates:
+            if points[position] in crates:
                 # make sure that the crate is not pushed into a wall or another crate
-                crate_position = position + direction.to_vector()
-                if crate_position not in self.layout.walkable or crate_position in state.crates:
+                crate_position = neighbors[position][direction]
+                if crate_position < 0 or points[crate_position] in crates:
+                    continue
+                # optionally, do not push the crate into a dead square
+                if self.prune_dead_squares and layout.dead_mask >> crate_position & 1:
                     continue
             actions.append(direction)
         return actions
 
     def get_successor(self, state: SokobanState, action: Direction) -> SokobanState:
-        player = state.player + action.to_vector()
+        layout = self.layout
+        neighbors, points = layout.neighbors, layout.grid.points
+        cell = neighbors[layout.cell_of(state.player)][action]
         crates = state.crates
-        if player not in self.layout.walkable:
+        if cell < 0:
             # If we try to walk into a wall, then this action is wrong
             raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
+        player = points[cell]
         if player in crates:
-            crate_position = player + action.to_vector()
-            if crate_position not in self.layout.walkable or crate_position in crates:
+            crate_cell = neighbors[cell][action]
+            if crate_cell < 0 or points[crate_cell] in crates:
                 # If we try to push a crate into a wall or another crate, then this action is wrong
                 raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
             # If we walk to a crate, we push it
-            crates = crates.symmetric_difference({player,crate_position})
+            crates = crates.symmetric_difference({player, points[crate_cell]})
         return SokobanState(state.layout, player, crates)
 
     def get_cost(self, state: SokobanState, action: Direction) -> float:
         # All actions have the same cost
         return 1
 
+    # The following functions implement Zobrist hashing (see zobrist.py)
+    # There are two groups of keys: the player keys and the crate keys, each with a key for every cell
+    def zobrist_keys(self) -> ZobristKeys:
+        cells = self.layout.width * self.layout.height
+        return ZobristKeys([cells, cells])
+
+    def zobrist_hash(self, state: SokobanState, keys: ZobristKeys) -> int:
+        cell_of = self.layout.cell_of
+        hash = keys[0][cell_of(state.player)]
+        for crate in state.crates:
+            hash ^= keys[1][cell_of(crate)]
+        return hash
+
+    def zobrist_update(self, hash: int, state: SokobanState, action: Direction, keys: ZobristKeys) -> int:
+        layout = self.layout
+        player = layout.cell_of(state.player)
+        next_player = layout.neighbors[player][action]
+        hash ^= keys[0][player] ^ keys[0][next_player]
+        if layout.point_of(next_player) in state.crates:
+            # The crate is pushed from the player's new cell to the next cell in the same direction
+            hash ^= keys[1][next_player] ^ keys[1][layout.neighbors[next_player][action]]
+        return hash
+
     # Read a sokoban problem from text containing a grid of tiles
     @staticmethod
     def from_text(text: str) -> 'SokobanProblem':
@@ -148,4 +227,258 @@ class SokobanProblem(Problem[SokobanState, Direction]):
     @staticmethod
     def from_file(path: str) -> 'SokobanProblem':
         with open(path, 'r') as f:
-            return SokobanProblem.from_text(f.read())
\ No newline at end of file
+            return SokobanProblem.from_text(f.read())
+
+# The packed sokoban state is a tuple (player cell, crate mask) where the crate mask is an integer with the bit of each crate cell set
+# Tuples of integers are much cheaper to create, hash and compare than SokobanState
+PackedSokobanState = Tuple[int, int]
+
+# This is the same sokoban problem but it works on packed states
+# The actions are the same directions and they are listed in the same order as in SokobanProblem,
+# so any search function will give the same result on both problems
+class PackedSokobanProblem(Problem[PackedSokobanState, Direction]):
+    layout: SokobanLayout
+    initial_state: PackedSokobanState
+    # If True, the actions that push a crate into a dead square are not generated
+    prune_dead_squares: bool = False
+
+    def get_initial_state(self) -> PackedSokobanState:
+        return self.initial_state
+
+    def is_goal(self, state: PackedSokobanState) -> bool:
+        return state[1] == self.layout.goal_mask
+
+    # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
+    @track_call_count
+    def get_actions(self, state: PackedSokobanState) -> Iterable[Direction]:
+        neighbors = self.layout.neighbors
+        player, crates = state
+        # crates can not be pushed into cells that are occupied or dead (if pruning is enabled)
+        blocked = crates | self.layout.dead_mask if self.prune_dead_squares else crates
+        actions = []
+        for direction, position in zip(AllDirections, neighbors[player]):
+            # Disallow walking into walls
+            if position < 0: continue
+            # Check if walking into a crate
+            if crates >> position & 1:
+                # make sure that the crate is not pushed into a wall or another crate
+                crate_position = neighbors[position][direction]
+                if crate_position < 0 or blocked >> crate_position & 1:
+                    continue
+            actions.append(direction)
+        return actions
+
+    def get_successor(self, state: PackedSokobanState, action: Direction) -> PackedSokobanState:
+        neighbors = self.layout.neighbors
+        player, crates = state
+        player = neighbors[player][action]
+        if player < 0:
+            # If we try to walk into a wall, then this action is wrong
+            raise Exception(f"Invalid action {action} in state:" + "\n" + str(self.unpack(state)))
+        if crates >> player & 1:
+            crate_position = neighbors[player][action]
+            if crate_position < 0 or crates >> crate_position & 1:
+                # If we try to push a crate into a wall or another crate, then this action is wrong
+                raise Exception(f"Invalid action {action} in state:" + "\n" + str(self.unpack(state)))
+            # If we walk to a crate, we push it
+            crates ^= (1 << player) | (1 << crate_position)
+        return (player, crates)
+
+    def get_cost(self, state: PackedSokobanState, action: Direction) -> float:
+        # All actions have the same cost
+        return 1
+
+    # The following functions implement Zobrist hashing (see zobrist.py) with the same keys as SokobanProblem
+    def zobrist_keys(self) -> ZobristKeys:
+        cells = self.layout.width * self.layout.height
+        return ZobristKeys([cells, cells])
+
+    def zobrist_hash(self, state: PackedSokobanState, keys: ZobristKeys) -> int:
+        player, crates = state
+        hash = keys[0][player]
+        while crates:
+            lowest = crates & -crates
+            hash ^= keys[1][lowest.bit_length() - 1]
+            crates ^= lowest
+        return hash
+
+    def zobrist_update(self, hash: int, state: PackedSokobanState, action: Direction, keys: ZobristKeys) -> int:
+        neighbors = self.layout.neighbors
+        player, crates = state
+        next_player = neighbors[player][action]
+        hash ^= keys[0][player] ^ keys[0][next_player]
+        if crates >> next_player & 1:
+            hash ^= keys[1][next_player] ^ keys[1][neighbors[next_player][action]]
+        return hash
+
+    # Convert a sokoban state to a packed state
+    def pack(self, state: SokobanState) -> PackedSokobanState:
+        cell_of = self.layout.cell_of
+        return (cell_of(state.player), sum(1 << cell_of(crate) for crate in state.crates))
+
+    # Convert a packed state to a sokoban state (for display or for heuristics written for SokobanState)
+    def unpack(self, state: PackedSokobanState) -> SokobanState:
+        player, crates = state
+        point_of = self.layout.point_of
+        crate_points = []
+        while crates:
+            lowest = crates & -crates
+            crate_points.append(point_of(lowest.bit_length() - 1))
+            crates ^= lowest
+        return SokobanState(self.layout, point_of(player), frozenset(crate_points))
+
+    # Create a packed problem that shares the layout of the given sokoban problem
+    @staticmethod
+    def from_problem(problem: SokobanProblem) -> 'PackedSokobanProblem':
+        packed = PackedSokobanProblem()
+        packed.layout = problem.layout
+        packed.prune_dead_squares = problem.prune_dead_squares
+        packed.initial_state = packed.pack(problem.initial_state)
+        return packed
+
+    # Read a packed sokoban problem from file containing a grid of tiles
+    @staticmethod
+    def from_file(path: str) -> 'PackedSokobanProblem':
+        return PackedSokobanProblem.from_problem(SokobanProblem.from_file(path))
+
+# Wrap a heuristic written for SokobanState so that it can be used with PackedSokobanProblem
+def unpacked_heuristic(heuristic: Callable[[SokobanProblem, SokobanState], float]) -> Callable[[PackedSokobanProblem, PackedSokobanState], float]:
+    return lambda problem, state: heuristic(problem, problem.unpack(state))
+
+
+# A push action is a tuple (crate cell, direction) where the crate at the given cell is pushed one step in the direction
+SokobanPush = Tuple[int, Direction]
+
+# This is a push-level formulation of the sokoban problem: each action is a crate push and the walking between pushes is implicit
+# The state is a packed state (player cell, crate mask) where the player cell is normalized to the lowest cell
+# of the region that the player can reach without pushing a crate, so all the states that only differ by walking are merged
+# Since the state is a packed state, heuristics written for PackedSokobanProblem work on it
+# Each push costs 1 so the searches find solutions with the fewest pushes (not the fewest steps)
+# and a heuristic must not overestimate the number of pushes to be admissible (weak_heuristic counts steps so it may)
+# Use "to_directions" (or push_level_search) to expand the pushes back to the player steps
+class PushSokobanProblem(Problem[PackedSokobanState, SokobanPush]):
+    layout: SokobanLayout
+    initial_state: PackedSokobanState
+    player: int             # The actual player cell in the initial state (the walking to the first push starts from here)
+    walkable_mask: int      # The bit of each walkable cell is set
+    not_first_column: int   # The bits of all the cells except the first and last columns
+    not_last_column: int    # (these are used to stop the shifts of the flood fill from wrapping around the rows)
+    # If True, the actions that push a crate into a dead square are not generated
+    prune_dead_squares: bool = False
+
+    def get_initial_state(self) -> PackedSokobanState:
+        return self.initial_state
+
+    def is_goal(self, state: PackedSokobanState) -> bool:
+        return state[1] == self.layout.goal_mask
+
+    # Returns the mask of the cells that the player can reach from the given cell without pushing a crate
+    # The flood fill moves all the cells of the region by one step in every direction at once using bit shifts
+    def reachable(self, player: int, crates: int) -> int:
+        free, width = self.walkable_mask & ~crates, self.layout.width
+        not_first_column, not_last_column = self.not_first_column, self.not_last_column
+        region = 1 << player
+        while True:
+            grown = region | (region << 1 & not_first_column) | (region >> 1 & not_last_column) | region << width | region >> width
+            grown &= free
+            if grown == region: return region
+            region = grown
+
+    # Normalize a state by moving the player to the lowest cell of its region
+    def normalize(self, player: int, crates: int) -> PackedSokobanState:
+        region = self.reachable(player, crates)
+        return ((region & -region).bit_length() - 1, crates)
+
+    # The pushes are listed by crate cell then by direction
+    def get_actions(self, state: PackedSokobanState) -> Iterable[SokobanPush]:
+        neighbors = self.layout.neighbors
+        player, crates = state
+        region = self.reachable(player, crates)
+        blocked = crates | self.layout.dead_mask if self.prune_dead_squares else crates
+        actions = []
+        remaining = crates
+        while remaining:
+            lowest = remaining & -remaining
+            remaining ^= lowest
+            crate = lowest.bit_length() - 1
+            crate_neighbors = neighbors[crate]
+            for direction in AllDirections:
+                # The player must stand behind the crate and the cell in front of it must be free
+                behind, ahead = crate_neighbors[(direction + 2) % 4], crate_neighbors[direction]
+                if behind < 0 or ahead < 0 or not region >> behind & 1 or blocked >> ahead & 1: continue
+                actions.append((crate, direction))
+        return actions
+
+    # After the push, the player stands where the crate was
+    def get_successor(self, state: PackedSokobanState, action: SokobanPush) -> PackedSokobanState:
+        crate, direction = action
+        ahead = self.layout.neighbors[crate][direction]
+        return self.normalize(crate, state[1] ^ (1 << crate) ^ (1 << ahead))
+
+    def get_cost(self, state: PackedSokobanState, action: SokobanPush) -> float:
+        # Every push has the same cost
+        return 1
+
+    # Convert a packed state to a sokoban state (for display or for heuristics written for SokobanState)
+    def unpack(self, state: PackedSokobanState) -> SokobanState:
+        return PackedSokobanProblem.unpack(self, state)
+
+    # Expand a list of pushes to the player steps, starting from the given player cell (the actual player cell of the initial state by default)
+    # The walk to each push is the shortest path that does not push any crate
+    def to_directions(self, pushes: Iterable[SokobanPush], player: Optional[int] = None) -> List[Direction]:
+        neighbors = self.layout.neighbors
+        player = self.player if player is None else player
+        crates = self.initial_state[1]
+        directions = []
+        for crate, direction in pushes:
+            # Find the path to the cell behind the crate with a BFS that stores the step that reached each cell
+            target = neighbors[crate][(direction + 2) % 4]
+            steps = {player: None}
+            queue = deque([player])
+            while target not in steps:
+                cell = queue.popleft()
+                for step, next_cell in zip(AllDirections, neighbors[cell]):
+                    if next_cell < 0 or next_cell in steps or crates >> next_cell & 1: continue
+                    steps[next_cell] = (cell, step)
+                    queue.append(next_cell)
+            walk, cell = [], target
+            while steps[cell] is not None:
+                cell, step = steps[cell]
+                walk.append(step)
+            directions.extend(reversed(walk))
+            directions.append(direction)
+            player = crate
+            crates ^= (1 << crate) | (1 << neighbors[crate][direction])
+        return directions
+
+    # Create a push-level problem that starts from the given state of a sokoban problem (or a packed sokoban problem)
+    @staticmethod
+    def from_problem(problem: Union[SokobanProblem, PackedSokobanProblem],
+                     state: Union[SokobanState, PackedSokobanState, None] = None) -> 'PushSokobanProblem':
+        push = PushSokobanProblem()
+        layout = push.layout = problem.layout
+        push.prune_dead_squares = problem.prune_dead_squares
+        push.walkable_mask = layout.grid.mask_of(layout.walkable)
+        width, cells = layout.width, layout.width * layout.height
+        push.not_first_column = sum(1 << cell for cell in range(cells) if cell % width != 0)
+        push.not_last_column = sum(1 << cell for cell in range(cells) if cell % width != width - 1)
+        if state is None: state = problem.get_initial_state()
+        player, crates = PackedSokobanProblem.pack(push, state) if isinstance(state, SokobanState) else state
+        push.player = player
+        push.initial_state = push.normalize(player, crates)
+        return push
+
+# Wrap a search function so that it searches on the push-level problem (see PushSokobanProblem)
+# and returns the solution as a list of directions, so it can be used with SokobanProblem or PackedSokobanProblem like any search function.
+# The heuristic (if any) must accept the states of the given problem and it should not overestimate the number of pushes
+def push_level_search(search_fn: Callable[..., Optional[List[SokobanPush]]]) -> Callable[..., Optional[List[Direction]]]:
+    def search(problem: Union[SokobanProblem, PackedSokobanProblem], state: Union[SokobanState, PackedSokobanState],
+               *args, **kwargs) -> Optional[List[Direction]]:
+        if problem.is_goal(state): return None
+        push = PushSokobanProblem.from_problem(problem, state)
+        if args and isinstance(problem, SokobanProblem):
+            # The push states are packed states so a heuristic written for SokobanState needs the state to be unpacked
+            args = (unpacked_heuristic(args[0]),) + args[1:]
+        pushes = search_fn(push, push.initial_state, *args, **kwargs)
+        return None if pushes is None else push.to_directions(pushes)
+    return search
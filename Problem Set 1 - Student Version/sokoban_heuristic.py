@@ -1,6 +1,8 @@
-from sokoban import SokobanProblem, SokobanState
+from typing import Dict, List
+from collections import deque
+from sokoban import SokobanLayout, SokobanProblem, SokobanState
 from mathutils import Direction, Point, manhattan_distance
-from helpers.utils import NotImplemented
+from helpers.utils import MemoTable, NotImplemented
 
 # This heuristic returns the distance between the player and the nearest crate as an estimate for the path cost
 # While it is consistent, it does a bad job at estimating the actual cost thus the search will explore a lot of nodes before finding a goal
@@ -9,6 +11,104 @@ def weak_heuristic(problem: SokobanProblem, state: SokobanState):
 
 #DONE: Import any modules and write any functions you want to use
 
+# For each goal, this computes the minimum number of pushes needed to move a crate from every position to that goal
+# (ignoring the other crates). We do a BFS backward from the goal where the crate is pulled instead of pushed:
+# a crate at "cell" could have been pushed there from the previous cell in the opposite direction if the player could stand on the cell before it
+# The BFS runs on the cell indices of the layout and the tables are converted to points at the end
+# The positions that are missing from a goal's table can not reach that goal
+def compute_push_distances(layout: SokobanLayout) -> Dict[Point, Dict[Point, int]]:
+    neighbors, point_of = layout.neighbors, layout.point_of
+    tables = {}
+    for goal in layout.goals:
+        start = layout.cell_of(goal)
+        distances = {start: 0}
+        queue = deque([start])
+        while queue:
+            cell = queue.popleft()
+            for direction in Direction:
+                backward = (direction + 2) % 4
+                previous = neighbors[cell][backward]
+                if previous < 0 or previous in distances or neighbors[previous][backward] < 0: continue
+                distances[previous] = distances[cell] + 1
+                queue.append(previous)
+        tables[goal] = {point_of(cell): distance for cell, distance in distances.items()}
+    return tables
+
+# The push distance tables only depend on the layout so they are computed once and stored in the problem cache
+def get_push_distances(problem: SokobanProblem) -> Dict[Point, Dict[Point, int]]:
+    cache = problem.cache()
+    tables = cache.get("push_distances")
+    if tables is None:
+        tables = cache["push_distances"] = compute_push_distances(problem.layout)
+    return tables
+
+# Solve the assignment problem (Hungarian algorithm) for a square cost matrix and return the minimum total cost
+# This is the O(n^3) version that keeps a potential for each row and column
+def min_cost_assignment(costs: List[List[float]]) -> float:
+    n = len(costs)
+    infinity = float('inf')
+    row_potential, column_potential = [0] * (n + 1), [0] * (n + 1)
+    match = [0] * (n + 1) # match[column] is the row assigned to the column (rows and columns are 1-indexed here, 0 is a dummy)
+    for row in range(1, n + 1):
+        match[0] = row
+        column = 0
+        min_slack, previous = [infinity] * (n + 1), [0] * (n + 1)
+        used = [False] * (n + 1)
+        while True:
+            used[column] = True
+            current_row, delta, next_column = match[column], infinity, 0
+            for j in range(1, n + 1):
+                if used[j]: continue
+                slack = costs[current_row - 1][j - 1] - row_potential[current_row] - column_potential[j]
+                if slack < min_slack[j]:
+                    min_slack[j], previous[j] = slack, column
+                if min_slack[j] < delta:
+                    delta, next_column = min_slack[j], j
+            for j in range(n + 1):
+                if used[j]:
+                    row_potential[match[j]] += delta
+                    column_potential[j] -= delta
+                else:
+                    min_slack[j] -= delta
+            column = next_column
+            if match[column] == 0: break
+        while column:
+            previous_column = previous[column]
+            match[column] = match[previous_column]
+            column = previous_column
+    return sum(costs[match[j] - 1][j - 1] for j in range(1, n + 1))
+
+# This heuristic assigns every crate to a different goal such that the total number of pushes is minimized
+# Each action pushes at most one crate by one step so the total push distance decreases by at most 1 per action,
+# thus the heuristic is admissible and consistent. If a crate can not reach any goal, the state is a dead end and we return infinity.
+# The value only depends on the crates so it is cached by the crate positions (in a bounded table, see CacheContainer.memo).
+def push_matching_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
+    values = problem.memo("push_matching", capacity=2**18)
+    value = values.get(state.crates)
+    if value is not MemoTable.MISSING: return value
+    tables = get_push_distances(problem)
+    infinity = float('inf')
+    # unreachable pairs get a large cost (larger than any possible assignment) instead of infinity to keep the algorithm simple
+    unreachable = len(state.layout.walkable) * len(state.crates) + 1
+    costs = [[tables[goal].get(crate, unreachable) for goal in state.layout.goals] for crate in state.crates]
+    if any(min(row) == unreachable for row in costs):
+        value = infinity
+    else:
+        value = min_cost_assignment(costs)
+        if value >= unreachable: value = infinity
+    values.put(state.crates, value)
+    return value
+
+# This is a faster but weaker version that lets each crate go to its nearest goal (multiple crates can share a goal)
+# It is a lower bound of the matching heuristic so it is also admissible and consistent
+def push_distance_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
+    tables = get_push_distances(problem).values()
+    total = 0
+    for crate in state.crates:
+        distance = min((table.get(crate, float('inf')) for table in tables))
+        total += distance
+    return total
+
 def strong_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
     #DONE: ADD YOUR CODE HERE
     #IMPORTANT: DO NOT USE "problem.get_actions" HERE.
@@ -16,6 +116,5 @@ def strong_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
     # which is the number of get_actions calls during the search
     #NOTE: you can use problem.cache() to get a dictionary in which you can store information that will persist between calls of this function
     # This could be useful if you want to store the results heavy computations that can be cached and used across multiple calls of this function
-    return weak_heuristic(problem,state)+ min(manhattan_distance(crate, goal) for crate in state.crates for goal in state.layout.goals) 
-                                            #same as weak heuristic but with the distance to the nearest goal i.e min dist bet (me and crate + min dist bet crate and goal) 
-                                                                                                                                                        #for each crate and goal 
\ No newline at end of file
+    # the minimum total number of pushes needed to put every crate on a different goal (see push_matching_heuristic)
+    return push_matching_heuristic(problem, state)
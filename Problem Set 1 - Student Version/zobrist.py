@@ -0,0 +1,162 @@
+from typing import Any, Callable, Generic, Iterable, List, Optional
+from array import array
+import random
+
+from problem import HeuristicFunction, Problem, S, A, Solution
+
+# Zobrist hashing gives every (piece, cell) pair a random 64-bit key and the hash of a state is the XOR of the keys
+# of all its pieces. When a piece moves, the hash of the successor is the parent's hash XORed with the key of the piece
+# at its old cell and the key of the piece at its new cell, so it is updated in O(1) instead of being recomputed from scratch.
+
+# A problem can opt into Zobrist hashing by implementing the following functions:
+#   zobrist_keys() -> ZobristKeys: creates the random keys for the problem (called once)
+#   zobrist_hash(state, keys) -> int: computes the hash of a state from scratch (used for the initial state)
+#   zobrist_update(hash, state, action, keys) -> int: computes the hash of the successor from the hash of the state
+
+# This holds the random keys. The keys are divided into groups (e.g. one group per piece type)
+# and table[group][cell] is the key of a piece of the given group at the given cell
+class ZobristKeys:
+    def __init__(self, group_sizes: Iterable[int], seed: int = 0) -> None:
+        rng = random.Random(seed)
+        self.table: List[List[int]] = [[rng.getrandbits(64) for _ in range(size)] for size in group_sizes]
+
+    def __getitem__(self, group: int) -> List[int]:
+        return self.table[group]
+
+# This wraps a state together with its Zobrist hash
+# The hash is used directly by sets and dictionaries, and the wrapped states are only compared if the hashes are equal
+class ZobristState(Generic[S]):
+    __slots__ = ("state", "hash")
+
+    def __init__(self, state: S, hash: int) -> None:
+        self.state = state
+        self.hash = hash
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ZobristState) and self.hash == other.hash and self.state == other.state
+
+    def __str__(self) -> str:
+        return str(self.state)
+
+# This is the same as ZobristState but two states are considered equal if their 64-bit hashes are equal
+# This skips comparing the full states which is faster, but two different states with the same hash will be
+# treated as the same state (the chance of this is negligible unless there are billions of states)
+class HashOnlyZobristState(ZobristState[S]):
+    __slots__ = ()
+    # defining __eq__ removes the inherited __hash__ so we have to restore it
+    __hash__ = ZobristState.__hash__
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ZobristState) and self.hash == other.hash
+
+# This wraps a problem that implements the Zobrist functions so that any search function can use the Zobrist hashes
+# The actions are the same as the actions of the wrapped problem, so the solution can be applied to the wrapped problem directly
+# If exact is False, the states are compared by their hashes only (see HashOnlyZobristState)
+class ZobristProblem(Problem[ZobristState[S], A]):
+    def __init__(self, problem: Problem[S, A], exact: bool = True) -> None:
+        super().__init__()
+        self.problem = problem
+        self.keys = problem.zobrist_keys()
+        self.state_type = ZobristState if exact else HashOnlyZobristState
+
+    def get_initial_state(self) -> ZobristState[S]:
+        return self.wrap(self.problem.get_initial_state())
+
+    def is_goal(self, state: ZobristState[S]) -> bool:
+        return self.problem.is_goal(state.state)
+
+    def get_actions(self, state: ZobristState[S]) -> Iterable[A]:
+        return self.problem.get_actions(state.state)
+
+    def get_successor(self, state: ZobristState[S], action: A) -> ZobristState[S]:
+        problem = self.problem
+        return self.state_type(problem.get_successor(state.state, action), problem.zobrist_update(state.hash, state.state, action, self.keys))
+
+    def get_cost(self, state: ZobristState[S], action: A) -> float:
+        return self.problem.get_cost(state.state, action)
+
+    # Wrap a state of the wrapped problem (the hash is computed from scratch)
+    def wrap(self, state: S) -> ZobristState[S]:
+        return self.state_type(state, self.problem.zobrist_hash(state, self.keys))
+
+# Wrap a heuristic written for the wrapped problem so that it can be used with ZobristProblem
+def zobrist_heuristic(heuristic: HeuristicFunction) -> HeuristicFunction:
+    return lambda problem, state: heuristic(problem.problem, state.state)
+
+# Wrap a search function so that it searches on the ZobristProblem of the given problem
+# (the closed set and the frontier of the search then use the Zobrist hashes instead of hashing the full states)
+# The heuristic (if any) is given as the first extra argument and it must accept the states of the given problem
+def zobrist_search(search_fn: Callable[..., Solution], exact: bool = True) -> Callable[..., Solution]:
+    def search(problem: Problem[S, A], state: S, *args, **kwargs) -> Solution:
+        wrapped = ZobristProblem(problem, exact)
+        if args: args = (zobrist_heuristic(args[0]),) + args[1:]
+        return search_fn(wrapped, wrapped.wrap(state), *args, **kwargs)
+    return search
+
+# This is a compact hash table keyed by 64-bit hashes (e.g. Zobrist hashes) that stores a float value for each key
+# It uses open addressing with linear probing where the keys and the values are stored in two flat arrays.
+# The states themselves are not stored, so two states with the same 64-bit hash share the same entry.
+# The key 0 marks an empty slot, so a hash of 0 is stored as 1.
+class TranspositionTable:
+    def __init__(self, capacity: int = 1 << 16, max_load: float = 0.7) -> None:
+        size = 1
+        while size < capacity: size <<= 1
+        self.max_load = max_load
+        self._allocate(size)
+
+    def _allocate(self, size: int) -> None:
+        self.mask = size - 1
+        self.size = 0
+        self.keys = array('Q', bytes(8 * size))
+        self.values = array('d', bytes(8 * size))
+
+    def __len__(self) -> int:
+        return self.size
+
+    # Returns the index of the slot that holds the key or the empty slot where the key should be inserted
+    def _find(self, key: int) -> int:
+        keys, mask = self.keys, self.mask
+        index = key & mask
+        while True:
+            stored = keys[index]
+            if stored == key or stored == 0: return index
+            index = (index + 1) & mask
+
+    def __contains__(self, key: int) -> bool:
+        key = key or 1
+        return self.keys[self._find(key)] == key
+
+    def get(self, key: int, default: Optional[float] = None) -> Optional[float]:
+        key = key or 1
+        index = self._find(key)
+        return self.values[index] if self.keys[index] == key else default
+
+    def __setitem__(self, key: int, value: float) -> None:
+        key = key or 1
+        index = self._find(key)
+        if self.keys[index] != key:
+            if (self.size + 1) > self.max_load * (self.mask + 1):
+                self._grow()
+                index = self._find(key)
+            self.keys[index] = key
+            self.size += 1
+        self.values[index] = value
+
+    def __getitem__(self, key: int) -> float:
+        value = self.get(key)
+        if value is None: raise KeyError(key)
+        return value
+
+    # Double the capacity and reinsert all the entries
+    def _grow(self) -> None:
+        keys, values = self.keys, self.values
+        self._allocate(2 * (self.mask + 1))
+        for key, value in zip(keys, values):
+            if key != 0:
+                index = self._find(key)
+                self.keys[index] = key
+                self.values[index] = value
+                self.size += 1
@@ -1,13 +1,14 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from copy import deepcopy
 from typing import Iterable, List, Optional, Set, Tuple
 from enum import Enum
 
-from mathutils import Direction, Point
+from mathutils import Direction, GridIndex, Point
 from game import Game
 from helpers.utils import track_call_count
 from helpers.mt19937 import RandomGenerator
 from agents import Agent
+from zobrist import ZobristKeys
 
 # This file contains the definition for the Dungeon Crawler game
 # In this problem, the agent can move Up, Down, Left, Right or stay idle
@@ -25,12 +26,29 @@ class DungeonTile(str, Enum):
     KEY = "K"
 
 # Dungeon layout specifies the walkable locations and the exit location
+# It also precomputes the tables used to move on cell indices "y * width + x" instead of points:
+#   grid gives the cell index of each point and the interned point of each cell (see GridIndex)
+#   neighbors[cell][direction] is the walkable cell next to "cell" in the given direction (or -1 if it is a wall)
 @dataclass
 class DungeonLayout:
     width: int
     height: int
     walkable: Set[Point]
     exit: Point
+    grid: GridIndex = field(init=False, repr=False, compare=False)
+    neighbors: Tuple[Tuple[int, ...], ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.grid = GridIndex(self.width, self.height)
+        self.neighbors = self.grid.neighbors(self.grid.cell_of(position) for position in self.walkable)
+
+    # Returns the position reached by moving one step from the given position in the given direction
+    # Moves between walkable cells use the neighbor table (and give an interned point), other moves are computed directly
+    def step(self, position: Point, direction: Direction) -> Point:
+        if position in self.grid:
+            cells = self.neighbors[self.grid.cell_of(position)]
+            if cells and cells[direction] != -1: return self.grid.points[cells[direction]]
+        return position + direction.to_vector()
 
     def __deepcopy__(self, memo):
         return self
@@ -102,6 +120,10 @@ class DungeonState:
         header = f"Inventory: {self.player.inventory.keys} Key(s), {self.player.inventory.daggers} Dagger(s), {self.player.inventory.coins} Coin(s)\n"
         return header + '\n'.join(''.join(position_to_str(Point(x, y)) for x in range(self.layout.width)) for y in range(self.layout.height))
 
+# This mixes the time into a 64-bit value for the Zobrist hash
+def _zobrist_time(time: int) -> int:
+    return (time * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+
 # This is the implementation of the dungeon game
 class DungeonGame(Game[DungeonState, Direction]):
     # The problem will contain the dungeon layout and the inital state
@@ -136,28 +158,29 @@ class DungeonGame(Game[DungeonState, Direction]):
         return state.turn
 
     def get_actions(self, state: DungeonState) -> Iterable[Direction]:
+        # The moves are checked on cell indices using the neighbor table of the layout (walls are -1)
+        layout = state.layout
+        cell_of = layout.grid.cell_of
         if state.turn == 0:
             # Find an return actions to be done by the player
-            position_position = state.player.position
-            positions = ((direction, position_position + direction.to_vector()) for direction in Direction)
+            cells = zip(Direction, layout.neighbors[cell_of(state.player.position)])
             # prevent the player from getting into a wall
-            return [direction for direction, position in positions if position in state.layout.walkable]
+            return [direction for direction, cell in cells if cell != -1]
         else:
             # Find an return actions to be done by a monster
             index = state.turn - 1
             if not state.monsters[index].alive: return []
-            monster_locations = {monster.position for i, monster in enumerate(state.monsters) if i != index and monster.alive} 
-            monster_position = state.monsters[index].position
-            positions = ((direction, monster_position + direction.to_vector()) for direction in Direction)
+            monster_cells = {cell_of(monster.position) for i, monster in enumerate(state.monsters) if i != index and monster.alive}
+            cells = zip(Direction, layout.neighbors[cell_of(state.monsters[index].position)])
             # prevent the monster from getting into a wall or another monster
-            return [direction for direction, position in positions if position in state.layout.walkable and position not in monster_locations]
+            return [direction for direction, cell in cells if cell != -1 and cell not in monster_cells]
 
     def get_successor(self, state: DungeonState, action: Direction) -> DungeonState:
         state = deepcopy(state)
         current_turn = state.turn
         if current_turn == 0:
             # This action is done by the player
-            new_position = state.player.position + action.to_vector()
+            new_position = state.layout.step(state.player.position, action)
             state.player.position = new_position
             if new_position in state.coins:
                 # If we walk over a coin, we take it
@@ -186,7 +209,7 @@ class DungeonGame(Game[DungeonState, Direction]):
         else:
             # This action is done by a monster
             monster = state.monsters[current_turn - 1]
-            new_position = monster.position + action.to_vector()
+            new_position = state.layout.step(monster.position, action)
             monster.position = new_position
             if new_position == state.player.position:
                 if state.player.inventory.daggers != 0:
@@ -203,6 +226,53 @@ class DungeonGame(Game[DungeonState, Direction]):
             state.time += 1
         return state
 
+    # The following functions implement Zobrist hashing (see zobrist.py)
+    # The key groups are: the player cell, the player death, the inventory counts (coins, daggers, keys),
+    # the cells of the remaining coins, daggers and keys, the turn, then the cell and the death of each monster.
+    # The time is unbounded so it is mixed into the hash by multiplying it with a large odd constant.
+    def zobrist_keys(self) -> ZobristKeys:
+        cells = self.layout.width * self.layout.height
+        state = self.initial_state
+        items = len(state.coins) + len(state.daggers) + len(state.keys) + 1
+        return ZobristKeys([cells, 1, items, items, items, cells, cells, cells, len(state.monsters) + 1] + [cells, 1] * len(state.monsters))
+
+    def zobrist_hash(self, state: DungeonState, keys: ZobristKeys) -> int:
+        cell_of = self.layout.grid.cell_of
+        player, inventory = state.player, state.player.inventory
+        hash = keys[0][cell_of(player.position)] ^ _zobrist_time(state.time) ^ keys[8][state.turn]
+        if not player.alive: hash ^= keys[1][0]
+        hash ^= keys[2][inventory.coins] ^ keys[3][inventory.daggers] ^ keys[4][inventory.keys]
+        for group, items in ((5, state.coins), (6, state.daggers), (7, state.keys)):
+            for item in items:
+                hash ^= keys[group][cell_of(item)]
+        for index, monster in enumerate(state.monsters):
+            hash ^= keys[9 + 2 * index][cell_of(monster.position)]
+            if not monster.alive: hash ^= keys[10 + 2 * index][0]
+        return hash
+
+    # Unlike the search problems, the successor is passed instead of the action since the game has many side effects
+    # (picking items, killing monsters, etc.), so we only compare the parts that can change in a single action
+    def zobrist_update(self, hash: int, state: DungeonState, next_state: DungeonState, keys: ZobristKeys) -> int:
+        cell_of = self.layout.grid.cell_of
+        player, next_player = state.player, next_state.player
+        if player.position != next_player.position:
+            hash ^= keys[0][cell_of(player.position)] ^ keys[0][cell_of(next_player.position)]
+        if player.alive != next_player.alive: hash ^= keys[1][0]
+        for group, attribute in ((2, "coins"), (3, "daggers"), (4, "keys")):
+            count, next_count = getattr(player.inventory, attribute), getattr(next_player.inventory, attribute)
+            if count != next_count: hash ^= keys[group][count] ^ keys[group][next_count]
+        # items can only be picked up at the player's new position
+        position = next_player.position
+        for group, items, next_items in ((5, state.coins, next_state.coins), (6, state.daggers, next_state.daggers), (7, state.keys, next_state.keys)):
+            if position in items and position not in next_items: hash ^= keys[group][cell_of(position)]
+        for index, (monster, next_monster) in enumerate(zip(state.monsters, next_state.monsters)):
+            if monster.position != next_monster.position:
+                hash ^= keys[9 + 2 * index][cell_of(monster.position)] ^ keys[9 + 2 * index][cell_of(next_monster.position)]
+            if monster.alive != next_monster.alive: hash ^= keys[10 + 2 * index][0]
+        if state.turn != next_state.turn: hash ^= keys[8][state.turn] ^ keys[8][next_state.turn]
+        if state.time != next_state.time: hash ^= _zobrist_time(state.time) ^ _zobrist_time(next_state.time)
+        return hash
+
     # Read a dungeon problem from text containing a grid of tiles
     @staticmethod
     def from_text(text: str) -> 'DungeonGame':
@@ -282,23 +352,26 @@ def path_length(path) -> int:
 
 # Return the path between two points in the dungeom
 # The result is cached inside the game object
+# The BFS runs on the cell indices of the layout (the paths contain the interned points of the grid)
 def compute_path(game: DungeonGame, p1: Point, p2: Point) -> List[Point]:
     cache = game.cache()
+    grid = game.layout.grid
     if p1 not in cache:
         from collections import deque
-        path_map = {p1: [p1]}
-        queue = deque([p1])
+        neighbors, points = game.layout.neighbors, grid.points
+        start = grid.cell_of(p1)
+        path_map = {start: [p1]}
+        queue = deque([start])
         while queue:
             parent = queue.popleft()
             path = path_map[parent]
-            for direction in Direction:
-                child = parent + direction.to_vector()
-                if child in path_map or child not in game.layout.walkable:
+            for child in neighbors[parent]:
+                if child == -1 or child in path_map:
                     continue
-                path_map[child] = path + [child]
+                path_map[child] = path + [points[child]]
                 queue.append(child)
         cache[p1] = path_map
-    return cache[p1].get(p2, None)
+    return cache[p1].get(grid.cell_of(p2), None) if p2 in grid else None
 
 # Finds the shortest path from a point to a path in the dungeon
 def path_to_path(game: DungeonGame, p1: Point, path: List[Point]):
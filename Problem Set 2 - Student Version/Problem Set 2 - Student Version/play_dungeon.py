@@ -57,6 +57,10 @@ def create_agent(args: argparse.Namespace):
         from search import minimax
         heuristic = get_heuristic(args.heuristic)
         return SearchAgent(minimax, heuristic, args.depth)
+    if agent_type == "minimax_tt":
+        from search import minimax_with_transpositions
+        heuristic = get_heuristic(args.heuristic)
+        return SearchAgent(minimax_with_transpositions, heuristic, args.depth)
     if agent_type == "alphabeta":
         from search import alphabeta
         heuristic = get_heuristic(args.heuristic)
@@ -133,7 +137,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Dungeon as Human or AI")
     parser.add_argument("level", help="path to the dungeon to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'greedy', 'random', 'minimax', 'alphabeta', 'alphabeta_order', 'expectimax'],
+                        choices=['human', 'greedy', 'random', 'minimax', 'minimax_tt', 'alphabeta', 'alphabeta_order', 'expectimax'],
                         help="the agent that will play the game")
     parser.add_argument("--heuristic", '-hf', default="zero",
                         choices=["zero", "heuristic"],
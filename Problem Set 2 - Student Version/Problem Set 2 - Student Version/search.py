@@ -1,6 +1,7 @@
 from typing import Tuple
 from game import HeuristicFunction, Game, S, A
 from helpers.utils import NotImplemented
+from zobrist import ZobristKeys, TranspositionTable
 
 #DONE: Import any modules you want to use
 
@@ -180,4 +181,36 @@ def expectimax(game: Game[S, A], state: S, heuristic: HeuristicFunction, max_dep
             successor = game.get_successor(state, action)
             expecti +=  expectimax(game, successor, heuristic, max_depth-1)[0] #get the value returned from the leaf nodes and sum them
         expecti *= chance #multiply the sum with the chance of each action
-        return expecti, None #return the expecti value and no action
\ No newline at end of file
+        return expecti, None #return the expecti value and no action
+
+# Apply Minimax search with a transposition table and return the game tree value and the best action
+# The game must implement the Zobrist hashing functions (see zobrist.py), the hash of each successor is updated from the hash of its parent
+# and the value of every state is stored in a TranspositionTable under its hash mixed with the remaining depth,
+# so a state that is reached again through a different order of moves is not searched again.
+# It returns the same value and action as minimax (unless two different states have the same 64-bit hash).
+def minimax_with_transpositions(game: Game[S, A], state: S, heuristic: HeuristicFunction, max_depth: int = -1) -> Tuple[float, A]:
+    cache = game.cache()
+    keys = cache.get("zobrist_keys")
+    if keys is None: keys = cache["zobrist_keys"] = game.zobrist_keys()
+    # The value of a state depends on the remaining depth (unless there is no depth cutoff)
+    depth_keys = ZobristKeys([max_depth + 1], seed=1)[0] if max_depth >= 0 else None
+    table = TranspositionTable()
+
+    def search(state: S, hash: int, depth: int) -> Tuple[float, A]:
+        terminal, values = game.is_terminal(state)
+        if terminal: return values[0], None
+        if depth == 0: return heuristic(game, state, 0), None
+        maximize = game.get_turn(state) == 0
+        best_value, best_action = float('-inf') if maximize else float('inf'), None
+        for action in game.get_actions(state):
+            successor = game.get_successor(state, action)
+            successor_hash = game.zobrist_update(hash, state, successor, keys)
+            key = successor_hash if depth_keys is None else successor_hash ^ depth_keys[depth - 1]
+            value = table.get(key)
+            if value is None:
+                value = table[key] = search(successor, successor_hash, depth - 1)[0]
+            if (value > best_value) if maximize else (value < best_value):
+                best_value, best_action = value, action
+        return best_value, best_action
+
+    return search(state, game.zobrist_hash(state, keys), max_depth)
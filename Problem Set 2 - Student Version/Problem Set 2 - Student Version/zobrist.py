@@ -0,0 +1,87 @@
+from typing import Iterable, List, Optional
+from array import array
+import random
+
+# Zobrist hashing gives every (piece, cell) pair a random 64-bit key and the hash of a state is the XOR of the keys
+# of all its pieces. When a piece moves, the hash of the successor is the parent's hash XORed with the key of the piece
+# at its old cell and the key of the piece at its new cell, so it is updated in O(1) instead of being recomputed from scratch.
+
+# A game can opt into Zobrist hashing by implementing the following functions:
+#   zobrist_keys() -> ZobristKeys: creates the random keys for the game (called once)
+#   zobrist_hash(state, keys) -> int: computes the hash of a state from scratch (used for the initial state)
+#   zobrist_update(hash, state, next_state, keys) -> int: computes the hash of the successor from the hash of the state
+
+# This holds the random keys. The keys are divided into groups (e.g. one group per piece type)
+# and table[group][cell] is the key of a piece of the given group at the given cell
+class ZobristKeys:
+    def __init__(self, group_sizes: Iterable[int], seed: int = 0) -> None:
+        rng = random.Random(seed)
+        self.table: List[List[int]] = [[rng.getrandbits(64) for _ in range(size)] for size in group_sizes]
+
+    def __getitem__(self, group: int) -> List[int]:
+        return self.table[group]
+
+# This is a compact hash table keyed by 64-bit hashes (e.g. Zobrist hashes) that stores a float value for each key
+# It uses open addressing with linear probing where the keys and the values are stored in two flat arrays.
+# The states themselves are not stored, so two states with the same 64-bit hash share the same entry.
+# The key 0 marks an empty slot, so a hash of 0 is stored as 1.
+class TranspositionTable:
+    def __init__(self, capacity: int = 1 << 16, max_load: float = 0.7) -> None:
+        size = 1
+        while size < capacity: size <<= 1
+        self.max_load = max_load
+        self._allocate(size)
+
+    def _allocate(self, size: int) -> None:
+        self.mask = size - 1
+        self.size = 0
+        self.keys = array('Q', bytes(8 * size))
+        self.values = array('d', bytes(8 * size))
+
+    def __len__(self) -> int:
+        return self.size
+
+    # Returns the index of the slot that holds the key or the empty slot where the key should be inserted
+    def _find(self, key: int) -> int:
+        keys, mask = self.keys, self.mask
+        index = key & mask
+        while True:
+            stored = keys[index]
+            if stored == key or stored == 0: return index
+            index = (index + 1) & mask
+
+    def __contains__(self, key: int) -> bool:
+        key = key or 1
+        return self.keys[self._find(key)] == key
+
+    def get(self, key: int, default: Optional[float] = None) -> Optional[float]:
+        key = key or 1
+        index = self._find(key)
+        return self.values[index] if self.keys[index] == key else default
+
+    def __setitem__(self, key: int, value: float) -> None:
+        key = key or 1
+        index = self._find(key)
+        if self.keys[index] != key:
+            if (self.size + 1) > self.max_load * (self.mask + 1):
+                self._grow()
+                index = self._find(key)
+            self.keys[index] = key
+            self.size += 1
+        self.values[index] = value
+
+    def __getitem__(self, key: int) -> float:
+        value = self.get(key)
+        if value is None: raise KeyError(key)
+        return value
+
+    # Double the capacity and reinsert all the entries
+    def _grow(self) -> None:
+        keys, values = self.keys, self.values
+        self._allocate(2 * (self.mask + 1))
+        for key, value in zip(keys, values):
+            if key != 0:
+                index = self._find(key)
+                self.keys[index] = key
+                self.values[index] = value
+                self.size += 1
@@ -1,7 +1,7 @@
 from typing import Dict, List, Optional, Set, Tuple
 from mdp import MarkovDecisionProcess
 from environment import Environment
-from mathutils import Point, Direction
+from mathutils import GridIndex, Point, Direction
 from helpers.mt19937 import RandomGenerator
 import json
 
@@ -13,6 +13,8 @@ class GridMDP(MarkovDecisionProcess[Point, Direction]):
     terminals: Set[Point] # A set of positions where the episode would end when the player reaches it
     rewards: Dict[Point, float] # The reward of each position
     noise: float # The action noise, aka the probability of steering left or right of the intended direction
+    grid: GridIndex # The cell indices "y * width + x" of the map and the interned point of each cell
+    neighbors: Tuple[Tuple[int, ...], ...] # neighbors[cell][direction] is the walkable cell next to "cell" in the given direction (or -1 if it is a wall)
 
     def __init__(self, 
             size: Tuple[int, int], 
@@ -26,6 +28,8 @@ class GridMDP(MarkovDecisionProcess[Point, Direction]):
         self.terminals = terminals
         self.rewards = rewards
         self.noise = noise
+        self.grid = GridIndex(*size)
+        self.neighbors = self.grid.neighbors(self.grid.cell_of(position) for position in walkable)
 
     # Returns all possible states (where there is no walls)
     def get_states(self) -> List[Point]:
@@ -52,10 +56,13 @@ class GridMDP(MarkovDecisionProcess[Point, Direction]):
             (action.rotate(1), 0.5 * self.noise),
             (action.rotate(3), 0.5 * self.noise)
         ]
+        # The moves are done on cell indices using the neighbor table (moving into a wall keeps the player in place)
+        cells = self.neighbors[self.grid.cell_of(state)] if state in self.grid else ()
+        points = self.grid.points
         states = {}
         for direction, prob in noisy_actions:
-            next_state = state + direction.to_vector()
-            if next_state not in self.walkable: next_state = state
+            next_cell = cells[direction] if cells else -1
+            next_state = state if next_cell == -1 else points[next_cell]
             if next_state in states: states[next_state] += prob
             else: states[next_state] = prob
         return states
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from enum import IntEnum
-from typing import Iterator
+from typing import Iterable, Iterator, Optional, Tuple
 import math
 
 # the class Point will hold a 2D coordinate on a discrete grid
@@ -74,4 +74,68 @@ Direction._Vectors = [
     Point(-1,  0),
     Point( 0,  1),
     Point( 0,  0)
-]
\ No newline at end of file
+]
+
+# The class GridIndex gives every cell of a width x height grid an integer id "y * width + x"
+# Problems and environments can do their inner-loop movement and membership checks on the ids (which are cheap to create, hash and compare)
+# and only convert the ids to points at the API boundaries (states, observations and display)
+#   offsets[direction] is the difference between the id of a cell and the id of its neighbor in the given direction
+#       (only valid if the neighbor is inside the grid, since moving past the first or last column wraps to the next row)
+#   points[id] is the interned point of the cell, so converting an id to a point does not create a new object
+class GridIndex:
+    __slots__ = ('width', 'height', 'size', 'offsets', 'points')
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.offsets = tuple(vector.y * width + vector.x for vector in Direction._Vectors)
+        self.points = tuple(Point(x, y) for y in range(height) for x in range(width))
+
+    def __contains__(self, point: Point) -> bool:
+        return 0 <= point.x < self.width and 0 <= point.y < self.height
+
+    # Convert a point to a cell id and vice versa
+    def cell_of(self, point: Point) -> int:
+        return point.y * self.width + point.x
+
+    def point_of(self, cell: int) -> Point:
+        return self.points[cell]
+
+    # Returns the interned point equal to the given point (or the point itself if it is outside the grid)
+    def intern(self, point: Point) -> Point:
+        return self.points[point.y * self.width + point.x] if point in self else point
+
+    # Returns an integer where the bit of each of the given points is set
+    def mask_of(self, points: Iterable[Point]) -> int:
+        width, mask = self.width, 0
+        for point in points:
+            mask |= 1 << (point.y * width + point.x)
+        return mask
+
+    # Returns the neighbor table: neighbors[cell][direction] is the id of the next cell in the given direction
+    # or -1 if it is outside the grid or not one of the given cells (all the cells of the grid if None)
+    # The cells that are not in the given cells get an empty tuple
+    # If wrap is True, moving past an edge of the grid enters from the opposite edge
+    def neighbors(self, cells: Optional[Iterable[int]] = None, wrap: bool = False) -> Tuple[Tuple[int, ...], ...]:
+        width, height = self.width, self.height
+        included = bytearray(self.size) if cells is not None else bytearray(b'\x01') * self.size
+        for cell in cells or (): included[cell] = 1
+        table = []
+        for cell in range(self.size):
+            if not included[cell]:
+                table.append(())
+                continue
+            x, y = cell % width, cell // width
+            row = []
+            for vector in Direction._Vectors:
+                nx, ny = x + vector.x, y + vector.y
+                if wrap:
+                    nx, ny = nx % width, ny % height
+                elif not (0 <= nx < width and 0 <= ny < height):
+                    row.append(-1)
+                    continue
+                next_cell = ny * width + nx
+                row.append(next_cell if included[next_cell] else -1)
+            table.append(tuple(row))
+        return tuple(table)
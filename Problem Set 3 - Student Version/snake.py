@@ -1,7 +1,7 @@
 from typing import Dict, List, Optional, Set, Tuple
 from mdp import MarkovDecisionProcess
 from environment import Environment
-from mathutils import Point, Direction
+from mathutils import GridIndex, Point, Direction
 from helpers.mt19937 import RandomGenerator
 from helpers.utils import NotImplemented
 import json
@@ -41,6 +41,12 @@ class SnakeEnv(Environment[SnakeObservation, Direction]):
     direction: Direction
     apple: Optional[Point]
 
+    # The moves and the collision checks are done on the cell indices "y * width + x" (see GridIndex)
+    grid: GridIndex
+    wrapped: Tuple[Tuple[int, ...], ...]    # wrapped[cell][direction] is the next cell in the direction (wrapping around the edges)
+    column_order: Tuple[int, ...]           # The cells ordered by x then y (the order in which the apple positions are listed)
+    occupied: List[int]                     # occupied[cell] is the number of snake parts on the cell
+
     def __init__(self, width: int, height: int) -> None:
         super().__init__()
         assert width > 1 or height > 1, "The world must be larger than 1x1"
@@ -50,18 +56,18 @@ class SnakeEnv(Environment[SnakeObservation, Direction]):
         self.snake = []
         self.direction = Direction.LEFT
         self.apple = None
+        self.grid = GridIndex(width, height)
+        self.wrapped = self.grid.neighbors(wrap=True)
+        self.column_order = tuple(y * width + x for x in range(width) for y in range(height))
+        self.occupied = [0] * self.grid.size
 
     def generate_random_apple(self) -> Point:
         """
         Generates and returns a random apple position which is not on a cell occupied 
         by the snake's body.
         """
-        snake_positions = set(self.snake)
-        possible_points = [Point(x, y) 
-            for x in range(self.width) 
-            for y in range(self.height) 
-            if Point(x, y) not in snake_positions
-        ]
+        occupied, points = self.occupied, self.grid.points
+        possible_points = [points[cell] for cell in self.column_order if not occupied[cell]]
         return self.rng.choice(possible_points)
 
     def reset(self, seed: Optional[int] = None) -> Point:
@@ -78,7 +84,9 @@ class SnakeEnv(Environment[SnakeObservation, Direction]):
             self.rng.seed(seed) # Initialize the random generator using the seed
         # DONE add your code here
         # IMPORTANT NOTE: Define the snake before calling generate_random_apple
-        self.snake = [Point((int)(self.width / 2), (int)(self.height / 2))] #start at the center of the grid
+        self.snake = [self.grid.points[(int)(self.height / 2) * self.width + (int)(self.width / 2)]] #start at the center of the grid
+        self.occupied = [0] * self.grid.size
+        self.occupied[self.grid.cell_of(self.snake[0])] = 1
         self.direction = Direction.LEFT #setting the direction to left the default direction
         self.apple = self.generate_random_apple() #generate the apple
 
@@ -133,25 +141,17 @@ class SnakeEnv(Environment[SnakeObservation, Direction]):
         if action != Direction.NONE: #if the action is none then the direction is tha same as the previous direction 
             self.direction = action
 
-        new_head = self.snake[0] + self.direction.to_vector() #get the new head position in new_head variable with the help of mathUtil function to_vector
-        # check on new head postion if is in range of grid and check for collision
-        
-        # wrapping around the grid
-        if new_head.x < 0: 
-            new_head = Point(self.width - 1, new_head.y) #if the new head is less than 0 then the new head is the width - 1
-        elif new_head.x >= self.width:
-            new_head = Point(0, new_head.y) #if the new head is greater than the width then the new head is 0
-
-        if new_head.y < 0:
-            new_head = Point(new_head.x, self.height - 1) #if the new head is less than 0 then the new head is the height - 1
-        elif new_head.y >= self.height:
-            new_head = Point(new_head.x, 0) #if the new head is greater than the height then the new head is 0
+        # get the new head position with the wrapped neighbor table (moving past an edge enters from the opposite edge)
+        grid = self.grid
+        new_cell = self.wrapped[grid.cell_of(self.snake[0])][self.direction]
+        new_head = grid.points[new_cell]
 
-        self.snake.insert(0, new_head) #insert the new head to the snake list
-
-        if new_head in self.snake[1:]: # if the new_head in the snake body part list then the snake is collided with itself
+        if self.occupied[new_cell]: # if the new_head is on a snake body part then the snake is collided with itself
             done = True #end the game
             reward -= 100 #decrease the reward by 100
+
+        self.snake.insert(0, new_head) #insert the new head to the snake list
+        self.occupied[new_cell] += 1
         
         if (new_head == self.apple): #if the new head is the apple
             #increase the reward by 1
@@ -164,7 +164,8 @@ class SnakeEnv(Environment[SnakeObservation, Direction]):
                 self.apple = self.generate_random_apple()
         else:
             #remove the tail advancing the snake
-            self.snake.pop() #remove the last element in the snake list as it is the tail moved to the next position
+            tail = self.snake.pop() #remove the last element in the snake list as it is the tail moved to the next position
+            self.occupied[grid.cell_of(tail)] -= 1
     
 
         observation = SnakeObservation(tuple(self.snake), self.direction, self.apple)